@@ -3,6 +3,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
 import os
+from datetime import timedelta
 
 load_dotenv()
 
@@ -10,7 +11,8 @@ app = Flask(__name__)
 CORS(app)
 
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET', 'appguitailieu')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.getenv('JWT_ACCESS_MINUTES', 30)))
+app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.getenv('JWT_REFRESH_DAYS', 7)))
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
 app.config['JWT_TOKEN_LOCATION'] = ['headers', 'query_string']
 app.config['JWT_QUERY_STRING_NAME'] = 'token'
@@ -26,6 +28,8 @@ from routes.history import history_bp
 from routes.ai import ai_bp
 from routes.departments import departments_bp
 from routes.users import users_bp
+from routes.exports import exports_bp
+from utils.jwt_helper import jwt_required as auth_required, get_current_user
 
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(documents_bp, url_prefix='/api/documents')
@@ -34,10 +38,20 @@ app.register_blueprint(history_bp, url_prefix='/api/history')
 app.register_blueprint(ai_bp, url_prefix='/api/ai')
 app.register_blueprint(departments_bp, url_prefix='/api/departments')
 app.register_blueprint(users_bp, url_prefix='/api/users')
+app.register_blueprint(exports_bp, url_prefix='/api/exports')
 
 init_db()
 #User.init_default_user()
 
+from utils.cascade import resume_jobs
+resume_jobs()
+
+from utils.suggestion_model import get_model
+get_model().refresh()
+
+from utils.prompt_builder import load_encoding
+load_encoding()
+
 if not os.path.exists('uploads'):
     os.makedirs('uploads')
 
@@ -45,6 +59,15 @@ if not os.path.exists('uploads'):
 def index():
     return jsonify({'message': 'Backend API is running', 'status': 'ok'})
 
+@app.route('/api/cache/stats')
+@auth_required
+def cache_stats():
+    from models import cache
+    user = User.get_by_id(get_current_user())
+    if not user or user.get('role') != 'director':
+        return jsonify({'message': 'Chỉ giám đốc mới có quyền xem thống kê cache'}), 403
+    return jsonify({'enabled': cache.enabled(), 'caches': cache.stats()})
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     app.run(debug=True, host='0.0.0.0', port=port)
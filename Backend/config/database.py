@@ -1,4 +1,4 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, TEXT
 from dotenv import load_dotenv
 import os
 
@@ -21,12 +21,35 @@ def init_db():
 
 def create_indexes():
     db.documents.create_index("name")
+    db.documents.create_index(
+        [("search_name", TEXT), ("search_content", TEXT)],
+        weights={"search_name": 10, "search_content": 1},
+        default_language="none",
+        name="documents_search"
+    )
+    db.documents.create_index("lsh_buckets")
+    db.documents.create_index("content_hash")
+    db.documents.create_index("department_id")
     db.units.create_index("code", unique=True)
     db.units.create_index("email", unique=True)
+    db.units.create_index([("department_id", 1), ("created_at", -1)])
+    db.units.create_index("search_terms")
+    db.units.create_index([("department_id", 1), ("name", 1)])
     db.history.create_index("document_id")
     db.history.create_index("unit_id")
+    db.history.create_index([("user_id", 1), ("created_at", -1)])
+    db.ai_usage.create_index("created_at")
     db.departments.create_index("name", unique=True)
     db.users.create_index("username", unique=True)
+    db.users.create_index("search_terms")
+    db.users.create_index([("role", 1), ("_id", -1)])
+    db.users.create_index([("department_id", 1), ("_id", -1)])
+    db.users.create_index("created_by")
+    db.units.create_index("user_id")
+    db.documents.create_index("user_id")
+    db.documents.create_index("filename")
+    db.departments.create_index("head_id")
+    db.jobs.create_index([("status", 1), ("created_at", 1)])
 
 def get_db():
     if db is None:
@@ -0,0 +1,25 @@
+from bson import ObjectId
+
+from migrations.runner import Backfill
+
+VERSION = 1
+DESCRIPTION = 'Chuẩn hóa department_id về ObjectId cho users, units, documents'
+
+
+def _to_object_id(document):
+    value = document['department_id'].strip()
+    if not value:
+        return {'$set': {'department_id': None}}
+    if ObjectId.is_valid(value):
+        return {'$set': {'department_id': ObjectId(value)}}
+    # Id không hợp lệ: giữ nguyên để kiểm tra tay; runner đếm và lưu _id vào skipped_ids
+    return None
+
+
+STEPS = [
+    Backfill(collection, _to_object_id,
+             query={'department_id': {'$type': 'string'}},
+             projection={'department_id': 1},
+             guard=('department_id',))
+    for collection in ('users', 'units', 'documents')
+]
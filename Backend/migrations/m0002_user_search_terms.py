@@ -0,0 +1,17 @@
+from migrations.runner import Backfill
+from models.user import User
+
+VERSION = 2
+DESCRIPTION = 'Bổ sung search_terms cho người dùng cũ'
+
+
+def _search_terms(user):
+    return {'$set': {'search_terms': User.search_terms(user.get('username'), user.get('name'), user.get('phone'))}}
+
+
+STEPS = [
+    Backfill('users', _search_terms,
+             query={'search_terms': {'$exists': False}},
+             projection={'username': 1, 'name': 1, 'phone': 1},
+             guard=('username', 'name', 'phone'))
+]
@@ -0,0 +1,27 @@
+import os
+import re
+
+from migrations.runner import Backfill
+
+VERSION = 3
+DESCRIPTION = 'Thêm size_bytes (số byte) cho tài liệu để sắp xếp và thống kê theo dung lượng'
+
+_UNITS = {'KB': 1024, 'MB': 1024 * 1024}
+
+
+def _size_bytes(document):
+    filepath = document.get('filepath')
+    if filepath and os.path.exists(filepath):
+        return {'$set': {'size_bytes': os.path.getsize(filepath)}}
+    match = re.match(r'^\s*([\d.]+)\s*(KB|MB)\s*$', str(document.get('size') or ''))
+    if match:
+        return {'$set': {'size_bytes': int(float(match.group(1)) * _UNITS[match.group(2)])}}
+    return {'$set': {'size_bytes': None}}
+
+
+STEPS = [
+    Backfill('documents', _size_bytes,
+             query={'size_bytes': {'$exists': False}},
+             projection={'filepath': 1, 'size': 1},
+             guard=('filepath',))
+]
@@ -0,0 +1,17 @@
+from migrations.runner import Backfill
+from models.unit import Unit
+
+VERSION = 4
+DESCRIPTION = 'Bổ sung search_terms cho đơn vị để gợi ý theo tiền tố'
+
+
+def _search_terms(unit):
+    return {'$set': {'search_terms': Unit.search_terms(unit.get('name'), unit.get('code'), unit.get('email'))}}
+
+
+STEPS = [
+    Backfill('units', _search_terms,
+             query={'search_terms': {'$exists': False}},
+             projection={'name': 1, 'code': 1, 'email': 1},
+             guard=('name', 'code', 'email'))
+]
@@ -0,0 +1,16 @@
+from migrations.runner import Backfill
+
+VERSION = 5
+DESCRIPTION = 'Đánh dấu indexed_at cho tài liệu đã có dấu vân tay để API trùng lặp biết đã index xong'
+
+
+def _indexed_at(document):
+    return {'$set': {'indexed_at': document.get('created_at')}}
+
+
+STEPS = [
+    Backfill('documents', _indexed_at,
+             query={'indexed_at': {'$exists': False}, 'minhash': {'$exists': True}},
+             projection={'created_at': 1},
+             guard=('created_at',))
+]
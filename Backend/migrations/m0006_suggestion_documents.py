@@ -0,0 +1,17 @@
+VERSION = 6
+DESCRIPTION = 'Tạo suggestion_documents (đơn vị đã nhận theo tài liệu) từ lịch sử gửi cho mô hình gợi ý'
+
+
+def build_suggestion_documents(db):
+    db.history.aggregate([
+        {'$match': {'document_id': {'$ne': None}, 'unit_id': {'$ne': None}}},
+        {'$group': {'_id': {'$toString': '$document_id'}, 'unit_ids': {'$addToSet': {'$toString': '$unit_id'}}}},
+        {'$merge': {
+            'into': 'suggestion_documents',
+            'whenMatched': [{'$set': {'unit_ids': {'$setUnion': ['$unit_ids', '$$new.unit_ids']}}}],
+            'whenNotMatched': 'insert'
+        }}
+    ], allowDiskUse=True)
+
+
+STEPS = [build_suggestion_documents]
@@ -0,0 +1,260 @@
+import importlib
+import os
+import pkgutil
+import socket
+import time
+from datetime import datetime, timedelta
+
+from config.database import get_db
+from models.cache import invalidate_collection
+
+COLLECTION = '_migrations'
+LOCK_ID = 'lock'
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_RATE = 2000
+DEFAULT_LOCK_LEASE_SECONDS = 300
+MAX_SKIPPED_IDS = 100
+
+_lock_owner = None
+
+
+class MigrationLocked(Exception):
+    pass
+
+
+class Backfill:
+    """
+    Một bước backfill: quét collection theo _id tăng dần từng lô, transform(doc) trả về thao tác cập nhật
+    (ví dụ {'$set': {...}}) hoặc None để bỏ qua (được đếm và lưu tối đa MAX_SKIPPED_IDS _id để kiểm tra). Các trường trong guard được đưa vào điều kiện cập nhật
+    để không ghi đè thay đổi của ứng dụng xảy ra giữa lúc đọc và ghi.
+    """
+
+    def __init__(self, collection, transform, query=None, projection=None, guard=()):
+        self.collection = collection
+        self.transform = transform
+        self.query = query or {}
+        self.projection = projection
+        self.guard = tuple(guard)
+
+    def describe(self):
+        return f'{self.collection} {self.query}'
+
+
+def _get_number_env(name, default):
+    try:
+        return type(default)(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _collection():
+    return get_db()[COLLECTION]
+
+
+def load_migrations():
+    """
+    Các module migrations/mNNNN_*.py theo thứ tự VERSION. Mỗi module có VERSION, DESCRIPTION và STEPS.
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    migrations = []
+    for module_info in pkgutil.iter_modules([package_dir]):
+        if not module_info.name.startswith('m') or not module_info.name[1:5].isdigit():
+            continue
+        module = importlib.import_module(f'migrations.{module_info.name}')
+        migrations.append(module)
+    migrations.sort(key=lambda module: module.VERSION)
+    versions = [module.VERSION for module in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('Trùng VERSION giữa các migration')
+    return migrations
+
+
+def applied_versions():
+    return {item['_id'] for item in _collection().find({'status': 'done'}, {'_id': 1})}
+
+
+def status():
+    """
+    Trả về [(version, description, trạng thái, số bản ghi đã xử lý, số bản ghi bỏ qua)].
+    """
+    states = {item['_id']: item for item in _collection().find({'_id': {'$ne': LOCK_ID}})}
+    result = []
+    for migration in load_migrations():
+        state = states.get(migration.VERSION, {})
+        result.append((
+            migration.VERSION, migration.DESCRIPTION, state.get('status', 'pending'),
+            state.get('processed', 0), state.get('skipped', 0)
+        ))
+    return result
+
+
+def _lease():
+    return timedelta(seconds=_get_number_env('MIGRATION_LOCK_LEASE', DEFAULT_LOCK_LEASE_SECONDS))
+
+
+def acquire_lock(owner):
+    """
+    Khóa có thời hạn (lease): lần chạy đang giữ khóa gia hạn sau mỗi lô; khóa quá hạn (process bị dừng
+    đột ngột) thì lần chạy mới được lấy lại mà không cần unlock bằng tay.
+    """
+    global _lock_owner
+    from pymongo.errors import DuplicateKeyError
+    now = datetime.utcnow()
+    lock = {'owner': owner, 'acquired_at': now, 'expires_at': now + _lease()}
+    try:
+        _collection().insert_one(dict(lock, _id=LOCK_ID))
+    except DuplicateKeyError:
+        taken = _collection().update_one(
+            {'_id': LOCK_ID, '$or': [
+                {'expires_at': {'$lt': now}},
+                {'expires_at': {'$exists': False}, 'acquired_at': {'$lt': now - _lease()}}
+            ]},
+            {'$set': lock}
+        )
+        if not taken.modified_count:
+            current = _collection().find_one({'_id': LOCK_ID}) or {}
+            raise MigrationLocked(
+                f"Migration đang chạy bởi {current.get('owner')} từ {current.get('acquired_at')}"
+                f" (khóa hết hạn lúc {current.get('expires_at')})"
+            )
+    _lock_owner = owner
+
+
+def renew_lock():
+    """
+    Gia hạn khóa của process này; báo MigrationLocked nếu khóa đã bị lần chạy khác lấy lại.
+    """
+    if _lock_owner is None:
+        return
+    renewed = _collection().update_one(
+        {'_id': LOCK_ID, 'owner': _lock_owner},
+        {'$set': {'expires_at': datetime.utcnow() + _lease()}}
+    )
+    if not renewed.matched_count:
+        raise MigrationLocked(f'Khóa migration của {_lock_owner} đã hết hạn và bị lần chạy khác lấy lại')
+
+
+def release_lock(owner=None):
+    """
+    Gỡ khóa; owner=None (lệnh unlock) thì gỡ bất kể ai đang giữ.
+    """
+    global _lock_owner
+    query = {'_id': LOCK_ID}
+    if owner is not None:
+        query['owner'] = owner
+    _collection().delete_one(query)
+    _lock_owner = None
+
+
+def _run_backfill(step, state_id, step_index, last_id, batch_size, max_rate, log):
+    from pymongo import UpdateOne
+    db = get_db()
+    while True:
+        started = time.monotonic()
+        query = dict(step.query)
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(db[step.collection].find(query, step.projection).sort('_id', 1).limit(batch_size))
+        if not batch:
+            return
+
+        renew_lock()
+        operations = []
+        skipped_ids = []
+        for document in batch:
+            update = step.transform(document)
+            if update:
+                condition = {'_id': document['_id']}
+                condition.update({field: document.get(field) for field in step.guard})
+                operations.append(UpdateOne(condition, update))
+            else:
+                skipped_ids.append(document['_id'])
+        modified = 0
+        if operations:
+            modified = db[step.collection].bulk_write(operations, ordered=False).modified_count
+            if modified:
+                invalidate_collection(step.collection)
+
+        last_id = batch[-1]['_id']
+        progress = {
+            '$set': {'step': step_index, 'last_id': last_id, 'updated_at': datetime.utcnow()},
+            '$inc': {'processed': len(batch), 'modified': modified, 'skipped': len(skipped_ids)}
+        }
+        if skipped_ids:
+            progress['$push'] = {'skipped_ids': {'$each': skipped_ids, '$slice': MAX_SKIPPED_IDS}}
+        _collection().update_one({'_id': state_id}, progress)
+        log(f'  {step.collection}: +{len(batch)} đọc, +{modified} cập nhật (đến _id {last_id})')
+        if skipped_ids:
+            log(f"  {step.collection}: bỏ qua {len(skipped_ids)} bản ghi, ví dụ _id {', '.join(str(i) for i in skipped_ids[:5])}")
+
+        # Giới hạn tốc độ quét để backfill chạy song song với ứng dụng mà không chiếm hết tài nguyên Mongo
+        if max_rate:
+            remaining = len(batch) / max_rate - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+
+def run_migration(migration, batch_size=None, max_rate=None, log=print):
+    """
+    Chạy một migration; tiến độ (bước, _id cuối đã xử lý) lưu trong _migrations nên có thể tiếp tục sau khi dừng.
+    """
+    batch_size = batch_size or _get_number_env('MIGRATION_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_rate = max_rate if max_rate is not None else _get_number_env('MIGRATION_MAX_RATE', DEFAULT_MAX_RATE)
+    state = _collection().find_one({'_id': migration.VERSION})
+    if state and state.get('status') == 'done':
+        return
+    if not state:
+        state = {
+            '_id': migration.VERSION,
+            'description': migration.DESCRIPTION,
+            'status': 'running',
+            'step': 0,
+            'last_id': None,
+            'processed': 0,
+            'modified': 0,
+            'started_at': datetime.utcnow()
+        }
+        _collection().insert_one(state)
+    log(f'Migration {migration.VERSION}: {migration.DESCRIPTION}')
+
+    for step_index, step in enumerate(migration.STEPS):
+        if step_index < state.get('step', 0):
+            continue
+        last_id = state.get('last_id') if step_index == state.get('step', 0) else None
+        description = step.describe() if isinstance(step, Backfill) else step.__name__
+        log(f' Bước {step_index + 1}/{len(migration.STEPS)}: {description}')
+        if isinstance(step, Backfill):
+            _run_backfill(step, migration.VERSION, step_index, last_id, batch_size, max_rate, log)
+        else:
+            step(get_db())
+        renew_lock()
+        _collection().update_one(
+            {'_id': migration.VERSION},
+            {'$set': {'step': step_index + 1, 'last_id': None, 'updated_at': datetime.utcnow()}}
+        )
+
+    _collection().update_one(
+        {'_id': migration.VERSION},
+        {'$set': {'status': 'done', 'finished_at': datetime.utcnow()}}
+    )
+
+
+def run_pending(target=None, batch_size=None, max_rate=None, log=print):
+    """
+    Chạy lần lượt các migration chưa áp dụng (tới target nếu có). Trả về danh sách version đã chạy.
+    """
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    acquire_lock(owner)
+    try:
+        done = applied_versions()
+        executed = []
+        for migration in load_migrations():
+            if target is not None and migration.VERSION > target:
+                break
+            if migration.VERSION in done:
+                continue
+            run_migration(migration, batch_size, max_rate, log)
+            executed.append(migration.VERSION)
+        return executed
+    finally:
+        release_lock(owner)
@@ -0,0 +1,185 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from config.database import get_db
+
+DEFAULT_TTL_SECONDS = 60
+DEFAULT_MAX_SIZE = 1000
+DEFAULT_VERSION_CHECK_SECONDS = 1.0
+CHANGE_LOG_SIZE = 256
+ALL_KEYS = '*'
+
+_STAMPS = 'cache_versions'
+
+
+def _get_float_env(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def enabled():
+    return os.getenv('ENTITY_CACHE', '1') != '0'
+
+
+class EntityCache:
+    """
+    Cache đọc xuyên (read-through) theo id cho một collection: LRU giới hạn kích thước, hết hạn theo TTL.
+    Mỗi lần ghi tăng version stamp của collection trong Mongo (cache_versions) và ghi key bị đổi vào
+    change log (CHANGE_LOG_SIZE key gần nhất). Các process khác thấy stamp đổi (kiểm tra tối đa mỗi
+    ENTITY_CACHE_VERSION_CHECK giây) thì chỉ xóa các key trong log; xóa toàn bộ khi gặp ALL_KEYS
+    (invalidate không có key) hoặc khi đã lỡ nhiều thay đổi hơn độ dài log.
+    Giá trị được deepcopy khi lưu và khi trả về vì caller thường sửa trực tiếp dict (to_dict).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.ttl = _get_float_env('ENTITY_CACHE_TTL', DEFAULT_TTL_SECONDS)
+        self.max_size = int(_get_float_env('ENTITY_CACHE_SIZE', DEFAULT_MAX_SIZE))
+        self.check_interval = _get_float_env('ENTITY_CACHE_VERSION_CHECK', DEFAULT_VERSION_CHECK_SECONDS)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = None
+        self.checked_at = 0.0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _read_stamp(self):
+        return get_db()[_STAMPS].find_one({'_id': self.collection}) or {}
+
+    def _apply_stamp(self, stamp):
+        """
+        Đưa cache lên version của stamp; gọi khi đang giữ self.lock.
+        """
+        version = stamp.get('version', 0)
+        if self.version is None:
+            self.version = version
+            return
+        missed = version - self.version
+        if missed == 0:
+            return
+        changes = stamp.get('changes') or []
+        recent = changes[-missed:] if 0 < missed <= len(changes) else None
+        if recent is None or ALL_KEYS in recent:
+            self.entries.clear()
+        else:
+            for key in recent:
+                self.entries.pop(key, None)
+        self.generation += 1
+        self.version = version
+
+    def _sync_version(self):
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+        try:
+            stamp = self._read_stamp()
+        except Exception:
+            return
+        with self.lock:
+            self._apply_stamp(stamp)
+
+    def get(self, key, loader):
+        if not enabled():
+            return loader()
+        key = str(key)
+        self._sync_version()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[0])
+            self.misses += 1
+            generation = self.generation
+
+        value = loader()
+        if value is None:
+            return None
+
+        with self.lock:
+            # Bỏ qua nếu có lần ghi xảy ra trong lúc đang đọc từ Mongo
+            if generation == self.generation:
+                self.entries[key] = (copy.deepcopy(value), now + self.ttl)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, key=None):
+        """
+        Gọi sau mỗi lần ghi: xóa key (hoặc toàn bộ nếu key=None), tăng version stamp trong Mongo
+        và ghi key vào change log để process khác chỉ xóa đúng key đó.
+        """
+        from pymongo import ReturnDocument
+        changed = ALL_KEYS if key is None else str(key)
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(changed, None)
+            self.generation += 1
+            self.invalidations += 1
+        try:
+            stamp = get_db()[_STAMPS].find_one_and_update(
+                {'_id': self.collection},
+                {
+                    '$inc': {'version': 1},
+                    '$push': {'changes': {'$each': [changed], '$slice': -CHANGE_LOG_SIZE}}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception:
+            return
+        with self.lock:
+            # Áp dụng luôn các thay đổi từ process khác xảy ra từ lần đồng bộ trước
+            self._apply_stamp(stamp)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(collection):
+    with _caches_lock:
+        if collection not in _caches:
+            _caches[collection] = EntityCache(collection)
+        return _caches[collection]
+
+
+def invalidate_collection(collection):
+    """
+    Dùng cho các thao tác ghi hàng loạt (cascade, migration, script) không đi qua model.
+    """
+    get_cache(collection).invalidate()
+
+
+def stats():
+    with _caches_lock:
+        caches = dict(_caches)
+    return {collection: cache.stats() for collection, cache in caches.items()}
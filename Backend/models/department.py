@@ -1,6 +1,7 @@
 from datetime import datetime
 from config.database import get_db
 from pymongo.errors import DuplicateKeyError
+from models.cache import get_cache
 
 class Department:
     @staticmethod
@@ -20,14 +21,52 @@ class Department:
         db = get_db()
         return list(db.departments.find().sort('created_at', -1))
 
+    @staticmethod
+    def get_overview():
+        """
+        Danh sách phòng ban kèm trưởng phòng và số nhân sự, đơn vị, tài liệu trong một aggregation.
+        Mỗi số đếm là một $lookup so sánh bằng trên department_id (dùng index department_id).
+        """
+        db = get_db()
+        pipeline = [
+            {'$sort': {'created_at': -1}},
+            {'$lookup': {
+                'from': 'users',
+                'let': {'head_id': {'$convert': {'input': '$head_id', 'to': 'objectId', 'onError': None, 'onNull': None}}},
+                'pipeline': [
+                    {'$match': {'$expr': {'$eq': ['$_id', '$$head_id']}}},
+                    {'$project': {'password': 0, 'search_terms': 0}}
+                ],
+                'as': 'head'
+            }},
+            {'$unwind': {'path': '$head', 'preserveNullAndEmptyArrays': True}}
+        ]
+        counts = {}
+        for collection, field in (('users', 'member_count'), ('units', 'unit_count'), ('documents', 'document_count')):
+            pipeline.append({'$lookup': {
+                'from': collection,
+                'let': {'dept_id': '$_id'},
+                'pipeline': [
+                    {'$match': {'$expr': {'$eq': ['$department_id', '$$dept_id']}}},
+                    {'$count': 'total'}
+                ],
+                'as': f'_{field}'
+            }})
+            counts[field] = {'$sum': f'$_{field}.total'}
+        pipeline.append({'$addFields': counts})
+        pipeline.append({'$project': {f'_{field}': 0 for field in counts}})
+        return list(db.departments.aggregate(pipeline))
+
     @staticmethod
     def get_by_id(department_id):
         db = get_db()
         from bson import ObjectId
-        try:
-            return db.departments.find_one({'_id': ObjectId(department_id)})
-        except:
-            return None
+        def load():
+            try:
+                return db.departments.find_one({'_id': ObjectId(department_id)})
+            except:
+                return None
+        return get_cache('departments').get(department_id, load)
 
     @staticmethod
     def update(department_id, data):
@@ -39,6 +78,8 @@ class Department:
                 {'_id': ObjectId(department_id)},
                 {'$set': data}
             )
+            if result.modified_count > 0:
+                get_cache('departments').invalidate(department_id)
             return result.modified_count > 0, None
         except DuplicateKeyError as e:
             field = str(e).split('index: ')[1].split('_')[0] if 'index:' in str(e) else 'field'
@@ -52,6 +93,8 @@ class Department:
         from bson import ObjectId
         try:
             result = db.departments.delete_one({'_id': ObjectId(department_id)})
+            if result.deleted_count > 0:
+                get_cache('departments').invalidate(department_id)
             return result.deleted_count > 0
         except:
             return False
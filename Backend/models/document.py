@@ -1,5 +1,6 @@
 from datetime import datetime
 from config.database import get_db
+from models.ids import normalize_department
 
 
 class Document:
@@ -14,8 +15,10 @@ class Document:
         data['updated_at'] = datetime.utcnow()
         if 'user_id' in data and data['user_id']:
             data['user_id'] = ObjectId(data['user_id']) if isinstance(data['user_id'], str) else data['user_id']
-        if 'department_id' in data and data['department_id']:
-            data['department_id'] = ObjectId(data['department_id']) if isinstance(data['department_id'], str) else data['department_id']
+        normalize_department(data)
+        if 'name' in data and 'search_name' not in data:
+            from utils.search_index import search_fields
+            data.update(search_fields(data['name']))
         result = db.documents.insert_one(data)
         return str(result.inserted_id)
 
@@ -46,6 +49,21 @@ class Document:
         except Exception:
             return None
 
+    @staticmethod
+    def get_by_ids(doc_ids):
+        """
+        Lấy nhiều tài liệu trong một truy vấn $in (không kiểm tra user); id không hợp lệ bị bỏ qua.
+        """
+        db = get_db()
+        from bson import ObjectId
+        object_ids = [ObjectId(doc_id) for doc_id in doc_ids if ObjectId.is_valid(doc_id)]
+        if not object_ids:
+            return []
+        try:
+            return list(db.documents.find({'_id': {'$in': object_ids}}))
+        except Exception:
+            return []
+
     @staticmethod
     def get_by_id_for_user(doc_id, user_id):
         """
@@ -58,6 +76,61 @@ class Document:
         except Exception:
             return None
 
+    @staticmethod
+    def update_search_fields(doc_id, fields):
+        """
+        Cập nhật các trường phục vụ tìm kiếm mà không đổi updated_at.
+        """
+        db = get_db()
+        from bson import ObjectId
+        try:
+            result = db.documents.update_one({'_id': ObjectId(doc_id)}, {'$set': fields})
+            return result.matched_count > 0
+        except Exception:
+            return False
+
+    @staticmethod
+    def find_duplicate_candidates(doc_id, content_hash, buckets, extra_filter=None, limit=50):
+        """
+        Ứng viên trùng lặp: cùng content_hash hoặc chung ít nhất một bucket LSH.
+        """
+        db = get_db()
+        from bson import ObjectId
+        conditions = []
+        if content_hash:
+            conditions.append({'content_hash': content_hash})
+        if buckets:
+            conditions.append({'lsh_buckets': {'$in': buckets}})
+        if not conditions:
+            return []
+        query = {'$or': conditions}
+        try:
+            query['_id'] = {'$ne': ObjectId(doc_id)}
+        except Exception:
+            return []
+        if extra_filter:
+            query = {'$and': [query, extra_filter]}
+        projection = {'name': 1, 'created_at': 1, 'content_hash': 1, 'minhash': 1}
+        return list(db.documents.find(query, projection).sort('created_at', -1).limit(limit))
+
+    @staticmethod
+    def search(text_query, extra_filter, skip, limit):
+        """
+        Tìm tài liệu theo text index, sắp xếp theo độ liên quan. Trả về (danh sách, tổng số).
+        """
+        db = get_db()
+        query = dict(text_query)
+        if extra_filter:
+            query = {'$and': [text_query, extra_filter]}
+        projection = {'score': {'$meta': 'textScore'}, 'search_content': 0, 'search_name': 0, 'minhash': 0, 'lsh_buckets': 0}
+        cursor = (
+            db.documents.find(query, projection)
+            .sort([('score', {'$meta': 'textScore'}), ('created_at', -1)])
+            .skip(skip)
+            .limit(limit)
+        )
+        return list(cursor), db.documents.count_documents(query)
+
     @staticmethod
     def update_for_user(doc_id, user_id, data):
         """
@@ -67,6 +140,7 @@ class Document:
         from bson import ObjectId
         try:
             data['updated_at'] = datetime.utcnow()
+            normalize_department(data)
             result = db.documents.update_one(
                 {'_id': ObjectId(doc_id), 'user_id': user_id},
                 {'$set': data}
@@ -95,6 +169,10 @@ class Document:
         document['id'] = str(document['_id'])
         document['date'] = document.get('created_at', datetime.utcnow()).strftime('%Y-%m-%d')
         del document['_id']
+        document.pop('search_name', None)
+        document.pop('search_content', None)
+        document.pop('minhash', None)
+        document.pop('lsh_buckets', None)
         if 'user_id' in document and document['user_id']:
             document['user_id'] = str(document['user_id'])
         if 'department_id' in document and document['department_id']:
@@ -103,6 +181,8 @@ class Document:
             document['created_at'] = document['created_at'].isoformat()
         if 'updated_at' in document:
             document['updated_at'] = document['updated_at'].isoformat()
+        if document.get('indexed_at'):
+            document['indexed_at'] = document['indexed_at'].isoformat()
         return document
 
 
@@ -1,6 +1,17 @@
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from config.database import get_db
 
+FREQUENT_UNITS_TTL_SECONDS = 300
+FREQUENT_UNITS_CACHE_SIZE = 1000
+
+# user_id -> (frequent_units, thời điểm tính); _frequent_pending: user đang được tính lại trong nền
+_frequent_units = OrderedDict()
+_frequent_pending = set()
+_frequent_lock = threading.Lock()
+
 
 class History:
     @staticmethod
@@ -10,7 +21,13 @@ class History:
         """
         db = get_db()
         data['created_at'] = datetime.utcnow()
+        document_id = data.get('document_id')
+        unit_id = data.get('unit_id')
         result = db.history.insert_one(data)
+        if document_id and unit_id:
+            from utils.background import submit_task
+            from utils.suggestion_model import observe_send
+            submit_task(observe_send, document_id, unit_id)
         return str(result.inserted_id)
 
     @staticmethod
@@ -43,6 +60,96 @@ class History:
             db.history.find({'document_id': doc_id, 'user_id': user_id})
         )
 
+    @staticmethod
+    def get_frequent_units_for_user(user_id, limit=10, recent=500):
+        """
+        Các đơn vị user gửi tới nhiều nhất trong `recent` lần gửi gần đây: [(unit_id, số lần)].
+        """
+        db = get_db()
+        pipeline = [
+            {'$match': {'user_id': user_id, 'unit_id': {'$ne': None}}},
+            {'$sort': {'created_at': -1}},
+            {'$limit': recent},
+            {'$group': {'_id': '$unit_id', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1}},
+            {'$limit': limit}
+        ]
+        return [(str(item['_id']), item['count']) for item in db.history.aggregate(pipeline)]
+
+    @staticmethod
+    def _refresh_frequent_units(user_id):
+        try:
+            units = History.get_frequent_units_for_user(user_id)
+            with _frequent_lock:
+                _frequent_units[user_id] = (units, time.monotonic())
+                _frequent_units.move_to_end(user_id)
+                while len(_frequent_units) > FREQUENT_UNITS_CACHE_SIZE:
+                    _frequent_units.popitem(last=False)
+        finally:
+            with _frequent_lock:
+                _frequent_pending.discard(user_id)
+
+    @staticmethod
+    def peek_frequent_units(user_id):
+        """
+        Như get_frequent_units_for_user nhưng không chờ Mongo: trả về bản đã tính (có thể cũ vài phút)
+        hoặc [] nếu chưa có, và tính lại trong nền khi thiếu hoặc hết hạn.
+        """
+        user_id = str(user_id)
+        with _frequent_lock:
+            entry = _frequent_units.get(user_id)
+            fresh = entry is not None and time.monotonic() - entry[1] < FREQUENT_UNITS_TTL_SECONDS
+            if not fresh and user_id not in _frequent_pending:
+                _frequent_pending.add(user_id)
+                refresh = True
+            else:
+                refresh = False
+        if refresh:
+            from utils.background import submit_task
+            submit_task(History._refresh_frequent_units, user_id)
+        return entry[0] if entry else []
+
+    @staticmethod
+    def record_ai_usage(document_id, model, token_usage):
+        """
+        Lưu số token của một lần gọi LLM gợi ý đơn vị (collection ai_usage, cạnh lịch sử gửi)
+        để theo dõi ngân sách token qua nhiều request.
+        """
+        db = get_db()
+        usage = token_usage or {}
+        db.ai_usage.insert_one({
+            'document_id': str(document_id) if document_id else None,
+            'model': model,
+            'budget': usage.get('budget'),
+            'prompt_tokens_estimated': usage.get('prompt_tokens_estimated'),
+            'prompt_tokens': usage.get('prompt_tokens'),
+            'completion_tokens': usage.get('completion_tokens'),
+            'cached_tokens': usage.get('cached_tokens'),
+            'created_at': datetime.utcnow()
+        })
+
+    @staticmethod
+    def get_ai_usage_summary(since):
+        """
+        Tổng token theo ngày và model kể từ `since`: [{'date', 'model', 'calls', 'prompt_tokens', ...}].
+        """
+        db = get_db()
+        pipeline = [
+            {'$match': {'created_at': {'$gte': since}}},
+            {'$group': {
+                '_id': {'date': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}}, 'model': '$model'},
+                'calls': {'$sum': 1},
+                'prompt_tokens': {'$sum': {'$ifNull': ['$prompt_tokens', '$prompt_tokens_estimated']}},
+                'completion_tokens': {'$sum': {'$ifNull': ['$completion_tokens', 0]}},
+                'cached_tokens': {'$sum': {'$ifNull': ['$cached_tokens', 0]}}
+            }},
+            {'$sort': {'_id.date': -1, '_id.model': 1}}
+        ]
+        return [
+            dict({key: value for key, value in item.items() if key != '_id'}, **item['_id'])
+            for item in db.ai_usage.aggregate(pipeline)
+        ]
+
     @staticmethod
     def to_dict(history_item):
         if not history_item:
@@ -0,0 +1,25 @@
+def object_id(value):
+    """
+    Chuẩn hóa id về ObjectId (kiểu lưu duy nhất trong DB). None/chuỗi rỗng -> None, id sai định dạng -> ValueError.
+    """
+    from bson import ObjectId
+    if value is None or value == '':
+        return None
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    raise ValueError(f'Id không hợp lệ: {value}')
+
+
+def normalize_department(data):
+    """
+    Ép department_id trong dữ liệu ghi về ObjectId để mọi truy vấn theo phòng ban là một phép so sánh bằng.
+    """
+    if 'department_id' in data:
+        data['department_id'] = object_id(data['department_id'])
+    return data
+
+
+def department_filter(department_id):
+    return {'department_id': object_id(department_id)}
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from config.database import get_db
+
+
+class Job:
+    @staticmethod
+    def create(job_type, payload):
+        """
+        Tạo công việc nền ở trạng thái pending (lưu trong collection jobs để không mất khi khởi động lại).
+        """
+        db = get_db()
+        now = datetime.utcnow()
+        result = db.jobs.insert_one({
+            'type': job_type,
+            'payload': payload,
+            'status': 'pending',
+            'attempts': 0,
+            'created_at': now,
+            'updated_at': now
+        })
+        return str(result.inserted_id)
+
+    @staticmethod
+    def get_by_id(job_id):
+        db = get_db()
+        from bson import ObjectId
+        try:
+            return db.jobs.find_one({'_id': ObjectId(job_id)})
+        except Exception:
+            return None
+
+    @staticmethod
+    def claim(job_id):
+        """
+        Chuyển pending -> running một cách nguyên tử; trả về None nếu worker khác đã nhận.
+        """
+        db = get_db()
+        from bson import ObjectId
+        from pymongo import ReturnDocument
+        return db.jobs.find_one_and_update(
+            {'_id': ObjectId(job_id), 'status': 'pending'},
+            {'$set': {'status': 'running', 'updated_at': datetime.utcnow()}, '$inc': {'attempts': 1}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def finish(job_id, result=None):
+        db = get_db()
+        from bson import ObjectId
+        db.jobs.update_one(
+            {'_id': ObjectId(job_id)},
+            {'$set': {'status': 'done', 'result': result or {}, 'updated_at': datetime.utcnow(), 'finished_at': datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def fail(job_id, error, retry):
+        db = get_db()
+        from bson import ObjectId
+        db.jobs.update_one(
+            {'_id': ObjectId(job_id)},
+            {'$set': {'status': 'pending' if retry else 'failed', 'error': error, 'updated_at': datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def requeue_unfinished(stale_seconds):
+        """
+        Đưa các job running bị bỏ dở (quá stale_seconds không cập nhật) về pending; trả về id các job pending.
+        """
+        db = get_db()
+        stale_before = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        db.jobs.update_many(
+            {'status': 'running', 'updated_at': {'$lt': stale_before}},
+            {'$set': {'status': 'pending', 'updated_at': datetime.utcnow()}}
+        )
+        return [str(job['_id']) for job in db.jobs.find({'status': 'pending'}, {'_id': 1}).sort('created_at', 1)]
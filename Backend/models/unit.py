@@ -1,6 +1,8 @@
 from datetime import datetime
 from config.database import get_db
 from pymongo.errors import DuplicateKeyError
+from models.ids import normalize_department, department_filter
+from models.cache import get_cache
 
 
 class Unit:
@@ -13,10 +15,10 @@ class Unit:
         from bson import ObjectId
         data['created_at'] = datetime.utcnow()
         data['updated_at'] = datetime.utcnow()
-        if 'department_id' in data and data['department_id']:
-            data['department_id'] = ObjectId(data['department_id']) if isinstance(data['department_id'], str) else data['department_id']
+        normalize_department(data)
         if 'user_id' in data and data['user_id']:
             data['user_id'] = ObjectId(data['user_id']) if isinstance(data['user_id'], str) else data['user_id']
+        data['search_terms'] = Unit.search_terms(data.get('name'), data.get('code'), data.get('email'))
         try:
             result = db.units.insert_one(data)
             return str(result.inserted_id), None
@@ -24,6 +26,77 @@ class Unit:
             field = str(e).split('index: ')[1].split('_')[0] if 'index:' in str(e) else 'field'
             return None, f"{field.capitalize()} đã tồn tại"
 
+    @staticmethod
+    def insert_many(units):
+        """
+        Thêm nhiều đơn vị một lần (ordered=False). Trả về (số đơn vị đã thêm, {vị trí trong danh sách: lỗi}).
+        """
+        db = get_db()
+        from bson import ObjectId
+        from pymongo.errors import BulkWriteError
+        if not units:
+            return 0, {}
+        now = datetime.utcnow()
+        for data in units:
+            data['created_at'] = now
+            data['updated_at'] = now
+            normalize_department(data)
+            if data.get('user_id'):
+                data['user_id'] = ObjectId(data['user_id']) if isinstance(data['user_id'], str) else data['user_id']
+            data['search_terms'] = Unit.search_terms(data.get('name'), data.get('code'), data.get('email'))
+        try:
+            result = db.units.insert_many(units, ordered=False)
+            return len(result.inserted_ids), {}
+        except BulkWriteError as e:
+            errors = {}
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') == 11000:
+                    field = next(iter(error.get('keyPattern') or {}), 'field')
+                    errors[error['index']] = f"{field.capitalize()} đã tồn tại"
+                else:
+                    errors[error['index']] = error.get('errmsg', 'Lỗi ghi dữ liệu')
+            return e.details.get('nInserted', 0), errors
+
+    @staticmethod
+    def search_terms(name=None, code=None, email=None):
+        """
+        Các term đã bỏ dấu để gợi ý theo tiền tố: tên đầy đủ, từng từ của tên, mã, email và phần trước @.
+        """
+        from utils.vietnamese import normalize_text, tokenize
+        terms = []
+        if name:
+            terms.append(normalize_text(name))
+            terms.extend(tokenize(name))
+        if code:
+            terms.append(normalize_text(code))
+            terms.extend(tokenize(code))
+        if email:
+            email = normalize_text(email)
+            terms.append(email)
+            terms.append(email.split('@', 1)[0])
+        return list(dict.fromkeys(t for t in terms if t))
+
+    @staticmethod
+    def search(text, extra_filter, limit=20):
+        """
+        Gợi ý đơn vị theo tiền tố (không phân biệt dấu) trên tên, mã, email; dùng index search_terms.
+        Khớp nếu cả chuỗi là tiền tố của một term, hoặc mỗi từ trong chuỗi là tiền tố của một term.
+        """
+        import re
+        from utils.vietnamese import normalize_text, tokenize
+        db = get_db()
+        query = dict(extra_filter)
+        phrase = normalize_text(text)
+        if phrase:
+            conditions = [{'search_terms': {'$regex': '^' + re.escape(phrase)}}]
+            tokens = tokenize(text)[:5]
+            if len(tokens) > 1:
+                conditions.append({'$and': [
+                    {'search_terms': {'$regex': '^' + re.escape(token)}} for token in tokens
+                ]})
+            query = {'$and': [query, {'$or': conditions}]} if query else {'$or': conditions}
+        return list(db.units.find(query, {'search_terms': 0}).sort('name', 1).limit(limit))
+
     @staticmethod
     def get_all_by_user(user_id):
         """
@@ -42,14 +115,29 @@ class Unit:
         db = get_db()
         return list(db.units.find().sort('created_at', -1))
 
+    @staticmethod
+    def get_by_department(department_id):
+        """
+        Lấy các đơn vị thuộc một phòng ban (dùng index department_id).
+        """
+        db = get_db()
+        if not department_id:
+            return []
+        try:
+            return list(db.units.find(department_filter(department_id)).sort('created_at', -1))
+        except ValueError:
+            return []
+
     @staticmethod
     def get_by_id(unit_id):
         db = get_db()
         from bson import ObjectId
-        try:
-            return db.units.find_one({'_id': ObjectId(unit_id)})
-        except Exception:
-            return None
+        def load():
+            try:
+                return db.units.find_one({'_id': ObjectId(unit_id)})
+            except Exception:
+                return None
+        return get_cache('units').get(unit_id, load)
 
     @staticmethod
     def get_by_id_for_user(unit_id, user_id):
@@ -70,6 +158,20 @@ class Unit:
         except Exception:
             return []
 
+    @staticmethod
+    def get_by_ids_in_department(unit_ids, department_id):
+        db = get_db()
+        from bson import ObjectId
+        if not department_id:
+            return []
+        try:
+            object_ids = [ObjectId(uid) for uid in unit_ids]
+            query = department_filter(department_id)
+            query['_id'] = {'$in': object_ids}
+            return list(db.units.find(query))
+        except Exception:
+            return []
+
     @staticmethod
     def get_by_ids_for_user(unit_ids, user_id):
         db = get_db()
@@ -92,11 +194,18 @@ class Unit:
             data['updated_at'] = datetime.utcnow()
             if 'code' in data:
                 data['code'] = data['code'].upper()
+            normalize_department(data)
+            if any(field in data for field in ('name', 'code', 'email')):
+                current = db.units.find_one({'_id': ObjectId(unit_id)}, {'name': 1, 'code': 1, 'email': 1}) or {}
+                merged = {field: data.get(field, current.get(field)) for field in ('name', 'code', 'email')}
+                data['search_terms'] = Unit.search_terms(merged['name'], merged['code'], merged['email'])
 
             result = db.units.update_one(
                 {'_id': ObjectId(unit_id), 'user_id': user_id},
                 {'$set': data}
             )
+            if result.modified_count > 0:
+                get_cache('units').invalidate(unit_id)
             return result.modified_count > 0, None
         except DuplicateKeyError as e:
             field = str(e).split('index: ')[1].split('_')[0] if 'index:' in str(e) else 'field'
@@ -110,6 +219,8 @@ class Unit:
         from bson import ObjectId
         try:
             result = db.units.delete_one({'_id': ObjectId(unit_id), 'user_id': user_id})
+            if result.deleted_count > 0:
+                get_cache('units').invalidate(unit_id)
             return result.deleted_count > 0
         except Exception:
             return False
@@ -123,6 +234,8 @@ class Unit:
         from bson import ObjectId
         try:
             result = db.units.delete_one({'_id': ObjectId(unit_id)})
+            if result.deleted_count > 0:
+                get_cache('units').invalidate(unit_id)
             return result.deleted_count > 0
         except Exception:
             return False
@@ -133,6 +246,7 @@ class Unit:
             return None
         unit['id'] = str(unit['_id'])
         del unit['_id']
+        unit.pop('search_terms', None)
         if 'user_id' in unit and unit['user_id']:
             unit['user_id'] = str(unit['user_id'])
         if 'department_id' in unit and unit['department_id']:
@@ -1,27 +1,77 @@
 from datetime import datetime
 from config.database import get_db
-import bcrypt
+from models.ids import object_id, department_filter
+from models.cache import get_cache
+from utils.passwords import PasswordHashBusy, check_password, hash_password
 
 class User:
     @staticmethod
     def create(username, password, role='employee', department_id=None, created_by=None, name=None, birth_date=None, phone=None):
         db = get_db()
         from bson import ObjectId
-        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
         user = {
             'username': username,
-            'password': hashed.decode('utf-8'),
+            'password': hash_password(password),
             'role': role,
-            'department_id': ObjectId(department_id) if department_id and isinstance(department_id, str) else (department_id if department_id else None),
+            'department_id': object_id(department_id),
             'created_by': ObjectId(created_by) if created_by and isinstance(created_by, str) else (created_by if created_by else None),
             'name': name,
             'birth_date': birth_date,
             'phone': phone,
+            'search_terms': User.search_terms(username, name, phone),
+            'token_version': 0,
             'created_at': datetime.utcnow()
         }
         result = db.users.insert_one(user)
         return str(result.inserted_id)
     
+    @staticmethod
+    def search_terms(username, name=None, phone=None):
+        """
+        Các term đã bỏ dấu để tìm theo tiền tố: username, từng từ của họ tên, số điện thoại.
+        """
+        from utils.vietnamese import normalize_text, tokenize
+        terms = []
+        if username:
+            terms.append(normalize_text(username))
+        if name:
+            terms.append(normalize_text(name))
+            terms.extend(tokenize(name))
+        if phone:
+            terms.append(''.join(ch for ch in str(phone) if ch.isdigit()))
+        return list(dict.fromkeys(t for t in terms if t))
+    
+    @staticmethod
+    def list_page(query, after=None, limit=50):
+        """
+        Một trang người dùng (mới nhất trước) kèm phòng ban trong một aggregation.
+        Phân trang keyset theo _id: trả về (danh sách, cursor trang sau hoặc None).
+        """
+        db = get_db()
+        from bson import ObjectId
+        match = dict(query)
+        if after:
+            match['_id'] = {'$lt': ObjectId(after)}
+        pipeline = [
+            {'$match': match},
+            {'$sort': {'_id': -1}},
+            {'$limit': limit + 1},
+            {'$project': {'password': 0, 'search_terms': 0}},
+            {'$lookup': {
+                'from': 'departments',
+                'localField': 'department_id',
+                'foreignField': '_id',
+                'as': 'department'
+            }},
+            {'$unwind': {'path': '$department', 'preserveNullAndEmptyArrays': True}}
+        ]
+        users = list(db.users.aggregate(pipeline))
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = str(users[-1]['_id'])
+        return users, next_cursor
+    
     @staticmethod
     def get_by_username(username):
         db = get_db()
@@ -31,10 +81,28 @@ class User:
     def get_by_id(user_id):
         db = get_db()
         from bson import ObjectId
-        try:
-            return db.users.find_one({'_id': ObjectId(user_id)})
-        except:
-            return None
+        def load():
+            try:
+                return db.users.find_one({'_id': ObjectId(user_id)})
+            except:
+                return None
+        return get_cache('users').get(user_id, load)
+    
+    @staticmethod
+    def get_token_version(user_id):
+        """
+        token_version hiện tại của user (None nếu user không tồn tại), qua cache để kiểm tra token mỗi request.
+        """
+        db = get_db()
+        from bson import ObjectId
+        def load():
+            try:
+                user = db.users.find_one({'_id': ObjectId(user_id)}, {'token_version': 1})
+            except:
+                return None
+            return {'token_version': user.get('token_version', 0)} if user else None
+        version = get_cache('token_versions').get(user_id, load)
+        return version['token_version'] if version else None
     
     @staticmethod
     def get_all():
@@ -53,14 +121,7 @@ class User:
         try:
             if not department_id:
                 return []
-            dept_obj_id = ObjectId(department_id) if isinstance(department_id, str) else department_id
-            dept_str_id = str(department_id)
-            return list(db.users.find({
-                '$or': [
-                    {'department_id': dept_obj_id},
-                    {'department_id': dept_str_id}
-                ]
-            }).sort('created_at', -1))
+            return list(db.users.find(department_filter(department_id)).sort('created_at', -1))
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -72,16 +133,31 @@ class User:
         from bson import ObjectId
         try:
             data['updated_at'] = datetime.utcnow()
-            if 'department_id' in data and data['department_id']:
-                data['department_id'] = ObjectId(data['department_id']) if isinstance(data['department_id'], str) else data['department_id']
-            elif 'department_id' in data and data['department_id'] is None:
-                data['department_id'] = None
+            if 'department_id' in data:
+                data['department_id'] = object_id(data['department_id'])
             if 'created_by' in data and data['created_by']:
                 data['created_by'] = ObjectId(data['created_by']) if isinstance(data['created_by'], str) else data['created_by']
+            update = {'$set': data}
+            watched = [field for field in ('username', 'name', 'phone', 'role', 'department_id', 'password') if field in data]
+            if watched:
+                current = db.users.find_one(
+                    {'_id': ObjectId(user_id)},
+                    {'username': 1, 'name': 1, 'phone': 1, 'role': 1, 'department_id': 1, 'password': 1}
+                ) or {}
+                if any(field in data for field in ('username', 'name', 'phone')):
+                    merged = {field: data.get(field, current.get(field)) for field in ('username', 'name', 'phone')}
+                    data['search_terms'] = User.search_terms(merged['username'], merged['name'], merged['phone'])
+                # Đổi role, phòng ban hoặc mật khẩu làm các token đã cấp hết hiệu lực
+                if any(field in data and data[field] != current.get(field) for field in ('role', 'department_id', 'password')):
+                    update['$inc'] = {'token_version': 1}
             result = db.users.update_one(
                 {'_id': ObjectId(user_id)},
-                {'$set': data}
+                update
             )
+            if result.modified_count > 0:
+                get_cache('users').invalidate(user_id)
+                if '$inc' in update:
+                    get_cache('token_versions').invalidate(user_id)
             return result.modified_count > 0
         except:
             return False
@@ -92,13 +168,36 @@ class User:
         from bson import ObjectId
         try:
             result = db.users.delete_one({'_id': ObjectId(user_id)})
+            if result.deleted_count > 0:
+                get_cache('users').invalidate(user_id)
+                get_cache('token_versions').invalidate(user_id)
             return result.deleted_count > 0
         except:
             return False
     
     @staticmethod
     def verify_password(stored_password, provided_password):
-        return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password.encode('utf-8'))
+        return check_password(stored_password, provided_password)
+    
+    @staticmethod
+    def rehash_password(user_id, stored_password, provided_password):
+        """
+        Băm lại mật khẩu với BCRYPT_ROUNDS hiện tại sau khi đăng nhập đúng.
+        Không tăng token_version vì mật khẩu không đổi; pool đang bận thì để lần đăng nhập sau.
+        """
+        db = get_db()
+        from bson import ObjectId
+        try:
+            hashed = hash_password(provided_password)
+        except PasswordHashBusy:
+            return False
+        result = db.users.update_one(
+            {'_id': ObjectId(user_id), 'password': stored_password},
+            {'$set': {'password': hashed}}
+        )
+        if result.modified_count > 0:
+            get_cache('users').invalidate(user_id)
+        return result.modified_count > 0
     
     # @staticmethod
     # def init_default_user():
@@ -115,6 +214,8 @@ class User:
         del user_dict['_id']
         if 'password' in user_dict:
             del user_dict['password']
+        user_dict.pop('search_terms', None)
+        user_dict.pop('token_version', None)
         if 'created_at' in user_dict and user_dict['created_at']:
             if isinstance(user_dict['created_at'], datetime):
                 user_dict['created_at'] = user_dict['created_at'].isoformat()
@@ -1,13 +1,68 @@
 import os
 import json
+import queue
+import threading
 from flask import Blueprint, request, jsonify, Response, stream_with_context
 from models.unit import Unit
 from models.document import Document
-from utils.jwt_helper import jwt_required as auth_required, get_current_user
-from utils.ai_service import suggest_units_from_document, suggest_units_from_document_streaming, extract_text_from_file
+from models.history import History
+from utils.jwt_helper import jwt_required as auth_required, get_current_user, get_current_claims
+from utils.ai_service import suggest_units_from_document, suggest_units_from_document_streaming, suggest_units_speculative, extract_text_from_file
+from utils.extraction_sandbox import extract_text_safely, max_workers as extraction_workers
+from utils.suggestion_model import blend_suggestions, confident_units, predict_units
 
 ai_bp = Blueprint('ai', __name__)
 
+BATCH_MAX_DOCUMENTS = 100
+BATCH_BUSY_RETRIES = 2
+STREAM_KEEPALIVE_SECONDS = 10
+
+def _can_access_document(user_id, current_user, document):
+    user_role = current_user.get('role', 'employee')
+    user_department_id = current_user.get('department_id')
+    document_department_id = document.get('department_id')
+    
+    if user_role == 'director':
+        return True
+    if user_role == 'department_head' and user_department_id:
+        return bool(document_department_id) and str(document_department_id) == str(user_department_id)
+    if user_role == 'employee':
+        if str(document.get('user_id')) == str(user_id):
+            return True
+        return bool(user_department_id and document_department_id) and str(document_department_id) == str(user_department_id)
+    return False
+
+def _get_visible_units(user_id, current_user):
+    user_role = current_user.get('role', 'employee')
+    user_department_id = current_user.get('department_id')
+    
+    if user_role == 'director':
+        return Unit.get_all()
+    if user_role == 'department_head' or user_role == 'employee':
+        if not user_department_id:
+            return Unit.get_all_by_user(user_id) if user_role == 'employee' else []
+        return Unit.get_by_department(user_department_id)
+    return Unit.get_all_by_user(user_id)
+
+def _history_result(document, units_with_id):
+    """
+    Dự đoán từ mô hình lịch sử gửi. Trả về (kết quả nếu đủ tin cậy để bỏ qua LLM, predictions).
+    """
+    try:
+        predictions, support = predict_units(document, units_with_id)
+    except Exception:
+        return None, []
+    suggested_ids = confident_units(predictions, support)
+    if not suggested_ids:
+        return None, predictions
+    return {
+        'suggested_ids': suggested_ids[:5],
+        'has_suggestions': True,
+        'message': 'Gợi ý theo lịch sử gửi các tài liệu tương tự',
+        'is_fallback': False,
+        'source': 'history'
+    }, predictions
+
 @ai_bp.route('/suggest-units', methods=['POST'])
 @auth_required
 def suggest_units_endpoint():
@@ -34,6 +89,20 @@ def suggest_units_endpoint():
                 'message': 'Không có đơn vị phù hợp'
             }), 200
         
+        history_result, predictions = _history_result(document, units_with_id)
+        if history_result:
+            return jsonify(dict(
+                history_result,
+                suggested_units=[unit for unit in units_with_id if unit['id'] in history_result['suggested_ids']],
+                chunk_index=0,
+                total_chunks=0,
+                is_final=True,
+                extracted_content=None,
+                extracted_length=0,
+                token_usage=None,
+                retry_after=None
+            )), 200
+        
         filepath = document.get('filepath', '')
         extracted_content = extract_text_from_file(filepath) if filepath else None
         
@@ -41,7 +110,7 @@ def suggest_units_endpoint():
         last_result = None
         has_first_success = False
         
-        for result in suggest_units_from_document_streaming(document, units_with_id):
+        for result in suggest_units_from_document_streaming(document, units_with_id, extracted_content):
             last_result = result
             
             if result.get('chunk_index', 0) > 0:
@@ -51,7 +120,7 @@ def suggest_units_endpoint():
             if result.get('is_fallback', False):
                 break
         
-        final_suggested_ids = list(final_suggested_ids)[:5] if final_suggested_ids else []
+        final_suggested_ids = blend_suggestions(list(final_suggested_ids)[:5], predictions)
         suggested_units = [unit for unit in units_with_id if unit['id'] in final_suggested_ids]
         
         return jsonify({
@@ -64,7 +133,9 @@ def suggest_units_endpoint():
             'total_chunks': last_result.get('total_chunks', 1) if last_result else 1,
             'is_final': True,
             'extracted_content': extracted_content[:1000] if extracted_content else None,
-            'extracted_length': len(extracted_content) if extracted_content else 0
+            'extracted_length': len(extracted_content) if extracted_content else 0,
+            'token_usage': last_result.get('token_usage') if last_result else None,
+            'retry_after': last_result.get('retry_after') if last_result else None
         }), 200
     
     except:
@@ -74,9 +145,8 @@ def suggest_units_endpoint():
 @auth_required
 def suggest_units_stream_endpoint():
     try:
-        from models.user import User
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 404
         
@@ -90,37 +160,12 @@ def suggest_units_stream_endpoint():
         if not document:
             return jsonify({'message': 'Không tìm thấy tài liệu'}), 404
         
-        user_role = current_user.get('role', 'employee')
-        user_department_id = current_user.get('department_id')
-        
-        can_access = False
-        if user_role == 'director':
-            can_access = True
-        elif user_role == 'department_head' and user_department_id:
-            if document.get('department_id') and str(document.get('department_id')) == str(user_department_id):
-                can_access = True
-        elif user_role == 'employee':
-            if document.get('user_id') == user_id:
-                can_access = True
-            elif user_department_id and document.get('department_id') and str(document.get('department_id')) == str(user_department_id):
-                can_access = True
+        can_access = _can_access_document(user_id, current_user, document)
         
         if not can_access:
             return jsonify({'message': 'Bạn không có quyền truy cập tài liệu này'}), 403
         
-        if user_role == 'director':
-            all_units = Unit.get_all()
-        elif user_role == 'department_head' or user_role == 'employee':
-            if not user_department_id:
-                if user_role == 'employee':
-                    all_units = Unit.get_all_by_user(user_id)
-                else:
-                    all_units = []
-            else:
-                all_units_list = Unit.get_all()
-                all_units = [u for u in all_units_list if u.get('department_id') and str(u.get('department_id')) == str(user_department_id)]
-        else:
-            all_units = Unit.get_all_by_user(user_id)
+        all_units = _get_visible_units(user_id, current_user)
         
         units_with_id = [Unit.to_dict(unit) for unit in all_units]
         
@@ -129,69 +174,267 @@ def suggest_units_stream_endpoint():
                 yield f"data: {json.dumps({'suggested_units': [], 'suggested_ids': [], 'has_suggestions': False, 'message': 'Không có đơn vị phù hợp', 'is_final': True})}\n\n"
             return Response(stream_with_context(generate()), mimetype='text/event-stream')
         
-        filepath = document.get('filepath', '')
-        extracted_content = extract_text_from_file(filepath) if filepath else None
+        # Event đầu tiên chỉ dùng dữ liệu đã có trong bộ nhớ; mô hình lịch sử tính sau trong produce()
+        frequent_units = History.peek_frequent_units(user_id)
+        keepalive_seconds = float(os.getenv('AI_STREAM_KEEPALIVE', STREAM_KEEPALIVE_SECONDS))
         
-        def generate():
-            all_suggested_ids = set()
-            has_first_success = False
-            
+        def speculative_event(predictions=None):
+            result = suggest_units_speculative(document.get('name', ''), units_with_id, frequent_units, history_predictions=predictions)
+            return {
+                'suggested_units': [unit for unit in units_with_id if unit['id'] in result['suggested_ids']],
+                'suggested_ids': result['suggested_ids'],
+                'has_suggestions': result['has_suggestions'],
+                'message': result['message'],
+                'is_fallback': False,
+                'is_speculative': True,
+                'chunk_index': 0,
+                'total_chunks': 0,
+                'is_final': False
+            }
+        
+        def produce(events, cancelled):
+            """
+            Chạy trong thread riêng: extract + gọi LLM, đẩy từng event vào queue.
+            """
             try:
-                for result in suggest_units_from_document_streaming(document, units_with_id):
+                history_result, predictions = _history_result(document, units_with_id)
+                if history_result:
+                    events.put(dict(
+                        history_result,
+                        suggested_units=[unit for unit in units_with_id if unit['id'] in history_result['suggested_ids']],
+                        is_speculative=False,
+                        chunk_index=0,
+                        total_chunks=0,
+                        is_final=True
+                    ))
+                    return
+                if predictions:
+                    events.put(speculative_event(predictions))
+                
+                filepath = document.get('filepath', '')
+                extracted_content = extract_text_from_file(filepath) if filepath else None
+                all_suggested_ids = set()
+                
+                for result in suggest_units_from_document_streaming(document, units_with_id, extracted_content):
+                    if cancelled.is_set():
+                        return
                     if result.get('chunk_index', 0) > 0:
                         all_suggested_ids.update(result.get('suggested_ids', []))
-                        has_first_success = True
+                        suggested_ids = blend_suggestions(list(all_suggested_ids)[:5], predictions)
                         
-                        suggested_units = [unit for unit in units_with_id if unit['id'] in list(all_suggested_ids)[:5]]
+                        suggested_units = [unit for unit in units_with_id if unit['id'] in suggested_ids]
                         
-                        response_data = {
+                        events.put({
                             'suggested_units': suggested_units,
-                            'suggested_ids': list(all_suggested_ids)[:5],
-                            'has_suggestions': len(all_suggested_ids) > 0,
+                            'suggested_ids': suggested_ids,
+                            'has_suggestions': len(suggested_ids) > 0,
                             'message': result.get('message', ''),
                             'is_fallback': result.get('is_fallback', False),
+                            'is_speculative': False,
                             'chunk_index': result.get('chunk_index', 0),
                             'total_chunks': result.get('total_chunks', 1),
                             'is_final': result.get('is_final', False),
                             'extracted_content': extracted_content[:1000] if extracted_content else None,
-                            'extracted_length': len(extracted_content) if extracted_content else 0
-                        }
-                        
-                        yield f"data: {json.dumps(response_data)}\n\n"
+                            'extracted_length': len(extracted_content) if extracted_content else 0,
+                            'token_usage': result.get('token_usage')
+                        })
                         
                         if result.get('is_final', False):
-                            break
+                            return
                     elif result.get('is_fallback', False):
-                        response_data = {
+                        events.put({
                             'suggested_units': [unit for unit in units_with_id if unit['id'] in result.get('suggested_ids', [])],
                             'suggested_ids': result.get('suggested_ids', []),
                             'has_suggestions': result.get('has_suggestions', False),
                             'message': result.get('message', ''),
                             'is_fallback': True,
+                            'is_speculative': False,
                             'chunk_index': 0,
                             'total_chunks': 1,
                             'is_final': True,
                             'extracted_content': extracted_content[:1000] if extracted_content else None,
-                            'extracted_length': len(extracted_content) if extracted_content else 0
-                        }
-                        yield f"data: {json.dumps(response_data)}\n\n"
-                        break
+                            'extracted_length': len(extracted_content) if extracted_content else 0,
+                            'retry_after': result.get('retry_after')
+                        })
+                        return
             except Exception:
-                error_data = {
+                events.put({
                     'suggested_units': [],
                     'suggested_ids': [],
                     'has_suggestions': False,
                     'message': 'Lỗi xử lý',
                     'is_fallback': True,
                     'is_final': True
+                })
+            finally:
+                events.put(None)
+        
+        def generate():
+            yield f"data: {json.dumps(speculative_event())}\n\n"
+            
+            events = queue.Queue()
+            cancelled = threading.Event()
+            threading.Thread(target=produce, args=(events, cancelled), daemon=True).start()
+            sent_final = False
+            try:
+                while True:
+                    try:
+                        event = events.get(timeout=keepalive_seconds)
+                    except queue.Empty:
+                        # Comment SSE giữ kết nối qua proxy trong lúc chờ extract/LLM
+                        yield ": keepalive\n\n"
+                        continue
+                    if event is None:
+                        break
+                    sent_final = sent_final or event.get('is_final', False)
+                    yield f"data: {json.dumps(event)}\n\n"
+                    if event.get('is_final', False):
+                        break
+            finally:
+                cancelled.set()
+            
+            if not sent_final:
+                yield f"data: {json.dumps({'suggested_units': [], 'suggested_ids': [], 'has_suggestions': False, 'message': 'Không có đơn vị phù hợp', 'is_fallback': True, 'is_final': True})}\n\n"
+        
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
+    except Exception:
+        return jsonify({'message': 'Lỗi gợi ý đơn vị'}), 500
+
+@ai_bp.route('/suggest-units-batch', methods=['POST'])
+@auth_required
+def suggest_units_batch_endpoint():
+    try:
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        user_id = get_current_user()
+        current_user = get_current_claims()
+        if not current_user:
+            return jsonify({'message': 'Người dùng không tồn tại'}), 404
+        
+        data = request.get_json() or {}
+        document_ids = list(dict.fromkeys(data.get('document_ids') or []))
+        output_format = (data.get('format') or request.args.get('format') or 'ndjson').lower()
+        
+        if not document_ids:
+            return jsonify({'message': 'Vui lòng cung cấp danh sách ID tài liệu'}), 400
+        if len(document_ids) > BATCH_MAX_DOCUMENTS:
+            return jsonify({'message': f'Chỉ được gợi ý tối đa {BATCH_MAX_DOCUMENTS} tài liệu mỗi lần'}), 400
+        
+        units_with_id = [Unit.to_dict(unit) for unit in _get_visible_units(user_id, current_user)]
+        units_by_id = {unit['id']: unit for unit in units_with_id}
+        
+        found = {str(document['_id']): document for document in Document.get_by_ids(document_ids)}
+        documents = {}
+        errors = []
+        for document_id in document_ids:
+            document = found.get(str(document_id).lower())
+            if not document:
+                errors.append({'document_id': document_id, 'message': 'Không tìm thấy tài liệu'})
+            elif not _can_access_document(user_id, current_user, document):
+                errors.append({'document_id': document_id, 'message': 'Bạn không có quyền truy cập tài liệu này'})
+            else:
+                documents[document_id] = document
+        
+        def suggest_one(document_id, document):
+            history_result, predictions = _history_result(document, units_with_id)
+            extracted_content = None
+            failure_reason = None
+            if history_result:
+                result = history_result
+            else:
+                filepath = document.get('filepath', '')
+                if filepath:
+                    # Sandbox bận (request khác đang extract) thì thử lại thay vì gợi ý chỉ theo tên file
+                    for _ in range(BATCH_BUSY_RETRIES + 1):
+                        extracted_content, failure_reason = extract_text_safely(filepath)
+                        if failure_reason != 'busy':
+                            break
+                result = suggest_units_from_document(document, units_with_id, extracted_content or '')
+            suggested_ids = blend_suggestions(result.get('suggested_ids', []), predictions)
+            return {
+                'document_id': document_id,
+                'document_name': document.get('name', ''),
+                'suggested_units': [units_by_id[uid] for uid in suggested_ids if uid in units_by_id],
+                'suggested_ids': suggested_ids,
+                'has_suggestions': len(suggested_ids) > 0,
+                'message': result.get('message', ''),
+                'is_fallback': result.get('is_fallback', False),
+                'source': result.get('source'),
+                'extracted_length': len(extracted_content) if extracted_content else 0,
+                'extraction_failure': failure_reason,
+                'is_degraded': not history_result and not extracted_content,
+                'token_usage': result.get('token_usage'),
+                'retry_after': result.get('retry_after')
+            }
+        
+        def encode(item):
+            if output_format == 'sse':
+                return f"data: {json.dumps(item)}\n\n"
+            return json.dumps(item) + "\n"
+        
+        def generate():
+            completed = 0
+            for error in errors:
+                completed += 1
+                yield encode(dict(error, has_suggestions=False, suggested_ids=[], suggested_units=[]))
+            
+            # Không chạy song song nhiều hơn số slot sandbox, nếu không các tài liệu dư sẽ bị 'busy'
+            max_workers = max(1, min(int(os.getenv('AI_BATCH_CONCURRENCY', 4)), extraction_workers(), len(documents) or 1))
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            try:
+                futures = {
+                    executor.submit(suggest_one, document_id, document): document_id
+                    for document_id, document in documents.items()
                 }
-                yield f"data: {json.dumps(error_data)}\n\n"
+                for future in as_completed(futures):
+                    completed += 1
+                    try:
+                        yield encode(future.result())
+                    except Exception:
+                        yield encode({
+                            'document_id': futures[future],
+                            'message': 'Lỗi gợi ý đơn vị',
+                            'has_suggestions': False,
+                            'suggested_ids': [],
+                            'suggested_units': []
+                        })
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+            
+            yield encode({'is_final': True, 'total': len(document_ids), 'completed': completed})
         
-        return Response(stream_with_context(generate()), mimetype='text/event-stream')
+        mimetype = 'text/event-stream' if output_format == 'sse' else 'application/x-ndjson'
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
     
     except Exception:
         return jsonify({'message': 'Lỗi gợi ý đơn vị'}), 500
 
+@ai_bp.route('/usage', methods=['GET'])
+@auth_required
+def ai_usage_endpoint():
+    try:
+        from datetime import datetime, timedelta
+        current_user = get_current_claims()
+        if current_user.get('role') != 'director':
+            return jsonify({'message': 'Chỉ giám đốc mới có quyền xem thống kê token AI'}), 403
+        
+        try:
+            days = min(max(int(request.args.get('days', 7)), 1), 90)
+        except ValueError:
+            return jsonify({'message': 'Tham số days không hợp lệ'}), 400
+        
+        since = datetime.utcnow() - timedelta(days=days)
+        return jsonify({'days': days, 'usage': History.get_ai_usage_summary(since)}), 200
+    
+    except Exception as e:
+        return jsonify({'message': 'Lỗi thống kê token AI', 'error': str(e)}), 500
+
 @ai_bp.route('/preview-content', methods=['POST'])
 @auth_required
 def preview_content_endpoint():
@@ -214,17 +457,22 @@ def preview_content_endpoint():
                 'message': 'Không tìm thấy đường dẫn file'
             }), 200
         
-        extracted_content = extract_text_from_file(filepath)
+        extracted_content, failure_reason = extract_text_safely(filepath)
         
         if not extracted_content:
             file_ext = os.path.splitext(filepath)[1].lower()
             message = 'Không thể extract nội dung text từ file này.'
-            if file_ext == '.pdf':
+            if failure_reason in ('timeout', 'memory_limit') or (failure_reason or '').startswith('crashed'):
+                message += ' File quá phức tạp hoặc bị lỗi nên đã bị dừng xử lý.'
+            elif failure_reason == 'busy':
+                message += ' Hệ thống đang bận, vui lòng thử lại sau.'
+            elif file_ext == '.pdf':
                 message += ' File PDF này có thể là file ảnh (scanned PDF) hoặc không chứa text có thể đọc được.'
             
             return jsonify({
                 'extracted_content': None,
                 'message': message,
+                'reason': failure_reason,
                 'document_name': document.get('name', '')
             }), 200
         
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models.user import User
-from utils.jwt_helper import generate_token
+from utils.background import submit_task
+from utils.jwt_helper import generate_token, generate_refresh_token, token_revoked
+from utils.passwords import PasswordHashBusy, needs_rehash
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -16,15 +18,13 @@ def login():
         
         user = User.get_by_username(username)
         
-        if not user:
-            User.init_default_user()
-            user = User.get_by_username(username)
-        
         if user and User.verify_password(user['password'], password):
-            token = generate_token(str(user['_id']))
+            if needs_rehash(user['password']):
+                submit_task(User.rehash_password, str(user['_id']), user['password'], password)
             return jsonify({
                 'message': 'Đăng nhập thành công',
-                'token': token,
+                'token': generate_token(user),
+                'refresh_token': generate_refresh_token(user),
                 'user': {
                     'id': str(user['_id']),
                     'username': user['username'],
@@ -35,6 +35,8 @@ def login():
         else:
             return jsonify({'message': 'Tên đăng nhập hoặc mật khẩu không đúng'}), 401
     
+    except PasswordHashBusy:
+        return jsonify({'message': 'Hệ thống đang bận, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': 'Lỗi đăng nhập', 'error': str(e)}), 500
 
@@ -72,12 +74,12 @@ def register():
             }), 400
         
         user_id = User.create(username, password, role='employee')
-        token = generate_token(user_id)
         user = User.get_by_id(user_id)
         
         return jsonify({
             'message': 'Đăng ký thành công',
-            'token': token,
+            'token': generate_token(user),
+            'refresh_token': generate_refresh_token(user),
             'user': {
                 'id': user_id,
                 'username': username,
@@ -86,6 +88,8 @@ def register():
             }
         }), 201
     
+    except PasswordHashBusy:
+        return jsonify({'message': 'Hệ thống đang bận, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({
             'message': 'Lỗi đăng ký',
@@ -99,6 +103,8 @@ def verify():
     from models.user import User
     try:
         verify_jwt_in_request()
+        if token_revoked():
+            return jsonify({'valid': False}), 401
         user_id = get_jwt_identity()
         user = User.get_by_id(user_id)
         if user:
@@ -116,3 +122,19 @@ def verify():
     except:
         return jsonify({'valid': False}), 401
 
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+    try:
+        verify_jwt_in_request(refresh=True)
+    except Exception as e:
+        return jsonify({'message': 'Refresh token không hợp lệ', 'error': str(e)}), 401
+    try:
+        if token_revoked():
+            return jsonify({'message': 'Phiên đăng nhập đã hết hiệu lực, vui lòng đăng nhập lại'}), 401
+        user = User.get_by_id(get_jwt_identity())
+        if not user:
+            return jsonify({'message': 'Người dùng không tồn tại'}), 401
+        return jsonify({'token': generate_token(user)}), 200
+    except Exception as e:
+        return jsonify({'message': 'Lỗi làm mới token', 'error': str(e)}), 500
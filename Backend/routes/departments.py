@@ -1,13 +1,14 @@
 from flask import Blueprint, request, jsonify
 from models.department import Department
 from models.user import User
-from utils.jwt_helper import jwt_required as auth_required, get_current_user
+from utils.cascade import enqueue_cascade
+from utils.jwt_helper import jwt_required as auth_required, get_current_user, get_current_claims
 
 departments_bp = Blueprint('departments', __name__)
 
 def require_director():
     user_id = get_current_user()
-    user = User.get_by_id(user_id)
+    user = get_current_claims()
     if not user or user.get('role') != 'director':
         return None
     return user
@@ -20,14 +21,13 @@ def get_departments():
         if not user:
             return jsonify({'message': 'Chỉ giám đốc mới có quyền xem danh sách phòng ban'}), 403
         
-        departments = Department.get_all()
+        departments = Department.get_overview()
         result = []
         for dept in departments:
+            head = dept.pop('head', None)
             dept_dict = Department.to_dict(dept)
-            if dept_dict.get('head_id'):
-                head = User.get_by_id(dept_dict['head_id'])
-                if head:
-                    dept_dict['head'] = User.to_dict(head)
+            if head:
+                dept_dict['head'] = User.to_dict(head)
             result.append(dept_dict)
         return jsonify({'departments': result}), 200
     except Exception as e:
@@ -138,7 +138,8 @@ def delete_department(dept_id):
         
         success = Department.delete(dept_id)
         if success:
-            return jsonify({'message': 'Xóa phòng ban thành công'}), 200
+            job_id = enqueue_cascade('department', {'id': dept_id})
+            return jsonify({'message': 'Xóa phòng ban thành công', 'job_id': job_id}), 200
         else:
             return jsonify({'message': 'Xóa phòng ban thất bại'}), 400
     except Exception as e:
@@ -1,8 +1,13 @@
 from flask import Blueprint, request, jsonify, send_file
 from models.document import Document
 from models.user import User
+from models.ids import department_filter
 from config.database import get_db
-from utils.jwt_helper import jwt_required as auth_required, get_current_user
+from utils.jwt_helper import jwt_required as auth_required, get_current_user, get_current_claims
+from utils.search_index import build_text_query, find_duplicates, schedule_index, search_fields
+from utils.extraction_sandbox import file_hash
+from utils.cascade import enqueue_cascade
+from utils.previews import artifact_path, preview_status, schedule_preview, schedule_previews, supports
 import os
 from werkzeug.utils import secure_filename
 from datetime import datetime
@@ -12,6 +17,7 @@ documents_bp = Blueprint('documents', __name__)
 
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx'}
+PREVIEW_MAX_AGE = 365 * 24 * 3600
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
@@ -25,45 +31,63 @@ def get_file_size(size_bytes):
     else:
         return f"{(size_bytes / 1024):.0f} KB"
 
+def _visibility_filter(user_id, current_user):
+    """
+    Điều kiện Mongo giới hạn các tài liệu người dùng được xem, theo vai trò.
+    """
+    from bson import ObjectId
+    user_role = current_user.get('role', 'employee')
+    user_department_id = current_user.get('department_id')
+    user_obj_id = ObjectId(user_id) if isinstance(user_id, str) else user_id
+    
+    if user_role == 'director':
+        return {}
+    if user_role == 'department_head' and user_department_id:
+        dept_users = User.get_by_department(user_department_id)
+        department_user_ids = [ObjectId(u['_id']) if isinstance(u['_id'], str) else u['_id'] for u in dept_users]
+        department_user_ids.append(user_obj_id)
+        return {
+            '$or': [
+                {'user_id': {'$in': department_user_ids}},
+                department_filter(user_department_id)
+            ]
+        }
+    if user_department_id:
+        return {
+            '$or': [
+                {'user_id': user_obj_id},
+                department_filter(user_department_id)
+            ]
+        }
+    return {'user_id': user_obj_id}
+
+def _can_view_document(user_id, current_user, document):
+    user_role = current_user.get('role', 'employee')
+    
+    if user_role == 'director':
+        return True
+    if str(document.get('user_id')) == str(user_id):
+        return True
+    if user_role == 'department_head':
+        doc_owner = User.get_by_id(document.get('user_id'))
+        return bool(doc_owner) and str(doc_owner.get('department_id')) == str(current_user.get('department_id'))
+    return False
+
 @documents_bp.route('', methods=['GET'])
 @auth_required
 def get_documents():
     try:
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
         
-        user_role = current_user.get('role', 'employee')
-        user_department_id = current_user.get('department_id')
-        
         db = get_db()
-        from bson import ObjectId
-        
-        if user_role == 'director':
-            documents = list(db.documents.find().sort('created_at', -1))
-        elif user_role == 'department_head' and user_department_id:
-            dept_users = User.get_by_department(user_department_id)
-            department_user_ids = [ObjectId(u['_id']) if isinstance(u['_id'], str) else u['_id'] for u in dept_users]
-            department_user_ids.append(ObjectId(user_id) if isinstance(user_id, str) else user_id)
-            documents = list(db.documents.find({
-                '$or': [
-                    {'user_id': {'$in': department_user_ids}},
-                    {'department_id': ObjectId(user_department_id) if isinstance(user_department_id, str) else user_department_id}
-                ]
-            }).sort('created_at', -1))
-        else:
-            if user_department_id:
-                dept_obj_id = ObjectId(user_department_id) if isinstance(user_department_id, str) else user_department_id
-                documents = list(db.documents.find({
-                    '$or': [
-                        {'user_id': ObjectId(user_id) if isinstance(user_id, str) else user_id},
-                        {'department_id': dept_obj_id}
-                    ]
-                }).sort('created_at', -1))
-            else:
-                documents = Document.get_all_by_user(user_id)
+        documents = list(db.documents.find(
+            _visibility_filter(user_id, current_user),
+            {'search_content': 0, 'minhash': 0, 'lsh_buckets': 0}
+        ).sort('created_at', -1))
         
         result = []
         for doc in documents:
@@ -77,6 +101,50 @@ def get_documents():
     except Exception as e:
         return jsonify({'message': 'Lỗi lấy danh sách tài liệu', 'error': str(e)}), 500
 
+@documents_bp.route('/search', methods=['GET'])
+@auth_required
+def search_documents():
+    try:
+        user_id = get_current_user()
+        current_user = get_current_claims()
+        
+        if not current_user:
+            return jsonify({'message': 'Người dùng không tồn tại'}), 401
+        
+        q = request.args.get('q', '').strip()
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        except ValueError:
+            return jsonify({'message': 'Tham số phân trang không hợp lệ'}), 400
+        
+        text_query = build_text_query(q)
+        if not text_query:
+            return jsonify({'documents': [], 'total': 0, 'page': page, 'limit': limit}), 200
+        
+        documents, total = Document.search(
+            text_query,
+            _visibility_filter(user_id, current_user),
+            (page - 1) * limit,
+            limit
+        )
+        
+        from bson import ObjectId
+        owner_ids = list({doc['user_id'] for doc in documents if isinstance(doc.get('user_id'), ObjectId)})
+        owners = {owner['_id']: owner for owner in get_db().users.find({'_id': {'$in': owner_ids}}, {'password': 0})} if owner_ids else {}
+        
+        result = []
+        for doc in documents:
+            owner = owners.get(doc.get('user_id'))
+            doc_dict = Document.to_dict(doc)
+            if owner:
+                doc_dict['owner'] = User.to_dict(owner)
+            result.append(doc_dict)
+        
+        return jsonify({'documents': result, 'total': total, 'page': page, 'limit': limit}), 200
+    except Exception as e:
+        return jsonify({'message': 'Lỗi tìm kiếm tài liệu', 'error': str(e)}), 500
+
 @documents_bp.route('', methods=['POST'])
 @auth_required
 def upload_document():
@@ -99,10 +167,11 @@ def upload_document():
         
         file_ext = filename.rsplit('.', 1)[1].upper()
         file_type = 'DOCX' if file_ext == 'DOC' else file_ext
-        file_size = get_file_size(os.path.getsize(filepath))
+        size_bytes = os.path.getsize(filepath)
+        file_size = get_file_size(size_bytes)
         
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
         
@@ -112,14 +181,19 @@ def upload_document():
             'name': filename,
             'type': file_type,
             'size': file_size,
+            'size_bytes': size_bytes,
             'filename': unique_filename,
             'filepath': filepath,
+            'content_hash': file_hash(filepath),
             'status': 'active',
             'user_id': user_id,
             'department_id': user_department_id
         }
         
         doc_id = Document.create(document_data)
+        # Extract + MinHash chạy nền; trùng lặp lấy qua GET /<doc_id>/duplicates
+        schedule_index(doc_id)
+        schedule_previews(filepath, document_data['content_hash'])
         document = Document.get_by_id(doc_id)
         
         return jsonify({
@@ -135,7 +209,7 @@ def upload_document():
 def update_document(doc_id):
     try:
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
@@ -176,13 +250,18 @@ def update_document(doc_id):
                 
                 file_ext = filename.rsplit('.', 1)[1].upper()
                 file_type = 'DOCX' if file_ext == 'DOC' else file_ext
-                file_size = get_file_size(os.path.getsize(filepath))
+                size_bytes = os.path.getsize(filepath)
+                file_size = get_file_size(size_bytes)
                 
                 update_data['name'] = filename
                 update_data['type'] = file_type
                 update_data['size'] = file_size
+                update_data['size_bytes'] = size_bytes
                 update_data['filename'] = unique_filename
                 update_data['filepath'] = filepath
+                update_data['content_hash'] = file_hash(filepath)
+                update_data['indexed_at'] = None
+                schedule_previews(filepath, update_data['content_hash'])
                 
                 if old_filepath and os.path.exists(old_filepath):
                     try:
@@ -193,6 +272,7 @@ def update_document(doc_id):
             data = request.get_json() or {}
             if 'name' in data:
                 update_data['name'] = data['name']
+                update_data.update(search_fields(data['name']))
         
         if update_data:
             db = get_db()
@@ -203,6 +283,8 @@ def update_document(doc_id):
                 {'$set': update_data}
             )
             if result.modified_count > 0:
+                if 'filepath' in update_data:
+                    schedule_index(doc_id)
                 updated_doc = Document.get_by_id(doc_id)
                 return jsonify({
                     'message': 'Cập nhật tài liệu thành công',
@@ -221,7 +303,7 @@ def update_document(doc_id):
 def delete_document(doc_id):
     try:
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
@@ -245,26 +327,30 @@ def delete_document(doc_id):
         if not can_delete:
             return jsonify({'message': 'Bạn không có quyền xóa tài liệu này'}), 403
         
-        if 'filepath' in document and os.path.exists(document['filepath']):
-            os.remove(document['filepath'])
-        
         db = get_db()
         from bson import ObjectId
         result = db.documents.delete_one({'_id': ObjectId(doc_id)})
         if result.deleted_count > 0:
-            return jsonify({'message': 'Xóa tài liệu thành công'}), 200
+            job_id = enqueue_cascade('document', {
+                'id': doc_id,
+                'name': document.get('name'),
+                'filepath': document.get('filepath'),
+                'filename': document.get('filename'),
+                'content_hash': document.get('content_hash')
+            })
+            return jsonify({'message': 'Xóa tài liệu thành công', 'job_id': job_id}), 200
         else:
             return jsonify({'message': 'Xóa tài liệu thất bại'}), 400
     
     except Exception as e:
         return jsonify({'message': 'Lỗi xóa tài liệu', 'error': str(e)}), 500
 
-@documents_bp.route('/<doc_id>/download', methods=['GET'])
+@documents_bp.route('/<doc_id>/duplicates', methods=['GET'])
 @auth_required
-def download_document(doc_id):
+def get_document_duplicates(doc_id):
     try:
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
@@ -273,19 +359,35 @@ def download_document(doc_id):
         if not document:
             return jsonify({'message': 'Không tìm thấy tài liệu'}), 404
         
-        user_role = current_user.get('role', 'employee')
-        can_view = False
+        if not _can_view_document(user_id, current_user, document):
+            return jsonify({'message': 'Bạn không có quyền xem tài liệu này'}), 403
         
-        if user_role == 'director':
-            can_view = True
-        elif document.get('user_id') == user_id:
-            can_view = True
-        elif user_role == 'department_head':
-            doc_owner = User.get_by_id(document.get('user_id'))
-            if doc_owner and doc_owner.get('department_id') == current_user.get('department_id'):
-                can_view = True
+        if not document.get('indexed_at'):
+            response = jsonify({'status': 'pending', 'possible_duplicates': []})
+            response.headers['Retry-After'] = '2'
+            response.headers['Cache-Control'] = 'no-store'
+            return response, 202
         
-        if not can_view:
+        possible_duplicates = find_duplicates(doc_id, document, _visibility_filter(user_id, current_user))
+        return jsonify({'status': 'ready', 'possible_duplicates': possible_duplicates}), 200
+    except Exception as e:
+        return jsonify({'message': 'Lỗi kiểm tra tài liệu trùng lặp', 'error': str(e)}), 500
+
+@documents_bp.route('/<doc_id>/download', methods=['GET'])
+@auth_required
+def download_document(doc_id):
+    try:
+        user_id = get_current_user()
+        current_user = get_current_claims()
+        
+        if not current_user:
+            return jsonify({'message': 'Người dùng không tồn tại'}), 401
+        
+        document = Document.get_by_id(doc_id)
+        if not document:
+            return jsonify({'message': 'Không tìm thấy tài liệu'}), 404
+        
+        if not _can_view_document(user_id, current_user, document):
             return jsonify({'message': 'Bạn không có quyền xem tài liệu này'}), 403
         
         filepath = document.get('filepath')
@@ -327,3 +429,71 @@ def download_document(doc_id):
     except Exception as e:
         return jsonify({'message': 'Lỗi tải file', 'error': str(e)}), 500
 
+def _serve_preview(doc_id, kind, mimetype):
+    user_id = get_current_user()
+    current_user = get_current_claims()
+    
+    if not current_user:
+        return jsonify({'message': 'Người dùng không tồn tại'}), 401
+    
+    document = Document.get_by_id(doc_id)
+    if not document:
+        return jsonify({'message': 'Không tìm thấy tài liệu'}), 404
+    
+    if not _can_view_document(user_id, current_user, document):
+        return jsonify({'message': 'Bạn không có quyền xem tài liệu này'}), 403
+    
+    filepath = document.get('filepath')
+    if not filepath or not os.path.exists(filepath):
+        return jsonify({'message': 'File không tồn tại'}), 404
+    
+    if not supports(filepath, kind):
+        return jsonify({'message': 'Định dạng này không có bản xem trước', 'status': 'unsupported'}), 404
+    
+    content_hash = document.get('content_hash')
+    if not content_hash:
+        content_hash = file_hash(filepath)
+        Document.update_search_fields(doc_id, {'content_hash': content_hash})
+    
+    status = preview_status(content_hash, kind)
+    if status == 'failed':
+        return jsonify({'message': 'Không thể tạo bản xem trước cho tài liệu này', 'status': 'failed'}), 422
+    if status != 'ready':
+        schedule_preview(filepath, content_hash, kind)
+        response = jsonify({'message': 'Bản xem trước đang được tạo', 'status': 'pending'})
+        response.headers['Retry-After'] = '2'
+        response.headers['Cache-Control'] = 'no-store'
+        return response, 202
+    
+    response = send_file(
+        os.path.abspath(artifact_path(content_hash, kind)),
+        mimetype=mimetype,
+        etag=f'{content_hash}-{kind}',
+        conditional=True
+    )
+    # File bản xem trước gắn với content hash nên URL có ?v=<hash> không bao giờ đổi nội dung
+    if request.args.get('v') == content_hash:
+        response.headers['Cache-Control'] = f'private, max-age={PREVIEW_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers.pop('Expires', None)
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    if kind == 'html':
+        response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'"
+    return response
+
+@documents_bp.route('/<doc_id>/thumbnail', methods=['GET'])
+@auth_required
+def get_document_thumbnail(doc_id):
+    try:
+        return _serve_preview(doc_id, 'thumbnail', 'image/png')
+    except Exception as e:
+        return jsonify({'message': 'Lỗi lấy ảnh thu nhỏ', 'error': str(e)}), 500
+
+@documents_bp.route('/<doc_id>/preview', methods=['GET'])
+@auth_required
+def get_document_preview(doc_id):
+    try:
+        return _serve_preview(doc_id, 'html', 'text/html; charset=utf-8')
+    except Exception as e:
+        return jsonify({'message': 'Lỗi lấy bản xem trước', 'error': str(e)}), 500
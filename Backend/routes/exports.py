@@ -0,0 +1,328 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from config.database import get_db
+from models import ids
+from utils.jwt_helper import jwt_required as auth_required, get_current_user, get_current_claims
+from datetime import datetime
+from xml.sax.saxutils import escape
+import csv
+import io
+import itertools
+import re
+import zipfile
+
+exports_bp = Blueprint('exports', __name__)
+
+CURSOR_BATCH_SIZE = 1000
+LOOKUP_BATCH_SIZE = 1000
+CSV_FLUSH_BYTES = 64 * 1024
+ROLE_LABELS = {
+    'director': 'Giám đốc',
+    'department_head': 'Trưởng phòng',
+    'employee': 'Nhân viên'
+}
+
+def _object_ids(values):
+    from bson import ObjectId
+    return [ObjectId(str(v)) for v in values if v and ObjectId.is_valid(str(v))]
+
+def _format_date(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value or ''
+
+def _name_map(collection, ids, fields=('name',)):
+    """
+    Tra tên theo lô id bằng một truy vấn $in (thay vì mỗi dòng một truy vấn).
+    """
+    object_ids = _object_ids(set(ids))
+    if not object_ids:
+        return {}
+    projection = {field: 1 for field in fields}
+    result = {}
+    for item in get_db()[collection].find({'_id': {'$in': object_ids}}, projection):
+        result[str(item['_id'])] = next((item.get(field) for field in fields if item.get(field)), '')
+    return result
+
+def _department_names():
+    return {str(d['_id']): d.get('name', '') for d in get_db().departments.find({}, {'name': 1})}
+
+def _chunks(cursor, size):
+    chunk = []
+    for item in cursor:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _units_spec(department_filter, department_user_ids):
+    departments = _department_names()
+    
+    def rows(chunk):
+        for unit in chunk:
+            yield [
+                unit.get('code', ''),
+                unit.get('name', ''),
+                unit.get('email', ''),
+                unit.get('phone', ''),
+                unit.get('address', ''),
+                departments.get(str(unit.get('department_id')), ''),
+                _format_date(unit.get('created_at'))
+            ]
+    
+    return {
+        'collection': 'units',
+        'query': department_filter,
+        'projection': {'code': 1, 'name': 1, 'email': 1, 'phone': 1, 'address': 1, 'department_id': 1, 'created_at': 1},
+        'headers': ['Mã', 'Tên đơn vị', 'Email', 'Số điện thoại', 'Địa chỉ', 'Phòng ban', 'Ngày tạo'],
+        'rows': rows
+    }
+
+def _users_spec(department_filter, department_user_ids):
+    departments = _department_names()
+    
+    def rows(chunk):
+        for user in chunk:
+            yield [
+                user.get('username', ''),
+                user.get('name', '') or '',
+                user.get('phone', '') or '',
+                ROLE_LABELS.get(user.get('role'), user.get('role', '')),
+                departments.get(str(user.get('department_id')), ''),
+                _format_date(user.get('birth_date')),
+                _format_date(user.get('created_at'))
+            ]
+    
+    return {
+        'collection': 'users',
+        'query': department_filter,
+        'projection': {'username': 1, 'name': 1, 'phone': 1, 'role': 1, 'department_id': 1, 'birth_date': 1, 'created_at': 1},
+        'headers': ['Tên đăng nhập', 'Họ tên', 'Số điện thoại', 'Vai trò', 'Phòng ban', 'Ngày sinh', 'Ngày tạo'],
+        'rows': rows
+    }
+
+def _documents_spec(department_filter, department_user_ids):
+    departments = _department_names()
+    
+    def rows(chunk):
+        owners = _name_map('users', [d.get('user_id') for d in chunk], ('name', 'username'))
+        for document in chunk:
+            yield [
+                document.get('name', ''),
+                document.get('type', ''),
+                document.get('size', ''),
+                owners.get(str(document.get('user_id')), ''),
+                departments.get(str(document.get('department_id')), ''),
+                _format_date(document.get('created_at'))
+            ]
+    
+    return {
+        'collection': 'documents',
+        'query': department_filter,
+        'projection': {'name': 1, 'type': 1, 'size': 1, 'user_id': 1, 'department_id': 1, 'created_at': 1},
+        'headers': ['Tên tài liệu', 'Loại', 'Kích thước', 'Người tải lên', 'Phòng ban', 'Ngày tạo'],
+        'rows': rows
+    }
+
+def _history_spec(department_filter, department_user_ids):
+    query = {}
+    if department_user_ids is not None:
+        query = {'user_id': {'$in': department_user_ids}}
+    
+    def rows(chunk):
+        documents = _name_map('documents', [h.get('document_id') for h in chunk])
+        units = _name_map('units', [h.get('unit_id') for h in chunk])
+        senders = _name_map('users', [h.get('user_id') for h in chunk], ('name', 'username'))
+        for item in chunk:
+            yield [
+                _format_date(item.get('created_at')),
+                documents.get(str(item.get('document_id')), item.get('document_name', '')),
+                units.get(str(item.get('unit_id')), item.get('unit_name', '')),
+                item.get('status', ''),
+                senders.get(str(item.get('user_id')), '')
+            ]
+    
+    return {
+        'collection': 'history',
+        'query': query,
+        'projection': {'document_id': 1, 'document_name': 1, 'unit_id': 1, 'unit_name': 1, 'status': 1, 'user_id': 1, 'created_at': 1},
+        'headers': ['Thời gian', 'Tài liệu', 'Đơn vị nhận', 'Trạng thái', 'Người gửi'],
+        'rows': rows
+    }
+
+EXPORTS = {
+    'units': ('don_vi', _units_spec),
+    'users': ('nguoi_dung', _users_spec),
+    'documents': ('tai_lieu', _documents_spec),
+    'history': ('lich_su_gui', _history_spec),
+}
+
+def _iter_rows(spec):
+    cursor = (
+        get_db()[spec['collection']]
+        .find(spec['query'], spec['projection'])
+        .sort('_id', 1)
+        .batch_size(CURSOR_BATCH_SIZE)
+    )
+    try:
+        for chunk in _chunks(cursor, LOOKUP_BATCH_SIZE):
+            yield from spec['rows'](chunk)
+    finally:
+        cursor.close()
+
+def _csv_stream(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield '\ufeff'
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CSV_FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{title}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+class _ChunkWriter:
+    """
+    File chỉ ghi tiếp (không seek) để zipfile đẩy dữ liệu ra; generator lấy phần đã ghi qua drain().
+    """
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.position = 0
+    
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        text = _XML_ILLEGAL.sub('', str(value))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+    return f'<c><v>{value}</v></c>'
+
+def _xlsx_stream(title, headers, rows):
+    """
+    Ghi XLSX (zip) trực tiếp ra response: sheet dạng inline string được nén và gửi dần theo từng
+    khoảng CSV_FLUSH_BYTES, không dựng workbook hay file tạm nên byte đầu tiên đi ngay và bộ nhớ không
+    tăng theo số dòng.
+    """
+    output = _ChunkWriter()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(title=escape(title[:31], {'"': '&quot;'})))
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for row in itertools.chain([headers], rows):
+                sheet.write(f"<row>{''.join(_xlsx_cell(value) for value in row)}</row>".encode('utf-8'))
+                if output.size >= CSV_FLUSH_BYTES:
+                    yield output.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield output.drain()
+
+@exports_bp.route('/<entity>', methods=['GET'])
+@auth_required
+def export_entity(entity):
+    try:
+        user_id = get_current_user()
+        current_user = get_current_claims()
+        if not current_user:
+            return jsonify({'message': 'Người dùng không tồn tại'}), 401
+        
+        if entity not in EXPORTS:
+            return jsonify({'message': 'Loại dữ liệu xuất không hợp lệ'}), 404
+        
+        output_format = request.args.get('format', 'csv').lower()
+        if output_format not in ('csv', 'xlsx'):
+            return jsonify({'message': 'Định dạng xuất chỉ hỗ trợ csv hoặc xlsx'}), 400
+        
+        user_role = current_user.get('role', 'employee')
+        user_department_id = current_user.get('department_id')
+        
+        if user_role == 'director':
+            department_filter = {}
+            department_user_ids = None
+        elif user_role == 'department_head' and user_department_id:
+            department_filter = ids.department_filter(user_department_id)
+            department_user_ids = [
+                str(u['_id']) for u in get_db().users.find(department_filter, {'_id': 1})
+            ]
+            department_user_ids.append(str(user_id))
+        else:
+            return jsonify({'message': 'Bạn không có quyền xuất dữ liệu'}), 403
+        
+        filename, build_spec = EXPORTS[entity]
+        spec = build_spec(department_filter, department_user_ids)
+        filename = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{output_format}"
+        
+        if output_format == 'csv':
+            response = Response(
+                stream_with_context(_csv_stream(spec['headers'], _iter_rows(spec))),
+                mimetype='text/csv; charset=utf-8'
+            )
+        else:
+            response = Response(
+                stream_with_context(_xlsx_stream(entity, spec['headers'], _iter_rows(spec))),
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
+    except Exception as e:
+        return jsonify({'message': 'Lỗi xuất dữ liệu', 'error': str(e)}), 500
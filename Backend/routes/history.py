@@ -5,7 +5,7 @@ from models.unit import Unit
 from models.user import User
 from models.department import Department
 from config.database import get_db
-from utils.jwt_helper import jwt_required as auth_required, get_current_user
+from utils.jwt_helper import jwt_required as auth_required, get_current_user, get_current_claims
 from utils.email_service import send_document_email
 from bson import ObjectId
 import os
@@ -25,8 +25,8 @@ def get_history():
             document = Document.get_by_id_for_user(item.get('document_id'), user_id)
             unit = Unit.get_by_id_for_user(item.get('unit_id'), user_id)
             
-            history_dict['documentName'] = document.get('name', 'Tài liệu đã bị xóa') if document else 'Tài liệu đã bị xóa'
-            history_dict['unitName'] = unit.get('name', 'Đơn vị đã bị xóa') if unit else 'Đơn vị đã bị xóa'
+            history_dict['documentName'] = document.get('name', 'Tài liệu đã bị xóa') if document else item.get('document_name') or 'Tài liệu đã bị xóa'
+            history_dict['unitName'] = unit.get('name', 'Đơn vị đã bị xóa') if unit else item.get('unit_name') or 'Đơn vị đã bị xóa'
             history_dict['document_id'] = item.get('document_id')
             history_dict['unit_id'] = item.get('unit_id')
             
@@ -53,8 +53,8 @@ def get_history_detail(history_id):
         
         history_dict['document'] = Document.to_dict(document) if document else None
         history_dict['unit'] = Unit.to_dict(unit) if unit else None
-        history_dict['documentName'] = document.get('name', 'Tài liệu đã bị xóa') if document else 'Tài liệu đã bị xóa'
-        history_dict['unitName'] = unit.get('name', 'Đơn vị đã bị xóa') if unit else 'Đơn vị đã bị xóa'
+        history_dict['documentName'] = document.get('name', 'Tài liệu đã bị xóa') if document else history_item.get('document_name') or 'Tài liệu đã bị xóa'
+        history_dict['unitName'] = unit.get('name', 'Đơn vị đã bị xóa') if unit else history_item.get('unit_name') or 'Đơn vị đã bị xóa'
         
         return jsonify({'history': history_dict}), 200
     except Exception as e:
@@ -65,7 +65,7 @@ def get_history_detail(history_id):
 def get_history_by_document(doc_id):
     try:
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
@@ -101,8 +101,8 @@ def get_history_by_document(doc_id):
             doc_item = Document.get_by_id(item.get('document_id'))
             unit = Unit.get_by_id(item.get('unit_id'))
             
-            history_dict['documentName'] = doc_item.get('name', 'Tài liệu đã bị xóa') if doc_item else 'Tài liệu đã bị xóa'
-            history_dict['unitName'] = unit.get('name', 'Đơn vị đã bị xóa') if unit else 'Đơn vị đã bị xóa'
+            history_dict['documentName'] = doc_item.get('name', 'Tài liệu đã bị xóa') if doc_item else item.get('document_name') or 'Tài liệu đã bị xóa'
+            history_dict['unitName'] = unit.get('name', 'Đơn vị đã bị xóa') if unit else item.get('unit_name') or 'Đơn vị đã bị xóa'
             history_dict['document_id'] = item.get('document_id')
             history_dict['unit_id'] = item.get('unit_id')
             
@@ -117,7 +117,7 @@ def get_history_by_document(doc_id):
 def send_document():
     try:
         user_id = get_current_user()
-        user = User.get_by_id(user_id)
+        user = get_current_claims()
         if not user:
             return jsonify({'message': 'Không tìm thấy người dùng'}), 404
         
@@ -159,8 +159,7 @@ def send_document():
                 else:
                     all_units = []
             else:
-                all_units_list = Unit.get_by_ids(unit_ids)
-                all_units = [u for u in all_units_list if u.get('department_id') and str(u.get('department_id')) == str(user_department_id)]
+                all_units = Unit.get_by_ids_in_department(unit_ids, user_department_id)
         else:
             all_units = Unit.get_by_ids_for_user(unit_ids, user_id)
         
@@ -190,6 +189,8 @@ def send_document():
             history_data = {
                 'document_id': document_id,
                 'unit_id': unit_id,
+                'document_name': document_name,
+                'unit_name': unit_name,
                 'status': 'Đã gửi',
                 'user_id': user_id
             }
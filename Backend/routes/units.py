@@ -1,17 +1,29 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, send_file, stream_with_context
 from models.unit import Unit
-from utils.jwt_helper import jwt_required as auth_required, get_current_user
+from config.database import get_db
+from models.ids import normalize_department, department_filter
+from utils.cascade import enqueue_cascade
+from models.cache import get_cache
+from utils.jwt_helper import jwt_required as auth_required, get_current_user, get_current_claims
+from utils.unit_import import ImportFormatError, batch_size, iter_unit_rows, validate_row, write_report
 from datetime import datetime
+import json
+import os
+import uuid
 
 units_bp = Blueprint('units', __name__)
 
+IMPORT_FOLDER = os.path.join('uploads', 'imports')
+IMPORT_EXTENSIONS = {'csv', 'xlsx'}
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
 @units_bp.route('', methods=['GET'])
 @auth_required
 def get_units():
     try:
-        from models.user import User
         user_id = get_current_user()
-        user = User.get_by_id(user_id)
+        user = get_current_claims()
         if not user:
             return jsonify({'message': 'Không tìm thấy người dùng'}), 404
         
@@ -28,8 +40,7 @@ def get_units():
                 else:
                     units = []
             else:
-                all_units = Unit.get_all()
-                units = [u for u in all_units if u.get('department_id') and str(u.get('department_id')) == str(user_department_id)]
+                units = Unit.get_by_department(user_department_id)
         else:
             units = Unit.get_all_by_user(user_id)
         
@@ -38,13 +49,50 @@ def get_units():
     except Exception as e:
         return jsonify({'message': 'Lỗi lấy danh sách đơn vị', 'error': str(e)}), 500
 
+def _visible_units_filter(user_id, user):
+    """
+    Điều kiện Mongo giới hạn các đơn vị người dùng được xem (giống GET /api/units); None nếu không được xem gì.
+    """
+    from bson import ObjectId
+    user_role = user.get('role', 'employee')
+    user_department_id = user.get('department_id')
+    if user_role == 'director':
+        return {}
+    if user_department_id:
+        return department_filter(user_department_id)
+    if user_role == 'department_head':
+        return None
+    return {'user_id': ObjectId(user_id)}
+
+@units_bp.route('/search', methods=['GET'])
+@auth_required
+def search_units():
+    try:
+        user_id = get_current_user()
+        user = get_current_claims()
+        if not user:
+            return jsonify({'message': 'Không tìm thấy người dùng'}), 404
+        
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+        except ValueError:
+            limit = DEFAULT_SEARCH_LIMIT
+        
+        visibility = _visible_units_filter(user_id, user)
+        if visibility is None:
+            return jsonify({'units': []}), 200
+        
+        units = Unit.search(request.args.get('q', '').strip(), visibility, limit)
+        return jsonify({'units': [Unit.to_dict(unit) for unit in units]}), 200
+    except Exception as e:
+        return jsonify({'message': 'Lỗi tìm kiếm đơn vị', 'error': str(e)}), 500
+
 @units_bp.route('', methods=['POST'])
 @auth_required
 def create_unit():
     try:
-        from models.user import User
         user_id = get_current_user()
-        user = User.get_by_id(user_id)
+        user = get_current_claims()
         if not user:
             return jsonify({'message': 'Không tìm thấy người dùng'}), 404
         
@@ -67,6 +115,8 @@ def create_unit():
             department_id = user_department_id
         elif user_role == 'director':
             department_id = data.get('department_id')
+            if department_id and not ObjectId.is_valid(str(department_id)):
+                return jsonify({'message': 'Phòng ban không hợp lệ'}), 400
 
         unit_data = {
             'name': data['name'],
@@ -96,9 +146,8 @@ def create_unit():
 @auth_required
 def update_unit(unit_id):
     try:
-        from models.user import User
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
         
@@ -138,10 +187,7 @@ def update_unit(unit_id):
         if 'address' in data:
             update_data['address'] = data['address']
         if 'department_id' in data:
-            from models.user import User
-            current_user_id = get_current_user()
-            current_user = User.get_by_id(current_user_id)
-            if current_user and current_user.get('role') == 'director':
+            if current_user.get('role') == 'director':
                 update_data['department_id'] = data['department_id']
         
         if update_data:
@@ -149,10 +195,19 @@ def update_unit(unit_id):
             from bson import ObjectId
             if 'code' in update_data:
                 update_data['code'] = update_data['code'].upper()
+            if any(field in update_data for field in ('name', 'code', 'email')):
+                update_data['search_terms'] = Unit.search_terms(
+                    update_data.get('name', unit.get('name')),
+                    update_data.get('code', unit.get('code')),
+                    update_data.get('email', unit.get('email'))
+                )
             update_data['updated_at'] = datetime.utcnow()
             
             if user_role == 'director' and 'department_id' in update_data:
-                pass
+                try:
+                    normalize_department(update_data)
+                except ValueError:
+                    return jsonify({'message': 'Phòng ban không hợp lệ'}), 400
             else:
                 if 'department_id' in update_data:
                     del update_data['department_id']
@@ -162,6 +217,7 @@ def update_unit(unit_id):
                 {'$set': update_data}
             )
             if result.modified_count > 0:
+                get_cache('units').invalidate(unit_id)
                 updated_unit = Unit.get_by_id(unit_id)
                 return jsonify({
                     'message': 'Cập nhật đơn vị thành công',
@@ -179,10 +235,9 @@ def update_unit(unit_id):
 @auth_required
 def delete_unit(unit_id):
     try:
-        from models.user import User
         from datetime import datetime
         user_id = get_current_user()
-        current_user = User.get_by_id(user_id)
+        current_user = get_current_claims()
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
         
@@ -208,11 +263,9 @@ def delete_unit(unit_id):
         if not can_delete:
             return jsonify({'message': 'Bạn không có quyền xóa đơn vị này'}), 403
         
-        db = get_db()
-        from bson import ObjectId
-        result = db.units.delete_one({'_id': ObjectId(unit_id)})
-        if result.deleted_count > 0:
-            return jsonify({'message': 'Xóa đơn vị thành công'}), 200
+        if Unit.delete(unit_id):
+            job_id = enqueue_cascade('unit', {'id': unit_id, 'name': unit.get('name')})
+            return jsonify({'message': 'Xóa đơn vị thành công', 'job_id': job_id}), 200
         else:
             return jsonify({'message': 'Xóa đơn vị thất bại'}), 400
     
@@ -223,12 +276,11 @@ def delete_unit(unit_id):
 @auth_required
 def get_units_by_ids():
     try:
-        from models.user import User
         data = request.get_json()
         unit_ids = data.get('ids', [])
         
         user_id = get_current_user()
-        user = User.get_by_id(user_id)
+        user = get_current_claims()
         if not user:
             return jsonify({'message': 'Không tìm thấy người dùng'}), 404
         
@@ -244,8 +296,7 @@ def get_units_by_ids():
                 else:
                     units = []
             else:
-                all_units = Unit.get_by_ids(unit_ids)
-                units = [u for u in all_units if u.get('department_id') and str(u.get('department_id')) == str(user_department_id)]
+                units = Unit.get_by_ids_in_department(unit_ids, user_department_id)
         else:
             units = Unit.get_by_ids_for_user(unit_ids, user_id)
         
@@ -254,3 +305,136 @@ def get_units_by_ids():
     except Exception as e:
         return jsonify({'message': 'Lỗi lấy danh sách đơn vị', 'error': str(e)}), 500
 
+@units_bp.route('/import', methods=['POST'])
+@auth_required
+def import_units():
+    try:
+        from bson import ObjectId
+        user_id = get_current_user()
+        user = get_current_claims()
+        if not user:
+            return jsonify({'message': 'Không tìm thấy người dùng'}), 404
+        
+        user_role = user.get('role', 'employee')
+        user_department_id = user.get('department_id')
+        
+        if user_role == 'employee':
+            return jsonify({'message': 'Nhân viên không có quyền tạo đơn vị'}), 403
+        if user_role == 'department_head' and not user_department_id:
+            return jsonify({'message': 'Trưởng phòng phải có phòng ban'}), 400
+        
+        file = request.files.get('file')
+        if not file or file.filename == '':
+            return jsonify({'message': 'Chưa chọn file'}), 400
+        
+        extension = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+        if extension not in IMPORT_EXTENSIONS:
+            return jsonify({'message': 'Chỉ hỗ trợ file CSV hoặc XLSX'}), 400
+        
+        os.makedirs(IMPORT_FOLDER, exist_ok=True)
+        import_id = uuid.uuid4().hex
+        source_path = os.path.join(IMPORT_FOLDER, f'{import_id}.{extension}')
+        report_path = os.path.join(IMPORT_FOLDER, f'{user_id}_{import_id}.csv')
+        file.save(source_path)
+        size = batch_size()
+        
+        def generate():
+            results = []
+            seen_codes = set()
+            seen_emails = set()
+            batch = []
+            processed = 0
+            error_message = None
+            
+            def flush():
+                inserted, errors = Unit.insert_many([unit for _, unit in batch])
+                for index, (row_number, unit) in enumerate(batch):
+                    if index in errors:
+                        results.append((row_number, unit['code'], 'error', errors[index]))
+                    else:
+                        results.append((row_number, unit['code'], 'created', ''))
+                batch.clear()
+            
+            def progress():
+                created = sum(1 for item in results if item[2] == 'created')
+                return json.dumps({
+                    'type': 'progress',
+                    'processed': processed,
+                    'created': created,
+                    'failed': len(results) - created
+                }) + "\n"
+            
+            try:
+                for row_number, values in iter_unit_rows(source_path, extension):
+                    processed += 1
+                    unit, error = validate_row(values)
+                    if not error and unit['code'] in seen_codes:
+                        error = 'Mã trùng với một dòng khác trong file'
+                    if not error and unit['email'] in seen_emails:
+                        error = 'Email trùng với một dòng khác trong file'
+                    if not error:
+                        if user_role == 'department_head':
+                            unit['department_id'] = user_department_id
+                        elif unit['department_id'] and not ObjectId.is_valid(unit['department_id']):
+                            error = 'Mã phòng ban không hợp lệ'
+                    if error:
+                        results.append((row_number, values.get('code', ''), 'error', error))
+                        continue
+                    
+                    seen_codes.add(unit['code'])
+                    seen_emails.add(unit['email'])
+                    unit['user_id'] = user_id
+                    batch.append((row_number, unit))
+                    if len(batch) >= size:
+                        flush()
+                        yield progress()
+                if batch:
+                    flush()
+            except ImportFormatError as e:
+                error_message = str(e)
+            except Exception as e:
+                error_message = f'Lỗi đọc file: {e}'
+            finally:
+                if os.path.exists(source_path):
+                    os.remove(source_path)
+            
+            write_report(report_path, results)
+            created = sum(1 for item in results if item[2] == 'created')
+            yield json.dumps({
+                'type': 'done',
+                'processed': processed,
+                'created': created,
+                'failed': len(results) - created,
+                'error': error_message,
+                'import_id': import_id,
+                'is_final': True
+            }) + "\n"
+        
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
+    except Exception as e:
+        return jsonify({'message': 'Lỗi nhập đơn vị', 'error': str(e)}), 500
+
+@units_bp.route('/import/<import_id>/report', methods=['GET'])
+@auth_required
+def get_import_report(import_id):
+    try:
+        user_id = get_current_user()
+        if not import_id.isalnum():
+            return jsonify({'message': 'Không tìm thấy kết quả nhập'}), 404
+        
+        report_path = os.path.join(IMPORT_FOLDER, f'{user_id}_{import_id}.csv')
+        if not os.path.exists(report_path):
+            return jsonify({'message': 'Không tìm thấy kết quả nhập'}), 404
+        
+        return send_file(
+            os.path.abspath(report_path),
+            mimetype='text/csv',
+            as_attachment=True,
+            download_name=f'ket_qua_nhap_don_vi_{import_id[:8]}.csv'
+        )
+    except Exception as e:
+        return jsonify({'message': 'Lỗi tải kết quả nhập', 'error': str(e)}), 500
@@ -1,13 +1,21 @@
 from flask import Blueprint, request, jsonify
 from models.user import User
 from models.department import Department
-from utils.jwt_helper import jwt_required as auth_required, get_current_user
+from models.ids import department_filter
+from utils.cascade import enqueue_cascade
+from utils.jwt_helper import jwt_required as auth_required, get_current_user, get_current_claims
+from utils.passwords import PasswordHashBusy, hash_password
+import re
 
 users_bp = Blueprint('users', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_SEARCH_TERMS = 5
+
 def require_director():
     user_id = get_current_user()
-    user = User.get_by_id(user_id)
+    user = get_current_claims()
     if not user or user.get('role') != 'director':
         return None
     return user
@@ -20,17 +28,50 @@ def get_users():
         if not user:
             return jsonify({'message': 'Chỉ giám đốc mới có quyền xem danh sách người dùng'}), 403
         
-        users = User.get_all()
+        from bson import ObjectId
+        query = {}
+        
+        q = request.args.get('q', '').strip()
+        if q:
+            from utils.vietnamese import tokenize
+            if re.fullmatch(r'[\d\s\-+.()]+', q):
+                terms = [t for t in [re.sub(r'\D', '', q)] if t]
+            else:
+                terms = tokenize(q)[:MAX_SEARCH_TERMS]
+            if terms:
+                query['$and'] = [
+                    {'search_terms': {'$regex': '^' + re.escape(term)}} for term in terms
+                ]
+        
+        role = request.args.get('role')
+        if role and role != 'all':
+            query['role'] = role
+        
+        department_id = request.args.get('department_id')
+        if department_id:
+            if not ObjectId.is_valid(department_id):
+                return jsonify({'message': 'Phòng ban không hợp lệ'}), 400
+            query.update(department_filter(department_id))
+        
+        after = request.args.get('after')
+        if after and not ObjectId.is_valid(after):
+            return jsonify({'message': 'Cursor không hợp lệ'}), 400
+        
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            limit = DEFAULT_PAGE_SIZE
+        
+        users, next_cursor = User.list_page(query, after=after, limit=limit)
         result = []
         for u in users:
+            dept = u.pop('department', None)
             user_dict = User.to_dict(u)
-            if user_dict.get('department_id'):
-                dept = Department.get_by_id(user_dict['department_id'])
-                if dept:
-                    user_dict['department'] = Department.to_dict(dept)
+            if dept:
+                user_dict['department'] = Department.to_dict(dept)
             result.append(user_dict)
         
-        return jsonify({'users': result}), 200
+        return jsonify({'users': result, 'next_cursor': next_cursor}), 200
     except Exception as e:
         return jsonify({'message': 'Lỗi lấy danh sách người dùng', 'error': str(e)}), 500
 
@@ -88,6 +129,8 @@ def create_user():
             'message': 'Tạo tài khoản thành công',
             'user': User.to_dict(new_user)
         }), 201
+    except PasswordHashBusy:
+        return jsonify({'message': 'Hệ thống đang bận, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': 'Lỗi tạo tài khoản', 'error': str(e)}), 500
 
@@ -120,10 +163,7 @@ def update_user(user_id):
             update_data['department_id'] = dept_id
         
         if 'password' in data and data['password']:
-            from models.user import User as UserModel
-            import bcrypt
-            hashed = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
-            update_data['password'] = hashed.decode('utf-8')
+            update_data['password'] = hash_password(data['password'])
         
         if 'name' in data:
             update_data['name'] = data['name'].strip() if data['name'] else None
@@ -158,6 +198,8 @@ def update_user(user_id):
                 return jsonify({'message': 'Cập nhật tài khoản thất bại'}), 400
         else:
             return jsonify({'message': 'Không có dữ liệu để cập nhật'}), 400
+    except PasswordHashBusy:
+        return jsonify({'message': 'Hệ thống đang bận, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': 'Lỗi cập nhật tài khoản', 'error': str(e)}), 500
 
@@ -178,7 +220,12 @@ def delete_user(user_id):
         
         success = User.delete(user_id)
         if success:
-            return jsonify({'message': 'Xóa tài khoản thành công'}), 200
+            job_id = enqueue_cascade('user', {
+                'id': user_id,
+                'name': target_user.get('name') or target_user.get('username'),
+                'reassign_to': str(user['_id'])
+            })
+            return jsonify({'message': 'Xóa tài khoản thành công', 'job_id': job_id}), 200
         else:
             return jsonify({'message': 'Xóa tài khoản thất bại'}), 400
     except Exception as e:
@@ -189,7 +236,7 @@ def delete_user(user_id):
 def add_employee_by_email():
     try:
         current_user_id = get_current_user()
-        current_user = User.get_by_id(current_user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
@@ -244,7 +291,7 @@ def add_employee_by_email():
 def get_department_employees():
     try:
         current_user_id = get_current_user()
-        current_user = User.get_by_id(current_user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
@@ -273,7 +320,7 @@ def get_department_employees():
 def update_department_employee(employee_id):
     try:
         current_user_id = get_current_user()
-        current_user = User.get_by_id(current_user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
@@ -318,9 +365,7 @@ def update_department_employee(employee_id):
             update_data['phone'] = data['phone'].strip() if data['phone'] else None
         
         if 'password' in data and data['password']:
-            import bcrypt
-            hashed = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
-            update_data['password'] = hashed.decode('utf-8')
+            update_data['password'] = hash_password(data['password'])
         
         if update_data:
             success = User.update(employee_id, update_data)
@@ -334,6 +379,8 @@ def update_department_employee(employee_id):
                 return jsonify({'message': 'Cập nhật nhân viên thất bại'}), 400
         else:
             return jsonify({'message': 'Không có dữ liệu để cập nhật'}), 400
+    except PasswordHashBusy:
+        return jsonify({'message': 'Hệ thống đang bận, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': 'Lỗi cập nhật nhân viên', 'error': str(e)}), 500
 
@@ -342,7 +389,7 @@ def update_department_employee(employee_id):
 def delete_department_employee(employee_id):
     try:
         current_user_id = get_current_user()
-        current_user = User.get_by_id(current_user_id)
+        current_user = get_current_claims()
         
         if not current_user:
             return jsonify({'message': 'Người dùng không tồn tại'}), 401
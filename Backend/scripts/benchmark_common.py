@@ -0,0 +1,9 @@
+def percentile(values, p):
+    """
+    Phân vị p (0-100) theo hạng gần nhất; 0.0 nếu không có số liệu.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
@@ -0,0 +1,58 @@
+import sys
+import os
+import time
+import argparse
+import statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extractors import EXTRACTORS, MAX_CHARS, extract_text
+from scripts.benchmark_common import percentile
+
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in names:
+                    files.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            files.append(path)
+    return [f for f in files if os.path.splitext(f)[1].lower() in EXTRACTORS]
+
+
+def time_to_budget(filepath, max_chars, repeat):
+    timings = []
+    text = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extract_text(filepath, max_chars=max_chars)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, len(text) if text else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=f'Đo thời gian lấy {MAX_CHARS} ký tự đầu tiên theo từng định dạng file')
+    parser.add_argument('paths', nargs='+', help='File hoặc thư mục chứa file mẫu (pdf, doc, docx, xls, xlsx)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-chars', type=int, default=MAX_CHARS)
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print('Không tìm thấy file mẫu phù hợp')
+        sys.exit(1)
+
+    by_format = {}
+    for filepath in files:
+        timings, chars = time_to_budget(filepath, args.max_chars, args.repeat)
+        ext = os.path.splitext(filepath)[1].lower()
+        by_format.setdefault(ext, []).append((filepath, timings, chars))
+        size_kb = os.path.getsize(filepath) / 1024
+        print(f'{os.path.basename(filepath)[:40]:<40} {size_kb:>10.0f} KB  median {statistics.median(timings):>9.1f} ms  {chars:>6} ký tự')
+
+    print()
+    print(f'{"Định dạng":<10} {"Số file":>8} {"p50 (ms)":>10} {"p95 (ms)":>10} {"max (ms)":>10}')
+    for ext, results in sorted(by_format.items()):
+        medians = sorted(statistics.median(timings) for _, timings, _ in results)
+        print(f'{ext:<10} {len(results):>8} {statistics.median(medians):>10.1f} {percentile(medians, 95):>10.1f} {medians[-1]:>10.1f}')
@@ -0,0 +1,83 @@
+import sys
+import os
+import time
+import json
+import argparse
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.passwords import PasswordHashBusy, check_password, hash_password
+from scripts.benchmark_common import percentile
+
+
+def run_concurrent(func, requests, concurrency):
+    """
+    Gọi func `requests` lần với `concurrency` thread (mô phỏng nhiều người đăng nhập cùng lúc).
+    Trả về (thời gian tổng, latency ms của các lần thành công, số lần bị từ chối vì bận).
+    """
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            ok = func()
+        except PasswordHashBusy:
+            ok = False
+        return ok, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for ok, latency in results if ok]
+    return elapsed, latencies, len(results) - len(latencies)
+
+
+def report(label, elapsed, latencies, rejected):
+    throughput = len(latencies) / elapsed if elapsed else 0.0
+    print(f'{label:<12} {throughput:8.1f} login/s   p50 {percentile(latencies, 50):8.1f} ms   '
+          f'p95 {percentile(latencies, 95):8.1f} ms   503 {rejected}')
+
+
+def http_login(url, username, password):
+    body = json.dumps({'username': username, 'password': password}).encode('utf-8')
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status == 200
+    except urllib.error.HTTPError as e:
+        if e.code == 503:
+            raise PasswordHashBusy()
+        return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Đo thông lượng kiểm tra mật khẩu bcrypt theo cost và số request đồng thời')
+    parser.add_argument('--costs', default='10,11,12,13', help='Các giá trị BCRYPT_ROUNDS cần đo, cách nhau bởi dấu phẩy')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--url', help='Đo end-to-end qua API, ví dụ http://127.0.0.1:5000/api/auth/login')
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    print(f"Pool: PASSWORD_HASH_WORKERS={os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count())}   "
+          f"PASSWORD_HASH_QUEUE={os.getenv('PASSWORD_HASH_QUEUE', 'mặc định')}   "
+          f'{args.requests} request, {args.concurrency} đồng thời')
+
+    if args.url:
+        if not args.username or not args.password:
+            print('Cần --username và --password khi đo qua API')
+            sys.exit(1)
+        elapsed, latencies, rejected = run_concurrent(
+            lambda: http_login(args.url, args.username, args.password), args.requests, args.concurrency
+        )
+        report('API', elapsed, latencies, rejected)
+        sys.exit(0)
+
+    for cost in [int(value) for value in args.costs.split(',') if value.strip()]:
+        stored = hash_password('benchmark-password', cost=cost)
+        elapsed, latencies, rejected = run_concurrent(
+            lambda: check_password(stored, 'benchmark-password'), args.requests, args.concurrency
+        )
+        report(f'cost {cost}', elapsed, latencies, rejected)
@@ -0,0 +1,102 @@
+import sys
+import os
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import init_db, get_db
+from models.document import Document
+from models.unit import Unit
+from scripts.benchmark_common import percentile
+
+
+def build_corpus(limit):
+    """
+    Ground truth: tập đơn vị mà mỗi tài liệu đã thực sự được gửi tới (collection history).
+    """
+    pipeline = [
+        {'$match': {'document_id': {'$ne': None}, 'unit_id': {'$ne': None}}},
+        {'$group': {'_id': '$document_id', 'unit_ids': {'$addToSet': '$unit_id'}}},
+        {'$limit': limit}
+    ]
+    corpus = []
+    for item in get_db().history.aggregate(pipeline):
+        document = Document.get_by_id(item['_id'])
+        if document:
+            corpus.append((document, {str(unit_id) for unit_id in item['unit_ids']}))
+    return corpus
+
+
+def evaluate(label, corpus, suggest):
+    latencies = []
+    precisions = []
+    recalls = []
+    totals = {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+    fallbacks = 0
+
+    for document, truth, content in corpus:
+        start = time.perf_counter()
+        result = suggest(document, content)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        top = result.get('suggested_ids', [])[:5]
+        hits = len(set(top) & truth)
+        precisions.append(hits / len(top) if top else 0.0)
+        recalls.append(hits / len(truth) if truth else 0.0)
+        if result.get('is_fallback'):
+            fallbacks += 1
+
+        usage = result.get('token_usage') or {}
+        totals['prompt_tokens'] += usage.get('prompt_tokens') or usage.get('prompt_tokens_estimated') or 0
+        totals['completion_tokens'] += usage.get('completion_tokens') or 0
+        totals['cached_tokens'] += usage.get('cached_tokens') or 0
+
+    count = len(corpus) or 1
+    print(f'== {label} ({len(corpus)} tài liệu)')
+    print(f'   latency   p50 {percentile(latencies, 50):8.1f} ms   p95 {percentile(latencies, 95):8.1f} ms')
+    print(f'   precision@5 {sum(precisions) / count:.3f}   recall@5 {sum(recalls) / count:.3f}   fallback {fallbacks}/{len(corpus)}')
+    print(f'   tokens    prompt {totals["prompt_tokens"]}   completion {totals["completion_tokens"]}   cached {totals["cached_tokens"]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Đánh giá gợi ý đơn vị trên các lần gửi trong lịch sử')
+    parser.add_argument('--mode', choices=['llm', 'fallback', 'both'], default='both')
+    parser.add_argument('--base-url', help='Ví dụ http://127.0.0.1:8765/v1 (scripts/mock_openai_server.py)')
+    parser.add_argument('--limit', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.base_url:
+        os.environ['OPENAI_BASE_URL'] = args.base_url
+        os.environ.setdefault('OPENAI_API_KEY', 'mock-key')
+        # Bộ giới hạn chỉ trong process: lưu lượng benchmark và 429 giả của mock không chặn service thật
+        os.environ['AI_RATE_LIMIT_SHARED'] = '0'
+        os.environ['AI_USAGE_LOG'] = '0'
+
+    from utils.ai_service import extract_text_from_file, suggest_units_from_document, suggest_units_fallback
+    from utils.prompt_builder import load_encoding
+
+    init_db()
+    load_encoding()
+    units = [Unit.to_dict(unit) for unit in Unit.get_all()]
+    if not units:
+        print('Chưa có đơn vị nào')
+        sys.exit(1)
+
+    corpus = []
+    extraction_times = []
+    for document, truth in build_corpus(args.limit):
+        start = time.perf_counter()
+        content = extract_text_from_file(document.get('filepath', '')) if document.get('filepath') else None
+        extraction_times.append((time.perf_counter() - start) * 1000)
+        corpus.append((document, truth, content or ''))
+
+    if not corpus:
+        print('Không có tài liệu nào trong lịch sử gửi để đánh giá')
+        sys.exit(1)
+
+    print(f'Extract text: p50 {percentile(extraction_times, 50):.1f} ms   p95 {percentile(extraction_times, 95):.1f} ms')
+
+    if args.mode in ('llm', 'both'):
+        evaluate('LLM', corpus, lambda document, content: suggest_units_from_document(document, units, content))
+    if args.mode in ('fallback', 'both'):
+        evaluate('Fallback', corpus, lambda document, content: suggest_units_fallback(document.get('name', ''), content, units))
@@ -0,0 +1,34 @@
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import init_db
+from migrations import runner
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Quản lý migration schema (collection _migrations)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='Liệt kê migration và trạng thái')
+    up = subparsers.add_parser('up', help='Chạy các migration chưa áp dụng')
+    up.add_argument('--to', type=int, help='Chỉ chạy tới version này')
+    up.add_argument('--batch-size', type=int, help=f'Số bản ghi mỗi lô (mặc định {runner.DEFAULT_BATCH_SIZE})')
+    up.add_argument('--max-rate', type=int, help=f'Số bản ghi tối đa mỗi giây, 0 = không giới hạn (mặc định {runner.DEFAULT_MAX_RATE})')
+    subparsers.add_parser('unlock', help='Gỡ khóa ngay, không chờ khóa của lần chạy bị dừng đột ngột hết hạn')
+    args = parser.parse_args()
+
+    init_db()
+
+    if args.command == 'status':
+        for version, description, state, processed, skipped in runner.status():
+            print(f'{version:>4}  {state:<8} {processed:>10} {skipped:>8}  {description}')
+    elif args.command == 'unlock':
+        runner.release_lock()
+        print('Đã gỡ khóa migration')
+    else:
+        try:
+            executed = runner.run_pending(args.to, args.batch_size, args.max_rate)
+        except runner.MigrationLocked as e:
+            print(e)
+            sys.exit(1)
+        print(f"Hoàn tất: {', '.join(str(v) for v in executed) if executed else 'không có migration nào cần chạy'}")
@@ -0,0 +1,134 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.prompt_builder import count_tokens, load_encoding
+
+
+class MockState:
+    def __init__(self, args):
+        self.latency_ms = args.latency_ms
+        self.jitter_ms = args.jitter_ms
+        self.rate_429 = args.rate_429
+        self.retry_after = args.retry_after
+        self.default_answer = args.default_answer
+        self.rules = []
+        self.requests = 0
+        self.lock = threading.Lock()
+        if args.answers:
+            with open(args.answers, 'r', encoding='utf-8') as f:
+                self.rules = json.load(f)
+
+    def answer_for(self, prompt_text):
+        """
+        Luật trả lời dạng [{"contains": "kế toán", "answer": "0,2"}]; luật đầu tiên khớp được dùng.
+        """
+        for rule in self.rules:
+            if rule.get('contains', '').lower() in prompt_text.lower():
+                return rule.get('answer', 'NONE')
+        return self.default_answer
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        state = self.state
+        with state.lock:
+            state.requests += 1
+            request_number = state.requests
+
+        delay = max(state.latency_ms + random.uniform(-state.jitter_ms, state.jitter_ms), 0)
+        time.sleep(delay / 1000)
+
+        if state.rate_429 and random.random() < state.rate_429:
+            self._send_json(429, {
+                'error': {
+                    'message': f'Rate limit reached. Please try again in {state.retry_after}s.',
+                    'type': 'requests',
+                    'code': 'rate_limit_exceeded'
+                }
+            }, {
+                'retry-after': str(state.retry_after),
+                'x-ratelimit-remaining-requests': '0',
+                'x-ratelimit-reset-requests': f'{state.retry_after}s'
+            })
+            return
+
+        messages = payload.get('messages', [])
+        prompt_text = '\n'.join(m.get('content', '') for m in messages)
+        answer = state.answer_for(prompt_text)
+        prompt_tokens = sum(count_tokens(m.get('content', '')) + 4 for m in messages) + 3
+        completion_tokens = count_tokens(answer)
+
+        self._send_json(200, {
+            'id': f'chatcmpl-mock-{request_number}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': answer},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+                'prompt_tokens_details': {'cached_tokens': 0}
+            }
+        }, {
+            'x-ratelimit-limit-requests': '10000',
+            'x-ratelimit-remaining-requests': '9999',
+            'x-ratelimit-reset-requests': '6ms',
+            'x-ratelimit-limit-tokens': '10000000',
+            'x-ratelimit-remaining-tokens': str(10000000 - prompt_tokens),
+            'x-ratelimit-reset-tokens': '0s'
+        })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock endpoint chat completions của OpenAI để benchmark gợi ý đơn vị')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=800)
+    parser.add_argument('--jitter-ms', type=float, default=200)
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Xác suất trả về 429 (0-1)')
+    parser.add_argument('--retry-after', type=int, default=5)
+    parser.add_argument('--answers', help='File JSON chứa luật trả lời theo nội dung prompt')
+    parser.add_argument('--default-answer', default='0,1')
+    args = parser.parse_args()
+
+    load_encoding()
+    MockHandler.state = MockState(args)
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    print(f'Mock OpenAI đang chạy tại http://{args.host}:{args.port}/v1')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,48 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import init_db, get_db
+from models.document import Document
+from utils.suggestion_model import document_features
+
+BATCH_SIZE = 1000
+
+if __name__ == '__main__':
+    init_db()
+    db = get_db()
+
+    pipeline = [
+        {'$match': {'document_id': {'$ne': None}, 'unit_id': {'$ne': None}}},
+        {'$group': {'_id': '$document_id', 'unit_ids': {'$addToSet': '$unit_id'}}}
+    ]
+
+    features = {}
+    sent_documents = []
+    count = 0
+    for item in db.history.aggregate(pipeline, allowDiskUse=True):
+        document = Document.get_by_id(item['_id'])
+        if not document:
+            continue
+        unit_ids = {str(unit_id) for unit_id in item['unit_ids']}
+        document_feature_set = sorted(document_features(document))
+        sent_documents.append({'_id': str(item['_id']), 'unit_ids': sorted(unit_ids), 'features': document_feature_set})
+        for feature in document_feature_set:
+            entry = features.setdefault(feature, {'_id': feature, 'docs': 0, 'units': {}})
+            entry['docs'] += 1
+            for unit_id in unit_ids:
+                entry['units'][unit_id] = entry['units'].get(unit_id, 0) + 1
+        count += 1
+        if count % 500 == 0:
+            print(f'Đã xử lý {count} tài liệu...')
+
+    db.suggestion_model.delete_many({})
+    entries = list(features.values())
+    for start in range(0, len(entries), BATCH_SIZE):
+        db.suggestion_model.insert_many(entries[start:start + BATCH_SIZE], ordered=False)
+
+    db.suggestion_documents.delete_many({})
+    for start in range(0, len(sent_documents), BATCH_SIZE):
+        db.suggestion_documents.insert_many(sent_documents[start:start + BATCH_SIZE], ordered=False)
+
+    print(f'Hoàn tất: {count} tài liệu, {len(entries)} đặc trưng')
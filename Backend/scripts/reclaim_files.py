@@ -0,0 +1,19 @@
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import init_db
+from utils.cascade import reclaim_orphan_files
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Xóa file tải lên và bản xem trước không còn tài liệu tham chiếu')
+    parser.add_argument('--min-age-hours', type=float, default=24)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    init_db()
+    removed = reclaim_orphan_files(int(args.min_age_hours * 3600), args.dry_run)
+    for path in removed:
+        print(path)
+    print(f'{len(removed)} file {"sẽ bị" if args.dry_run else "đã được"} xóa')
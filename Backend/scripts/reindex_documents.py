@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import init_db, get_db
+from utils.search_index import index_document
+
+if __name__ == '__main__':
+    init_db()
+    db = get_db()
+
+    reindex_all = '--all' in sys.argv
+    query = {} if reindex_all else {'$or': [
+        {'search_content': {'$exists': False}},
+        {'content_hash': {'$exists': False}}
+    ]}
+
+    count = 0
+    for document in db.documents.find(query, {'_id': 1}).batch_size(100):
+        index_document(str(document['_id']))
+        count += 1
+        if count % 100 == 0:
+            print(f'Đã đánh chỉ mục {count} tài liệu...')
+
+    print(f'Hoàn tất: đã đánh chỉ mục {count} tài liệu')
@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from config.database import init_db, get_db
+from models.user import User
+from models.cache import invalidate_collection
+
+BATCH_SIZE = 500
+
+if __name__ == '__main__':
+    init_db()
+    db = get_db()
+
+    reindex_all = '--all' in sys.argv
+    query = {} if reindex_all else {'search_terms': {'$exists': False}}
+
+    count = 0
+    operations = []
+    for user in db.users.find(query, {'username': 1, 'name': 1, 'phone': 1}).batch_size(BATCH_SIZE):
+        terms = User.search_terms(user.get('username'), user.get('name'), user.get('phone'))
+        operations.append(UpdateOne({'_id': user['_id']}, {'$set': {'search_terms': terms}}))
+        count += 1
+        if len(operations) >= BATCH_SIZE:
+            db.users.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        db.users.bulk_write(operations, ordered=False)
+    invalidate_collection('users')
+
+    print(f'Hoàn tất: đã cập nhật search_terms cho {count} người dùng')
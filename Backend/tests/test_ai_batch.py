@@ -0,0 +1,60 @@
+import json
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from models.document import Document
+from routes import ai
+from utils import jwt_helper
+
+DEPARTMENT = ObjectId()
+OWN = ObjectId()
+OTHER = ObjectId()
+MISSING = ObjectId()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    lookups = []
+
+    def get_by_ids(doc_ids):
+        lookups.append(list(doc_ids))
+        return [
+            {'_id': OWN, 'name': 'Công văn', 'department_id': DEPARTMENT},
+            {'_id': OTHER, 'name': 'Tờ trình', 'department_id': ObjectId()},
+        ]
+
+    monkeypatch.setattr(Document, 'get_by_ids', staticmethod(get_by_ids))
+    monkeypatch.setattr(jwt_helper, 'token_revoked', lambda: False)
+    monkeypatch.setattr(ai, '_get_visible_units', lambda user_id, current_user: [])
+    monkeypatch.setattr(ai, '_history_result', lambda document, units: (None, []))
+    monkeypatch.setattr(ai, 'suggest_units_from_document', lambda document, units, content: {'suggested_ids': []})
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-of-at-least-32-bytes'
+    JWTManager(app)
+    app.register_blueprint(ai.ai_bp, url_prefix='/api/ai')
+    with app.app_context():
+        token = create_access_token(
+            identity=str(ObjectId()),
+            additional_claims={'role': 'department_head', 'department_id': str(DEPARTMENT), 'ver': 0}
+        )
+    test_client = app.test_client()
+    test_client.lookups = lookups
+    test_client.headers = {'Authorization': f'Bearer {token}'}
+    return test_client
+
+
+def test_batch_loads_documents_once_and_reports_access_errors(client):
+    ids = [str(OWN), str(OTHER), str(MISSING), 'not-an-id']
+
+    response = client.post('/api/ai/suggest-units-batch', json={'document_ids': ids}, headers=client.headers)
+    items = {item.get('document_id'): item for item in map(json.loads, response.get_data(as_text=True).splitlines())}
+
+    assert client.lookups == [ids]
+    assert items[str(OTHER)]['message'] == 'Bạn không có quyền truy cập tài liệu này'
+    assert items[str(MISSING)]['message'] == items['not-an-id']['message'] == 'Không tìm thấy tài liệu'
+    assert items[str(OWN)]['is_degraded']
+    assert items[None] == {'is_final': True, 'total': 4, 'completed': 4}
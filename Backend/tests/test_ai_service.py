@@ -0,0 +1,105 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from openai import RateLimitError
+
+from models.history import History
+from utils import ai_service, background, prompt_builder
+
+
+class FakeLimiter:
+    def __init__(self, waits, blocked_for=0):
+        self.waits = list(waits)
+        self.blocked_for = blocked_for
+        self.rate_limited = 0
+
+    def try_acquire(self, tokens=0):
+        if self.waits:
+            return False, self.waits.pop(0)
+        return True, 0
+
+    def record_headers(self, headers):
+        pass
+
+    def record_rate_limited(self, headers):
+        self.rate_limited += 1
+
+    def retry_after(self):
+        return self.blocked_for
+
+
+class FakeClient:
+    def __init__(self, error=None):
+        self.calls = 0
+        raw = SimpleNamespace(
+            headers={},
+            parse=lambda: SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='0, 2'))])
+        )
+
+        def create(**kwargs):
+            self.calls += 1
+            if error is not None:
+                raise error
+            return raw
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+
+
+PROMPT = {'messages': [], 'token_usage': {'prompt_tokens_estimated': 10}}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    def fail(seconds):
+        raise AssertionError('request thread must not sleep')
+    monkeypatch.setattr(time, 'sleep', fail)
+
+
+def test_calls_llm_within_budget_and_records_usage(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(ai_service, 'get_rate_limiter', lambda key: FakeLimiter([]))
+    monkeypatch.setattr(background, 'submit_task', lambda func, *args: func(*args))
+    monkeypatch.setattr(History, 'record_ai_usage', staticmethod(lambda *args: recorded.append(args)))
+    client = FakeClient()
+
+    result, usage, retry_after = ai_service._request_completion(client, PROMPT, 'doc-1')
+
+    assert (result, retry_after, client.calls) == ('0, 2', 0, 1)
+    assert recorded == [('doc-1', prompt_builder.get_model(), usage)]
+
+
+def test_falls_back_immediately_when_budget_is_exhausted(monkeypatch):
+    monkeypatch.setattr(ai_service, 'get_rate_limiter', lambda key: FakeLimiter([0.01]))
+    client = FakeClient()
+
+    result, _, retry_after = ai_service._request_completion(client, PROMPT)
+
+    assert (result, retry_after, client.calls) == (None, 0.01, 0)
+
+
+def test_falls_back_immediately_on_429(monkeypatch):
+    limiter = FakeLimiter([], blocked_for=7)
+    monkeypatch.setattr(ai_service, 'get_rate_limiter', lambda key: limiter)
+    error = RateLimitError('rate limited', response=SimpleNamespace(headers={}, request=None, status_code=429), body=None)
+    client = FakeClient(error)
+
+    result, _, retry_after = ai_service._request_completion(client, PROMPT)
+
+    assert (result, retry_after, client.calls, limiter.rate_limited) == (None, 7, 1, 1)
+
+
+def test_fallback_suggestion_carries_retry_after():
+    units = [{'id': 'u1', 'name': 'Phòng Kế toán'}]
+
+    result = ai_service._rate_limited_fallback('Báo cáo kế toán', 'kế toán', units, 2.5)
+
+    assert result['is_fallback'] and result['retry_after'] == 3
+
+
+def test_token_count_does_not_load_encoding_on_request(monkeypatch):
+    monkeypatch.setattr(prompt_builder, '_encoding', None)
+    monkeypatch.setattr(prompt_builder, '_encoding_loaded', False)
+    monkeypatch.setattr(prompt_builder, 'load_encoding', lambda: pytest.fail('encoding loaded on request'))
+
+    assert prompt_builder.count_tokens('abcdef') == 2
@@ -0,0 +1,63 @@
+from models import cache
+from models.cache import EntityCache
+
+
+class FakeStamps:
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query):
+        doc = self.docs.get(query['_id'])
+        return dict(doc, changes=list(doc['changes'])) if doc else None
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        doc = self.docs.setdefault(query['_id'], {'_id': query['_id'], 'version': 0, 'changes': []})
+        doc['version'] += update['$inc']['version']
+        push = update['$push']['changes']
+        doc['changes'] = (doc['changes'] + push['$each'])[push['$slice']:]
+        return self.find_one(query)
+
+
+def _caches(monkeypatch):
+    stamps = FakeStamps()
+    monkeypatch.setattr(cache, 'get_db', lambda: {cache._STAMPS: stamps})
+    monkeypatch.setenv('ENTITY_CACHE_VERSION_CHECK', '0')
+    return EntityCache('users'), EntityCache('users')
+
+
+def _load(cache_instance, key):
+    return cache_instance.get(key, lambda: {'key': key})
+
+
+def test_key_invalidation_only_drops_that_key_elsewhere(monkeypatch):
+    writer, reader = _caches(monkeypatch)
+    for key in ('a', 'b'):
+        _load(reader, key)
+
+    writer.invalidate('a')
+    _load(reader, 'b')
+
+    assert list(reader.entries) == ['b']
+
+
+def test_collection_invalidation_clears_everything(monkeypatch):
+    writer, reader = _caches(monkeypatch)
+    for key in ('a', 'b'):
+        _load(reader, key)
+
+    writer.invalidate()
+    reader._sync_version()
+
+    assert not reader.entries
+
+
+def test_clears_when_more_changes_than_log(monkeypatch):
+    monkeypatch.setattr(cache, 'CHANGE_LOG_SIZE', 2)
+    writer, reader = _caches(monkeypatch)
+    _load(reader, 'keep')
+
+    for key in ('x', 'y', 'z'):
+        writer.invalidate(key)
+    reader._sync_version()
+
+    assert not reader.entries
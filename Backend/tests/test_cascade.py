@@ -0,0 +1,122 @@
+from utils import cascade
+
+
+class FakeTimer:
+    created = []
+
+    def __init__(self, delay, func, args=()):
+        self.delay = delay
+        self.func = func
+        self.args = args
+        self.daemon = False
+        FakeTimer.created.append(self)
+
+    def start(self):
+        pass
+
+
+def test_failed_cascade_schedules_retry_on_a_timer(monkeypatch):
+    submitted = []
+    job = {'type': 'cascade:unit', 'payload': {}, 'attempts': 1}
+
+    def failing_handler(payload):
+        raise RuntimeError('db down')
+
+    monkeypatch.setitem(cascade.HANDLERS, 'unit', failing_handler)
+    monkeypatch.setattr(cascade.Job, 'claim', staticmethod(lambda job_id: job))
+    monkeypatch.setattr(cascade.Job, 'fail', staticmethod(lambda job_id, error, retry: None))
+    monkeypatch.setattr(cascade, 'submit_task', lambda func, *args: submitted.append((func, args)))
+    monkeypatch.setattr(cascade.threading, 'Timer', FakeTimer)
+    FakeTimer.created = []
+
+    try:
+        cascade.run_job('job-1')
+    except RuntimeError:
+        pass
+
+    assert submitted == []
+    timer, = FakeTimer.created
+    assert (timer.delay, timer.daemon) == (2, True)
+    timer.func(*timer.args)
+    assert submitted == [(cascade.run_job, ('job-1',))]
+
+
+class FakeUpdateResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class FakeCursor(list):
+    def limit(self, size):
+        return FakeCursor(self[:size])
+
+
+class FakeCollection:
+    def __init__(self, items):
+        self.items = items
+        self.update_calls = 0
+
+    def _matches(self, item, query):
+        for field, condition in query.items():
+            if isinstance(condition, dict) and '$exists' in condition:
+                if (field in item) != condition['$exists']:
+                    return False
+            elif isinstance(condition, dict) and '$in' in condition:
+                if item.get(field) not in condition['$in']:
+                    return False
+            elif item.get(field) != condition:
+                return False
+        return True
+
+    def find(self, query, projection=None):
+        return FakeCursor(item for item in self.items if self._matches(item, query))
+
+    def update_many(self, query, update):
+        self.update_calls += 1
+        matched = [item for item in self.items if self._matches(item, query)]
+        for item in matched:
+            item.update(update['$set'])
+        return FakeUpdateResult(len(matched))
+
+
+def test_unit_cascade_snapshots_names_in_batches(monkeypatch):
+    history = FakeCollection(
+        [{'_id': i, 'unit_id': 'u1'} for i in range(5)]
+        + [{'_id': 5, 'unit_id': 'u1', 'unit_name': 'Tên cũ'}, {'_id': 6, 'unit_id': 'u2'}]
+    )
+    invalidated = []
+    monkeypatch.setattr(cascade, 'get_db', lambda: {'history': history})
+    monkeypatch.setattr(cascade, 'invalidate_collection', invalidated.append)
+    monkeypatch.setenv('CASCADE_BATCH_SIZE', '2')
+
+    modified = cascade._update_in_batches(
+        'history',
+        {'unit_id': 'u1', 'unit_name': {'$exists': False}},
+        {'$set': {'unit_name': 'Đơn vị A'}}
+    )
+
+    assert (modified, history.update_calls) == (5, 3)
+    assert [item.get('unit_name') for item in history.items] == ['Đơn vị A'] * 5 + ['Tên cũ', None]
+    assert invalidated == ['history'] * 3
+
+
+def test_last_attempt_is_not_retried(monkeypatch):
+    failures = []
+    job = {'type': 'cascade:unit', 'payload': {}, 'attempts': cascade.MAX_ATTEMPTS}
+
+    def failing_handler(payload):
+        raise RuntimeError('db down')
+
+    monkeypatch.setitem(cascade.HANDLERS, 'unit', failing_handler)
+    monkeypatch.setattr(cascade.Job, 'claim', staticmethod(lambda job_id: job))
+    monkeypatch.setattr(cascade.Job, 'fail', staticmethod(lambda job_id, error, retry: failures.append((error, retry))))
+    monkeypatch.setattr(cascade.threading, 'Timer', FakeTimer)
+    FakeTimer.created = []
+
+    try:
+        cascade.run_job('job-1')
+    except RuntimeError:
+        pass
+
+    assert failures == [('db down', False)]
+    assert FakeTimer.created == []
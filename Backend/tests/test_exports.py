@@ -0,0 +1,82 @@
+from bson import ObjectId
+
+from routes import exports
+
+
+class FakeCursor:
+    def __init__(self, items):
+        self.items = items
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class FakeCollection:
+    def __init__(self, items):
+        self.items = items
+
+    def find(self, query=None, projection=None):
+        items = self.items
+        if query and '_id' in query:
+            wanted = set(query['_id']['$in'])
+            items = [item for item in items if item['_id'] in wanted]
+        if projection:
+            items = [{key: value for key, value in item.items() if key == '_id' or key in projection} for item in items]
+        return FakeCursor(items)
+
+
+class FakeDb(dict):
+    def __getattr__(self, name):
+        return self[name]
+
+
+def test_history_export_uses_snapshot_names_after_delete(monkeypatch):
+    user_id = ObjectId()
+    db = FakeDb(
+        history=FakeCollection([{
+            '_id': ObjectId(),
+            'document_id': str(ObjectId()),
+            'document_name': 'Công văn đã xóa.pdf',
+            'unit_id': str(ObjectId()),
+            'unit_name': 'Đơn vị đã xóa',
+            'status': 'sent',
+            'user_id': str(user_id),
+            'created_at': None
+        }]),
+        documents=FakeCollection([]),
+        units=FakeCollection([]),
+        users=FakeCollection([{'_id': user_id, 'name': 'Nguyễn Văn A'}])
+    )
+    monkeypatch.setattr(exports, 'get_db', lambda: db)
+
+    rows = list(exports._iter_rows(exports._history_spec({}, None)))
+
+    assert rows == [['', 'Công văn đã xóa.pdf', 'Đơn vị đã xóa', 'sent', 'Nguyễn Văn A']]
+
+
+def test_xlsx_stream_is_a_readable_workbook(monkeypatch):
+    import io
+    import uuid
+
+    from openpyxl import load_workbook
+
+    monkeypatch.setattr(exports, 'CSV_FLUSH_BYTES', 256)
+    rows = ([f'Đơn vị {i} <&>', i, 'a\x01b', None, uuid.uuid4().hex] for i in range(2000))
+
+    chunks = list(exports._xlsx_stream('units', ['Tên', 'Số', 'Ghi chú', 'Trống', 'Mã'], rows))
+    sheet = load_workbook(io.BytesIO(b''.join(chunks)), read_only=True).active
+    values = list(sheet.iter_rows(values_only=True))
+
+    assert len(chunks) > 2
+    assert values[0] == ('Tên', 'Số', 'Ghi chú', 'Trống', 'Mã')
+    assert values[1][:4] == ('Đơn vị 0 <&>', 0, 'ab', None)
+    assert len(values) == 2001
@@ -0,0 +1,37 @@
+from utils import extraction_sandbox
+from utils.extractors import ExtractionError
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_format_is_sniffed_inside_sandbox(tmp_path):
+    filepath = _write(tmp_path, 'note.pdf', b'plain text, not a pdf')
+
+    text, reason = extraction_sandbox.extract_text_safely(filepath)
+
+    assert text is None
+    assert reason == 'unsupported_format'
+
+
+def test_timeout_is_not_cached_as_bad_hash(tmp_path, monkeypatch):
+    filepath = _write(tmp_path, 'slow.pdf', b'%PDF-1.4 slow')
+
+    def timeout(*args):
+        raise ExtractionError('timeout')
+
+    monkeypatch.setattr(extraction_sandbox, 'run_in_sandbox', timeout)
+    assert extraction_sandbox.extract_text_safely(filepath) == (None, 'timeout')
+    assert extraction_sandbox.get_failure(extraction_sandbox.file_hash(filepath)) is None
+
+
+def test_bad_hash_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(extraction_sandbox, '_BAD_HASH_CACHE_SIZE', 3)
+    monkeypatch.setattr(extraction_sandbox, '_bad_hashes', extraction_sandbox.OrderedDict())
+    for index in range(5):
+        extraction_sandbox._remember_failure(f'hash-{index}', 'no_text')
+
+    assert list(extraction_sandbox._bad_hashes) == ['hash-2', 'hash-3', 'hash-4']
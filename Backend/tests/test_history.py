@@ -0,0 +1,20 @@
+from models import history
+from models.history import History
+from utils import background
+
+
+def test_peek_frequent_units_never_waits_for_mongo(monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(background, 'submit_task', lambda func, *args: scheduled.append((func, args)))
+    monkeypatch.setattr(History, 'get_frequent_units_for_user', staticmethod(lambda user_id: [('unit-1', 3)]))
+    monkeypatch.setattr(history, '_frequent_units', history.OrderedDict())
+    monkeypatch.setattr(history, '_frequent_pending', set())
+
+    assert History.peek_frequent_units('user-1') == []
+    assert History.peek_frequent_units('user-1') == []
+    assert len(scheduled) == 1
+
+    func, args = scheduled[0]
+    func(*args)
+    assert History.peek_frequent_units('user-1') == [('unit-1', 3)]
+    assert len(scheduled) == 1
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from migrations import runner
+from migrations.runner import MigrationLocked
+
+
+class FakeLocks:
+    def __init__(self):
+        self.docs = {}
+
+    def _matches(self, doc, query):
+        for field, condition in query.items():
+            if field == '$or':
+                if not any(self._matches(doc, option) for option in condition):
+                    return False
+            elif isinstance(condition, dict):
+                if '$exists' in condition and (field in doc) != condition['$exists']:
+                    return False
+                if '$lt' in condition and not (field in doc and doc[field] < condition['$lt']):
+                    return False
+            elif doc.get(field) != condition:
+                return False
+        return True
+
+    def insert_one(self, doc):
+        if doc['_id'] in self.docs:
+            raise DuplicateKeyError('lock')
+        self.docs[doc['_id']] = dict(doc)
+
+    def find_one(self, query):
+        return self.docs.get(query['_id'])
+
+    def update_one(self, query, update):
+        doc = self.docs.get(query['_id'])
+        if doc is None or not self._matches(doc, query):
+            return SimpleNamespace(matched_count=0, modified_count=0)
+        doc.update(update['$set'])
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+    def delete_one(self, query):
+        doc = self.docs.get(query['_id'])
+        if doc is not None and self._matches(doc, query):
+            del self.docs[query['_id']]
+
+
+@pytest.fixture
+def locks(monkeypatch):
+    fake = FakeLocks()
+    monkeypatch.setattr(runner, '_collection', lambda: fake)
+    monkeypatch.setattr(runner, '_lock_owner', None)
+    return fake
+
+
+def test_live_lock_blocks_second_run(locks):
+    runner.acquire_lock('a')
+
+    with pytest.raises(MigrationLocked):
+        runner.acquire_lock('b')
+
+
+def test_expired_lock_is_taken_over(locks):
+    runner.acquire_lock('a')
+    locks.docs[runner.LOCK_ID]['expires_at'] = datetime.utcnow() - timedelta(seconds=1)
+
+    runner.acquire_lock('b')
+
+    assert locks.docs[runner.LOCK_ID]['owner'] == 'b'
+    runner.release_lock('a')
+    assert runner.LOCK_ID in locks.docs
+
+
+def test_lock_without_lease_expires_by_age(locks):
+    acquired_at = datetime.utcnow() - timedelta(seconds=runner.DEFAULT_LOCK_LEASE_SECONDS + 1)
+    locks.docs[runner.LOCK_ID] = {'_id': runner.LOCK_ID, 'owner': 'old', 'acquired_at': acquired_at}
+
+    runner.acquire_lock('b')
+
+    assert locks.docs[runner.LOCK_ID]['owner'] == 'b'
+
+
+def test_renew_fails_after_takeover(locks):
+    runner.acquire_lock('a')
+    locks.docs[runner.LOCK_ID]['owner'] = 'b'
+
+    with pytest.raises(MigrationLocked):
+        runner.renew_lock()
@@ -0,0 +1,39 @@
+from utils import rate_limiter
+from utils.rate_limiter import RateLimiter
+
+
+def test_local_limiter_never_touches_shared_state(monkeypatch):
+    monkeypatch.setenv('AI_RATE_LIMIT_SHARED', '0')
+    limiter = RateLimiter('bench', rpm=1, tpm=1000)
+
+    def fail():
+        raise AssertionError('shared collection used')
+    monkeypatch.setattr(limiter, '_collection', fail)
+
+    assert limiter.try_acquire(10) == (True, 0)
+    acquired, retry_after = limiter.try_acquire(10)
+    limiter.record_rate_limited({'retry-after': '3'})
+
+    assert not acquired and retry_after > 0
+    assert 2 < limiter.retry_after() <= 3
+
+
+def test_parse_duration_reads_openai_reset_headers():
+    assert rate_limiter.parse_duration('6m0s') == 360
+    assert rate_limiter.parse_duration('250ms') == 0.25
+    assert rate_limiter.parse_duration('1.5') == 1.5
+    assert rate_limiter.parse_duration('soon') is None
+
+
+def test_exhausted_headers_block_until_reset(monkeypatch):
+    limiter = RateLimiter('bench', rpm=10, tpm=1000, shared=False)
+
+    limiter.record_headers({
+        'x-ratelimit-limit-requests': '60',
+        'x-ratelimit-remaining-requests': '0',
+        'x-ratelimit-reset-requests': '2s',
+    })
+    acquired, retry_after = limiter.try_acquire(10)
+
+    assert limiter.rpm == 60
+    assert not acquired and 1 < retry_after <= 2
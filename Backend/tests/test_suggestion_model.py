@@ -0,0 +1,80 @@
+import threading
+
+from config import database
+from models.document import Document
+from utils import suggestion_model
+from utils.suggestion_model import SuggestionModel
+
+
+class FakeSentDocuments:
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.Lock()
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        with self.lock:
+            before = self.docs.get(query['_id'])
+            if before is None:
+                self.docs[query['_id']] = dict(update['$setOnInsert'], unit_ids=[update['$addToSet']['unit_ids']])
+                return None
+            snapshot = dict(before, unit_ids=list(before['unit_ids']))
+            if update['$addToSet']['unit_ids'] not in before['unit_ids']:
+                before['unit_ids'].append(update['$addToSet']['unit_ids'])
+            return snapshot
+
+
+def _observe_sends(monkeypatch, sends):
+    observed = []
+    collection = FakeSentDocuments()
+    monkeypatch.setattr(database, 'get_db', lambda: {'suggestion_documents': collection})
+    monkeypatch.setattr(Document, 'get_by_id', staticmethod(lambda document_id: {'name': 'Công văn tuyển dụng'}))
+    monkeypatch.setattr(suggestion_model._model, 'observe', lambda features, unit_id, new: observed.append((unit_id, new)))
+    threads = [threading.Thread(target=suggestion_model.observe_send, args=send) for send in sends]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return observed
+
+
+def test_concurrent_first_sends_count_document_once(monkeypatch):
+    observed = _observe_sends(monkeypatch, [('doc-1', 'unit-a'), ('doc-1', 'unit-b'), ('doc-1', 'unit-a')])
+
+    assert sorted(unit_id for unit_id, _ in observed) == ['unit-a', 'unit-b']
+    assert [new for _, new in observed].count(True) == 1
+
+
+def test_probability_is_clamped():
+    model = SuggestionModel()
+    model.loaded_at = float('inf')
+    model.features = {'name:tuyen': (2, {'unit-a': 9})}
+
+    predictions, _ = model.predict({'name': 'tuyen'})
+
+    assert predictions == [('unit-a', 1.0)]
+
+
+def _trained_model():
+    model = SuggestionModel()
+    model.loaded_at = float('inf')
+    model.documents = 100
+    model.features = {
+        'name:cong': (90, {'unit-a': 85}),
+        'name:tuyen': (12, {'unit-b': 11}),
+    }
+    return model
+
+
+def test_common_token_alone_does_not_skip_llm():
+    predictions, support = _trained_model().predict({'name': 'cong'})
+
+    assert predictions[0][0] == 'unit-a' and predictions[0][1] >= 0.8
+    assert support == 0
+    assert suggestion_model.confident_units(predictions, support) == []
+
+
+def test_specific_token_supports_its_unit():
+    predictions, support = _trained_model().predict({'name': 'tuyen'})
+
+    assert support == 11
+    assert suggestion_model.confident_units(predictions, support) == ['unit-b']
@@ -0,0 +1,32 @@
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('BACKGROUND_WORKERS', 2)),
+                thread_name_prefix='background'
+            )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        traceback.print_exc()
+
+
+def submit_task(func, *args, **kwargs):
+    """
+    Chạy func trong thread nền dùng chung để request trả về ngay; lỗi chỉ được log.
+    """
+    return _get_executor().submit(_run, func, args, kwargs)
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+
+from config.database import get_db
+from models.cache import invalidate_collection
+from models.ids import object_id
+from models.job import Job
+from utils.background import submit_task
+
+DEFAULT_BATCH_SIZE = 500
+MAX_ATTEMPTS = 3
+STALE_SECONDS = 600
+UPLOAD_FOLDER = 'uploads'
+
+
+def _batch_size():
+    try:
+        return max(1, int(os.getenv('CASCADE_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+    except ValueError:
+        return DEFAULT_BATCH_SIZE
+
+
+def _update_in_batches(collection, query, update):
+    """
+    update_many theo từng lô _id để không giữ khóa lâu trên collection lớn. update phải làm bản ghi
+    không còn khớp query (nếu không vòng lặp sẽ không dừng).
+    """
+    db = get_db()
+    modified = 0
+    while True:
+        ids = [item['_id'] for item in db[collection].find(query, {'_id': 1}).limit(_batch_size())]
+        if not ids:
+            return modified
+        result = db[collection].update_many(dict(query, _id={'$in': ids}), update)
+        modified += result.modified_count
+        if result.modified_count:
+            invalidate_collection(collection)
+        else:
+            return modified
+
+
+def _cascade_department(payload):
+    db = get_db()
+    department_id = object_id(payload['id'])
+    result = {
+        collection: _update_in_batches(collection, {'department_id': department_id}, {'$set': {'department_id': None}})
+        for collection in ('units', 'documents')
+    }
+    # Thành viên mất phòng ban: tăng token_version để token cũ (mang department_id cũ) hết hiệu lực
+    result['users'] = _update_in_batches(
+        'users',
+        {'department_id': department_id},
+        {'$set': {'department_id': None}, '$inc': {'token_version': 1}}
+    )
+    if result['users']:
+        invalidate_collection('token_versions')
+    db.suggestion_model.delete_one({'_id': f"dept:{payload['id']}"})
+    return result
+
+
+def _cascade_unit(payload):
+    db = get_db()
+    unit_id = payload['id']
+    history = _update_in_batches(
+        'history',
+        {'unit_id': unit_id, 'unit_name': {'$exists': False}},
+        {'$set': {'unit_name': payload.get('name')}}
+    )
+    db.suggestion_model.update_many({f'units.{unit_id}': {'$exists': True}}, {'$unset': {f'units.{unit_id}': ''}})
+    return {'history': history}
+
+
+def _cascade_user(payload):
+    """
+    Tài liệu và đơn vị của người bị xóa chuyển cho người thực hiện xóa; các tham chiếu khác được gỡ.
+    """
+    user_id = payload['id']
+    user_oid = object_id(user_id)
+    reassign_to = object_id(payload.get('reassign_to'))
+    return {
+        'documents': _update_in_batches('documents', {'user_id': user_oid}, {'$set': {'user_id': reassign_to}}),
+        'units': _update_in_batches('units', {'user_id': user_oid}, {'$set': {'user_id': reassign_to}}),
+        'departments': _update_in_batches('departments', {'head_id': user_id}, {'$set': {'head_id': None}}),
+        'users': _update_in_batches('users', {'created_by': user_oid}, {'$set': {'created_by': None}}),
+        'history': _update_in_batches(
+            'history',
+            {'user_id': user_id, 'user_name': {'$exists': False}},
+            {'$set': {'user_name': payload.get('name')}}
+        )
+    }
+
+
+def _cascade_document(payload):
+    from utils.previews import remove_previews
+    db = get_db()
+    history = _update_in_batches(
+        'history',
+        {'document_id': payload['id'], 'document_name': {'$exists': False}},
+        {'$set': {'document_name': payload.get('name')}}
+    )
+    removed = []
+    filepath = payload.get('filepath')
+    filename = payload.get('filename')
+    if filepath and os.path.exists(filepath) and not db.documents.count_documents({'filename': filename}, limit=1):
+        os.remove(filepath)
+        removed.append(filepath)
+    content_hash = payload.get('content_hash')
+    if content_hash and not db.documents.count_documents({'content_hash': content_hash}, limit=1):
+        remove_previews(content_hash)
+    return {'history': history, 'files': removed}
+
+
+HANDLERS = {
+    'department': _cascade_department,
+    'unit': _cascade_unit,
+    'user': _cascade_user,
+    'document': _cascade_document,
+}
+
+
+def _schedule_retry(job_id, delay):
+    """
+    Chờ backoff bằng timer riêng rồi mới đưa job vào pool nền, không giữ thread của pool trong lúc chờ.
+    """
+    timer = threading.Timer(delay, submit_task, args=(run_job, job_id))
+    timer.daemon = True
+    timer.start()
+
+
+def run_job(job_id):
+    job = Job.claim(job_id)
+    if not job:
+        return
+    entity = job['type'].split(':', 1)[1]
+    try:
+        Job.finish(job_id, HANDLERS[entity](job['payload']))
+    except Exception as e:
+        retry = job.get('attempts', 1) < MAX_ATTEMPTS
+        Job.fail(job_id, str(e), retry)
+        if retry:
+            _schedule_retry(job_id, 2 ** job.get('attempts', 1))
+        raise
+
+
+def enqueue_cascade(entity, payload):
+    """
+    Lưu job dọn tham chiếu sau khi xóa một bản ghi và chạy nó ở thread nền; request không phải chờ.
+    """
+    job_id = Job.create(f'cascade:{entity}', payload)
+    submit_task(run_job, job_id)
+    return job_id
+
+
+def resume_jobs():
+    """
+    Chạy lại các job còn dang dở từ lần chạy trước (gọi khi khởi động ứng dụng).
+    """
+    for job_id in Job.requeue_unfinished(STALE_SECONDS):
+        submit_task(run_job, job_id)
+
+
+def reclaim_orphan_files(min_age_seconds=86400, dry_run=False):
+    """
+    Xóa file trong thư mục uploads và bản xem trước không còn tài liệu nào tham chiếu.
+    Chỉ xét file cũ hơn min_age_seconds để không đụng vào file đang được tải lên.
+    """
+    from utils.previews import preview_folder
+    db = get_db()
+    cutoff = time.time() - min_age_seconds
+    removed = []
+
+    for entry in os.scandir(UPLOAD_FOLDER):
+        if not entry.is_file() or entry.stat().st_mtime > cutoff:
+            continue
+        if not db.documents.count_documents({'filename': entry.name}, limit=1):
+            removed.append(entry.path)
+
+    if os.path.isdir(preview_folder()):
+        for entry in os.scandir(preview_folder()):
+            if not entry.is_file() or entry.stat().st_mtime > cutoff:
+                continue
+            content_hash = entry.name.split('.', 1)[0]
+            if not db.documents.count_documents({'content_hash': content_hash}, limit=1):
+                removed.append(entry.path)
+
+    if not dry_run:
+        for path in removed:
+            os.remove(path)
+    return removed
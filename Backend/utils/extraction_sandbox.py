@@ -0,0 +1,215 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from utils.extractors import MAX_CHARS, ExtractionError, sniff_and_extract
+
+DEFAULT_TIMEOUT = 20
+DEFAULT_MEMORY_LIMIT_MB = 1024
+DEFAULT_MAX_WORKERS = 2
+QUEUE_WAIT_SECONDS = 5
+_TEXT_CACHE_SIZE = 128
+_BAD_HASH_CACHE_SIZE = 1024
+
+# Lỗi chỉ phụ thuộc vào nội dung file: lặp lại y hệt nên được ghi vào danh sách hash hỏng.
+# Các lỗi khác (busy, timeout, crash...) có thể do tải của máy nên lần sau vẫn thử lại.
+DETERMINISTIC_REASONS = {'unsupported_format', 'no_text', 'invalid_text', 'no_pages', 'memory_limit'}
+
+_context = None
+_slots = None
+_lock = threading.Lock()
+_text_cache = OrderedDict()
+_bad_hashes = OrderedDict()
+
+
+def _get_int_env(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def max_workers():
+    return max(1, _get_int_env('EXTRACTION_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+
+
+def _get_context():
+    global _context, _slots
+    with _lock:
+        if _context is None:
+            methods = multiprocessing.get_all_start_methods()
+            if 'forkserver' in methods:
+                _context = multiprocessing.get_context('forkserver')
+                _context.set_forkserver_preload(['utils.extractors'])
+            else:
+                _context = multiprocessing.get_context('spawn')
+            _slots = threading.BoundedSemaphore(max_workers())
+    return _context
+
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _worker(conn, target, args, memory_limit_mb):
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    try:
+        conn.send(('ok', target(*args)))
+    except ExtractionError as e:
+        conn.send(('error', e.reason))
+    except MemoryError:
+        conn.send(('error', 'memory_limit'))
+    except Exception as e:
+        conn.send(('error', f'parse_error: {type(e).__name__}'))
+    finally:
+        conn.close()
+
+
+def run_in_sandbox(target, *args):
+    """
+    Gọi target(*args) trong tiến trình con có giới hạn bộ nhớ và thời gian.
+    target phải là hàm cấp module; lỗi được trả về dưới dạng ExtractionError(reason).
+    """
+    context = _get_context()
+    if not _slots.acquire(timeout=QUEUE_WAIT_SECONDS):
+        raise ExtractionError('busy')
+
+    process = None
+    try:
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_worker,
+            args=(child_conn, target, args,
+                  _get_int_env('EXTRACTION_MEMORY_LIMIT_MB', DEFAULT_MEMORY_LIMIT_MB)),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        if not parent_conn.poll(_get_int_env('EXTRACTION_TIMEOUT', DEFAULT_TIMEOUT)):
+            raise ExtractionError('timeout')
+        try:
+            status, payload = parent_conn.recv()
+        except EOFError:
+            process.join(1)
+            raise ExtractionError(f'crashed: exitcode {process.exitcode}')
+        if status != 'ok':
+            raise ExtractionError(payload)
+        return payload
+    except (OSError, ValueError) as e:
+        raise ExtractionError('sandbox_error') from e
+    finally:
+        if process is not None and process.is_alive():
+            process.kill()
+        if process is not None:
+            process.join(1)
+        _slots.release()
+
+
+def is_deterministic(reason):
+    return reason in DETERMINISTIC_REASONS or reason.startswith('parse_error')
+
+
+def _remember_failure(content_hash, reason):
+    with _lock:
+        _bad_hashes[content_hash] = reason
+        _bad_hashes.move_to_end(content_hash)
+        while len(_bad_hashes) > _BAD_HASH_CACHE_SIZE:
+            _bad_hashes.popitem(last=False)
+
+
+def get_failure(content_hash):
+    """
+    Lý do extract thất bại đã ghi nhận trước đó cho nội dung file (theo sha256), nếu có.
+    """
+    with _lock:
+        if content_hash in _bad_hashes:
+            _bad_hashes.move_to_end(content_hash)
+            return _bad_hashes[content_hash]
+    try:
+        from config.database import get_db
+        record = get_db().extraction_failures.find_one({'_id': content_hash})
+    except Exception:
+        return None
+    if record:
+        _remember_failure(content_hash, record.get('reason'))
+        return record.get('reason')
+    return None
+
+
+def _record_failure(content_hash, filepath, reason):
+    _remember_failure(content_hash, reason)
+    try:
+        from config.database import get_db
+        get_db().extraction_failures.update_one(
+            {'_id': content_hash},
+            {'$set': {
+                'reason': reason,
+                'filename': os.path.basename(filepath),
+                'created_at': datetime.utcnow()
+            }},
+            upsert=True
+        )
+    except Exception:
+        pass
+
+
+def _cache_text(key, text):
+    with _lock:
+        _text_cache[key] = text
+        _text_cache.move_to_end(key)
+        while len(_text_cache) > _TEXT_CACHE_SIZE:
+            _text_cache.popitem(last=False)
+
+
+def extract_text_safely(filepath, max_chars=MAX_CHARS):
+    """
+    Extract text trong tiến trình con có giới hạn thời gian và bộ nhớ.
+    Trả về (text, reason); text là None khi thất bại và reason cho biết lý do.
+    """
+    if not filepath or not os.path.exists(filepath):
+        return None, 'file_not_found'
+
+    try:
+        content_hash = file_hash(filepath)
+    except OSError:
+        return None, 'file_not_found'
+
+    cache_key = (content_hash, max_chars)
+    with _lock:
+        if cache_key in _text_cache:
+            _text_cache.move_to_end(cache_key)
+            return _text_cache[cache_key], None
+
+    reason = get_failure(content_hash)
+    if reason:
+        return None, reason
+
+    try:
+        # Nhận diện định dạng cũng mở file (zip, OLE) nên chạy luôn trong tiến trình con
+        if os.getenv('EXTRACTION_SANDBOX', '1') == '0':
+            _, text = sniff_and_extract(filepath, max_chars)
+        else:
+            _, text = run_in_sandbox(sniff_and_extract, filepath, max_chars)
+    except ExtractionError as e:
+        if is_deterministic(e.reason):
+            _record_failure(content_hash, filepath, e.reason)
+        return None, e.reason
+    except Exception as e:
+        return None, f'parse_error: {type(e).__name__}'
+
+    _cache_text(cache_key, text)
+    return text, None
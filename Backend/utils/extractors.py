@@ -0,0 +1,473 @@
+import os
+import re
+import warnings
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+MAX_CHARS = 5000
+MAX_PDF_PAGES = 10
+MAX_SHEETS = 3
+MAX_SHEET_ROWS = 50
+
+EXTRACTORS = {}
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class ExtractionError(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def register_extractor(*extensions, validate=False):
+    """
+    Đăng ký extractor (generator trả về từng đoạn text) cho các định dạng file.
+    validate=True thì kết quả phải qua is_valid_text mới được chấp nhận.
+    """
+    def decorator(func):
+        for extension in extensions:
+            EXTRACTORS[extension] = (func, validate)
+        return func
+    return decorator
+
+
+def sniff_format(filepath):
+    """
+    Xác định định dạng thật của file qua magic bytes, không tin vào đuôi file.
+    """
+    with open(filepath, 'rb') as f:
+        head = f.read(1024)
+    magic = head[:8]
+
+    if magic.startswith(b'PK\x03\x04'):
+        try:
+            with zipfile.ZipFile(filepath) as archive:
+                names = set(archive.namelist())
+        except zipfile.BadZipFile:
+            return None
+        if 'word/document.xml' in names:
+            return '.docx'
+        if 'xl/workbook.xml' in names:
+            return '.xlsx'
+        return None
+    if magic == b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1':
+        import olefile
+        with olefile.OleFileIO(filepath) as ole:
+            if ole.exists('WordDocument'):
+                return '.doc'
+            if ole.exists('Workbook') or ole.exists('Book'):
+                return '.xls'
+        return None
+    if b'%PDF-' in head:
+        return '.pdf'
+    return None
+
+
+def is_valid_text(text):
+    if not text or not text.strip():
+        return False
+    
+    text = text.strip()
+    
+    if len(text) < 10:
+        return False
+    
+    letter_chars = 0
+    invalid_chars = 0
+    
+    vietnamese_chars = 'àáảãạăằắẳẵặâầấẩẫậèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵđĐÀÁẢÃẠĂẰẮẲẴẶÂẦẤẨẪẬÈÉẺẼẸÊỀẾỂỄỆÌÍỈĨỊÒÓỎÕỌÔỒỐỔỖỘƠỜỚỞỠỢÙÚỦŨỤƯỪỨỬỮỰỲÝỶỸỴĐ'
+    
+    for char in text:
+        if char.isprintable() or char in '\n\r\t':
+            if char.isalpha() or char in vietnamese_chars:
+                letter_chars += 1
+        else:
+            invalid_chars += 1
+    
+    if invalid_chars > len(text) * 0.1:
+        return False
+    
+    if letter_chars < len(text) * 0.2:
+        return False
+    
+    special_chars_pattern = r'[^a-zA-Z0-9' + re.escape(vietnamese_chars) + r'\s.,;:!?\-_=+()\[\]{}|/\\]{20,}'
+    if re.search(special_chars_pattern, text):
+        return False
+    
+    control_count = sum(1 for c in text if ord(c) < 32 and c not in '\n\r\t')
+    if control_count > len(text) * 0.05:
+        return False
+    
+    return True
+
+
+def _collect(fragments, max_chars):
+    parts = []
+    total = 0
+    try:
+        for fragment in fragments:
+            if not fragment:
+                continue
+            fragment = fragment.strip()
+            if not fragment:
+                continue
+            parts.append(fragment)
+            total += len(fragment) + 1
+            if total >= max_chars:
+                break
+    finally:
+        fragments.close()
+    return '\n'.join(parts)[:max_chars]
+
+
+def extract_text_or_raise(filepath, max_chars=MAX_CHARS, file_format=None):
+    """
+    Đọc text của file theo từng đoạn và dừng ngay khi đủ max_chars ký tự.
+    Chỉ dùng một parser duy nhất theo định dạng; lỗi được báo bằng ExtractionError.
+    """
+    if not filepath or not os.path.exists(filepath):
+        raise ExtractionError('file_not_found')
+
+    file_format = file_format or sniff_format(filepath)
+    if file_format not in EXTRACTORS:
+        raise ExtractionError('unsupported_format')
+
+    extractor, validate = EXTRACTORS[file_format]
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            text = _collect(extractor(filepath), max_chars)
+    except MemoryError:
+        raise ExtractionError('memory_limit')
+    except ImportError:
+        raise ExtractionError('parser_unavailable')
+    except Exception as e:
+        raise ExtractionError(f'parse_error: {type(e).__name__}')
+
+    if not text.strip():
+        raise ExtractionError('no_text')
+    if validate and not is_valid_text(text):
+        raise ExtractionError('invalid_text')
+    return text
+
+
+def sniff_format_or_raise(filepath):
+    """
+    Như sniff_format nhưng báo lỗi bằng ExtractionError (file hỏng, định dạng không hỗ trợ).
+    """
+    try:
+        file_format = sniff_format(filepath)
+    except OSError:
+        raise ExtractionError('file_not_found')
+    except Exception as e:
+        raise ExtractionError(f'parse_error: {type(e).__name__}')
+    if not file_format:
+        raise ExtractionError('unsupported_format')
+    return file_format
+
+
+def sniff_and_extract(filepath, max_chars=MAX_CHARS):
+    """
+    Nhận diện định dạng và extract trong cùng một lần gọi để cả hai cùng chạy trong sandbox.
+    Trả về (định dạng, text).
+    """
+    file_format = sniff_format_or_raise(filepath)
+    return file_format, extract_text_or_raise(filepath, max_chars, file_format)
+
+
+def extract_text(filepath, max_chars=MAX_CHARS, file_format=None):
+    try:
+        return extract_text_or_raise(filepath, max_chars, file_format)
+    except ExtractionError:
+        return None
+
+
+@register_extractor('.pdf', validate=True)
+def _iter_pdf(filepath):
+    import pdfplumber
+    with pdfplumber.open(filepath) as pdf:
+        for page in pdf.pages[:MAX_PDF_PAGES]:
+            try:
+                yield page.extract_text()
+                for table in page.extract_tables() or []:
+                    yield '\n'.join([' '.join([str(cell) if cell else '' for cell in row]) for row in table])
+            finally:
+                if hasattr(page, 'close'):
+                    page.close()
+
+
+@register_extractor('.docx')
+def _iter_docx(filepath):
+    """
+    Đọc thẳng word/document.xml bằng iterparse, không dựng toàn bộ mô hình của python-docx.
+    Đoạn văn ngoài bảng trả về nguyên dòng, mỗi hàng của bảng gộp các ô thành một dòng.
+    """
+    with zipfile.ZipFile(filepath) as archive:
+        with archive.open('word/document.xml') as xml_file:
+            body = None
+            run_parts = []
+            cell_stack = []
+            row_stack = []
+
+            for event, elem in iterparse(xml_file, events=('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    if tag == _W + 'body':
+                        body = elem
+                    elif tag == _W + 'tr':
+                        row_stack.append([])
+                    elif tag == _W + 'tc':
+                        cell_stack.append([])
+                    continue
+
+                if tag == _W + 't':
+                    run_parts.append(elem.text or '')
+                elif tag == _W + 'tab':
+                    run_parts.append('\t')
+                elif tag in (_W + 'br', _W + 'cr'):
+                    run_parts.append(' ')
+                elif tag == _W + 'p':
+                    text = ''.join(run_parts).strip()
+                    run_parts = []
+                    if cell_stack:
+                        if text:
+                            cell_stack[-1].append(text)
+                    elif text:
+                        yield text
+                    elem.clear()
+                elif tag == _W + 'tc':
+                    cell = ' '.join(cell_stack.pop()) if cell_stack else ''
+                    if cell and row_stack:
+                        row_stack[-1].append(cell)
+                    elem.clear()
+                elif tag == _W + 'tr':
+                    row = ' '.join(row_stack.pop()) if row_stack else ''
+                    if row:
+                        if cell_stack:
+                            cell_stack[-1].append(row)
+                        else:
+                            yield row
+                    elem.clear()
+
+                if body is not None and not cell_stack and tag in (_W + 'p', _W + 'tbl', _W + 'sdt'):
+                    body.clear()
+
+
+@register_extractor('.xlsx')
+def _iter_xlsx(filepath):
+    from openpyxl import load_workbook
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        for sheet_name in wb.sheetnames[:MAX_SHEETS]:
+            sheet = wb[sheet_name]
+            yield f"Sheet: {sheet_name}"
+            for row in sheet.iter_rows(max_row=MAX_SHEET_ROWS, values_only=True):
+                yield ' '.join([str(cell) for cell in row if cell and str(cell).strip()])
+    finally:
+        wb.close()
+
+
+@register_extractor('.xls')
+def _iter_xls(filepath):
+    import xlrd
+    workbook = xlrd.open_workbook(filepath, on_demand=True, formatting_info=False)
+    try:
+        for sheet_idx in range(min(MAX_SHEETS, workbook.nsheets)):
+            sheet = workbook.sheet_by_index(sheet_idx)
+            yield f"Sheet: {sheet.name}"
+            for row_idx in range(min(MAX_SHEET_ROWS, sheet.nrows)):
+                row_values = []
+                for col_idx in range(sheet.ncols):
+                    cell_value = sheet.cell_value(row_idx, col_idx)
+                    if isinstance(cell_value, float) and sheet.cell_type(row_idx, col_idx) == xlrd.XL_CELL_DATE:
+                        try:
+                            date_tuple = xlrd.xldate_as_tuple(cell_value, workbook.datemode)
+                            cell_value = f"{date_tuple[2]}/{date_tuple[1]}/{date_tuple[0]}"
+                        except Exception:
+                            pass
+                    if cell_value and str(cell_value).strip():
+                        row_values.append(str(cell_value).strip())
+                yield ' '.join(row_values)
+            workbook.unload_sheet(sheet_idx)
+    finally:
+        workbook.release_resources()
+
+
+class _OleStreamReader:
+    """
+    Đọc một đoạn bất kỳ của stream OLE bằng cách đi theo chuỗi sector trong FAT,
+    chỉ nạp đúng các sector cần đọc thay vì cả stream như ole.openstream().
+    """
+
+    def __init__(self, ole, name):
+        import olefile
+        self.ole = ole
+        entry = ole.direntries[ole._find(name)]
+        self.size = entry.size
+        self._data = None
+        self._chain = []
+        self._next_sect = entry.isectStart
+        self._end_markers = (olefile.ENDOFCHAIN, olefile.FREESECT)
+        if self.size < ole.minisectorcutoff:
+            self._data = ole.openstream(name).read()
+
+    def _sector(self, index):
+        while index >= len(self._chain):
+            sect = self._next_sect
+            if sect in self._end_markers or sect >= len(self.ole.fat):
+                raise ValueError('Chuỗi sector của stream không hợp lệ')
+            self._chain.append(sect)
+            self._next_sect = self.ole.fat[sect]
+        return self._chain[index]
+
+    def read_at(self, offset, size):
+        size = max(min(size, self.size - offset), 0)
+        if self._data is not None:
+            return self._data[offset:offset + size]
+
+        sector_size = self.ole.sectorsize
+        parts = []
+        while size > 0:
+            within = offset % sector_size
+            count = min(size, sector_size - within)
+            self.ole.fp.seek(sector_size * (self._sector(offset // sector_size) + 1) + within)
+            parts.append(self.ole.fp.read(count))
+            offset += count
+            size -= count
+        return b''.join(parts)
+
+
+_DOC_BLOCK_CHARS = 4096
+_DOC_MAX_CLX_BYTES = 16 * 1024 * 1024
+_DOC_CHAR_MAP = {
+    '\r': '\n', '\x0b': '\n', '\x0c': '\n', '\x0e': '\n',
+    '\x07': '\t', '\x1e': '-', '\x1f': '', '\xa0': ' '
+}
+
+
+def _read_fib(word_stream):
+    """
+    Trả về (tên table stream, ccpText, fcClx, lcbClx) từ FIB của stream WordDocument.
+    """
+    import struct
+    header = word_stream.read_at(0, 1024)
+    if len(header) < 0x22 or struct.unpack_from('<H', header, 0)[0] != 0xA5EC:
+        return None
+    flags = struct.unpack_from('<H', header, 0x0A)[0]
+    if flags & 0x0100:
+        return None
+
+    table_name = '1Table' if flags & 0x0200 else '0Table'
+    csw = struct.unpack_from('<H', header, 0x20)[0]
+    pos = 0x22 + csw * 2
+    cslw = struct.unpack_from('<H', header, pos)[0]
+    fib_rg_lw = pos + 2
+    ccp_text = struct.unpack_from('<i', header, fib_rg_lw + 12)[0]
+    pos = fib_rg_lw + cslw * 4
+    cb_rg_fc_lcb = struct.unpack_from('<H', header, pos)[0]
+    if cb_rg_fc_lcb <= 33:
+        return None
+    fc_clx, lcb_clx = struct.unpack_from('<II', header, pos + 2 + 33 * 8)
+    return table_name, ccp_text, fc_clx, lcb_clx
+
+
+def _read_pieces(table_stream, fc_clx, lcb_clx):
+    import struct
+    if lcb_clx <= 0 or lcb_clx > _DOC_MAX_CLX_BYTES:
+        return []
+    clx = table_stream.read_at(fc_clx, lcb_clx)
+
+    pos = 0
+    while pos < len(clx):
+        clxt = clx[pos]
+        if clxt == 0x01:
+            pos += 3 + struct.unpack_from('<h', clx, pos + 1)[0]
+        elif clxt == 0x02:
+            lcb = struct.unpack_from('<I', clx, pos + 1)[0]
+            plc = clx[pos + 5:pos + 5 + lcb]
+            count = (len(plc) - 4) // 12
+            if count <= 0:
+                return []
+            cps = struct.unpack_from(f'<{count + 1}I', plc, 0)
+            pieces = []
+            for i in range(count):
+                fc = struct.unpack_from('<I', plc, (count + 1) * 4 + i * 8 + 2)[0]
+                pieces.append((cps[i], cps[i + 1], fc))
+            return pieces
+        else:
+            return []
+    return []
+
+
+def _iter_doc_chars(word_stream, pieces, ccp_text):
+    for cp_start, cp_end, fc in pieces:
+        if cp_start >= ccp_text:
+            break
+        cp_end = min(cp_end, ccp_text)
+        compressed = fc & 0x40000000
+        fc &= 0x3FFFFFFF
+
+        if compressed:
+            offset, width, encoding = fc // 2, 1, 'cp1252'
+        else:
+            offset, width, encoding = fc, 2, 'utf-16le'
+
+        remaining = cp_end - cp_start
+        while remaining > 0:
+            count = min(remaining, _DOC_BLOCK_CHARS)
+            data = word_stream.read_at(offset, count * width)
+            if not data:
+                break
+            yield data.decode(encoding, errors='ignore')
+            offset += len(data)
+            remaining -= count
+
+
+@register_extractor('.doc')
+def _iter_doc(filepath):
+    """
+    Đọc file Word 97-2003 qua FIB và piece table (MS-DOC): chỉ giải mã các đoạn text
+    của phần thân văn bản, đọc từng khối nhỏ nên bộ nhớ không phụ thuộc kích thước file.
+    """
+    import olefile
+    if not olefile.isOleFile(filepath):
+        return
+
+    with olefile.OleFileIO(filepath) as ole:
+        if not ole.exists('WordDocument'):
+            return
+        word_stream = _OleStreamReader(ole, 'WordDocument')
+        fib = _read_fib(word_stream)
+        if not fib:
+            return
+        table_name, ccp_text, fc_clx, lcb_clx = fib
+        if not ole.exists(table_name):
+            return
+        pieces = _read_pieces(_OleStreamReader(ole, table_name), fc_clx, lcb_clx)
+
+        line = []
+        field_stack = []
+        for block in _iter_doc_chars(word_stream, pieces, ccp_text):
+            for char in block:
+                if char == '\x13':
+                    field_stack.append(True)
+                    continue
+                if char == '\x14':
+                    if field_stack:
+                        field_stack[-1] = False
+                    continue
+                if char == '\x15':
+                    if field_stack:
+                        field_stack.pop()
+                    continue
+                if any(field_stack):
+                    continue
+                char = _DOC_CHAR_MAP.get(char, char)
+                if char == '\n':
+                    yield ''.join(line)
+                    line = []
+                elif char == '\t' or char >= ' ':
+                    line.append(char)
+        if line:
+            yield ''.join(line)
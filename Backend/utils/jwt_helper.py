@@ -1,13 +1,50 @@
-from flask_jwt_extended import create_access_token, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt, get_jwt_identity
 from functools import wraps
 from flask import jsonify
 
-def generate_token(user_id):
-    return create_access_token(identity=str(user_id))
+def _claims(user):
+    return {
+        'role': user.get('role', 'employee'),
+        'department_id': str(user['department_id']) if user.get('department_id') else None,
+        'ver': user.get('token_version', 0)
+    }
+
+def generate_token(user):
+    """
+    Access token mang sẵn role, department_id và token_version để route không phải tải user từ Mongo.
+    """
+    return create_access_token(identity=str(user['_id']), additional_claims=_claims(user))
+
+def generate_refresh_token(user):
+    return create_refresh_token(identity=str(user['_id']), additional_claims={'ver': user.get('token_version', 0)})
 
 def get_current_user():
     return get_jwt_identity()
 
+def get_current_claims():
+    """
+    Người dùng hiện tại dựng từ claim của token (_id, role, department_id), không truy vấn Mongo.
+    Token đã qua kiểm tra token_version nên role/phòng ban trong claim là giá trị hiện hành.
+    """
+    from bson import ObjectId
+    claims = get_jwt()
+    department_id = claims.get('department_id')
+    return {
+        '_id': ObjectId(get_jwt_identity()),
+        'role': claims.get('role', 'employee'),
+        'department_id': ObjectId(department_id) if department_id else None
+    }
+
+def token_revoked():
+    """
+    Token bị thu hồi khi token_version của user đã tăng (đổi role, phòng ban, mật khẩu) hoặc user đã bị xóa.
+    """
+    from models.user import User
+    claims = get_jwt()
+    if 'ver' not in claims:
+        return True
+    return User.get_token_version(get_jwt_identity()) != claims['ver']
+
 def jwt_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -16,6 +53,7 @@ def jwt_required(f):
             verify_jwt_in_request()
         except Exception as e:
             return jsonify({'message': 'Token không hợp lệ', 'error': str(e)}), 401
+        if token_revoked():
+            return jsonify({'message': 'Phiên đăng nhập đã hết hiệu lực, vui lòng đăng nhập lại'}), 401
         return f(*args, **kwargs)
     return decorated_function
-
@@ -0,0 +1,100 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from utils.vietnamese import normalize_text
+
+DEFAULT_KEYWORDS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'ai_keywords.json')
+MIN_NAME_LENGTH = 3
+MIN_CODE_LENGTH = 2
+_CACHE_SIZE = 16
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _keywords_file():
+    return os.getenv('AI_KEYWORDS_FILE', DEFAULT_KEYWORDS_FILE)
+
+
+def _keywords_version():
+    try:
+        return os.path.getmtime(_keywords_file())
+    except OSError:
+        return 0
+
+
+def load_keywords():
+    try:
+        with open(_keywords_file(), 'r', encoding='utf-8') as f:
+            keywords = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [normalize_text(k) for k in keywords if k and normalize_text(k)]
+
+
+def units_version(all_units):
+    """
+    Phiên bản của tập đơn vị: đổi khi thêm/xóa/sửa tên hoặc mã đơn vị.
+    """
+    return hash(tuple((unit.get('id'), unit.get('name'), unit.get('code')) for unit in all_units))
+
+
+class KeywordMatcher:
+    """
+    Một regex alternation duy nhất gồm tên, mã đơn vị và từ khóa trong từ điển
+    (đã bỏ dấu). Mỗi mẫu ánh xạ tới danh sách index đơn vị nó gợi ý.
+    """
+
+    def __init__(self, all_units, keywords):
+        self.unit_ids = [unit['id'] for unit in all_units]
+        self.targets = {}
+
+        normalized_units = []
+        for index, unit in enumerate(all_units):
+            name = normalize_text(unit.get('name', '') or '')
+            code = normalize_text(unit.get('code', '') or '')
+            normalized_units.append((name, code))
+            if len(name) >= MIN_NAME_LENGTH:
+                self.targets.setdefault(name, set()).add(index)
+            if len(code) >= MIN_CODE_LENGTH:
+                self.targets.setdefault(code, set()).add(index)
+
+        for keyword in keywords:
+            for index, (name, code) in enumerate(normalized_units):
+                if keyword in name or keyword in code:
+                    self.targets.setdefault(keyword, set()).add(index)
+
+        self.pattern = None
+        if self.targets:
+            alternation = '|'.join(re.escape(p) for p in sorted(self.targets, key=len, reverse=True))
+            self.pattern = re.compile(r'(?<!\w)(?:' + alternation + r')(?!\w)')
+
+    def rank(self, text, limit=5):
+        if not self.pattern or not text:
+            return []
+        hits = {}
+        for match in self.pattern.finditer(normalize_text(text)):
+            for index in self.targets.get(match.group(0), ()):
+                hits[index] = hits.get(index, 0) + 1
+        ranked = sorted(hits.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.unit_ids[index], count) for index, count in ranked[:limit]]
+
+
+def get_matcher(all_units):
+    key = (units_version(all_units), _keywords_version())
+    with _cache_lock:
+        matcher = _cache.get(key)
+        if matcher is not None:
+            _cache.move_to_end(key)
+            return matcher
+
+    matcher = KeywordMatcher(all_units, load_keywords())
+
+    with _cache_lock:
+        _cache[key] = matcher
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return matcher
@@ -0,0 +1,56 @@
+import hashlib
+import random
+
+from utils.vietnamese import tokenize
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+_PRIME = (1 << 61) - 1
+
+_random = random.Random(20240611)
+_PERMUTATIONS = [
+    (_random.randrange(1, _PRIME), _random.randrange(0, _PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    tokens = tokenize(text)
+    if not tokens:
+        return set()
+    if len(tokens) < size:
+        return {' '.join(tokens)}
+    return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def signature(text):
+    """
+    Chữ ký MinHash NUM_PERM phần tử trên các shingle 5 từ (đã bỏ dấu) của văn bản.
+    """
+    hashes = [_hash64(s) for s in shingles(text)]
+    if not hashes:
+        return None
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(sig):
+    """
+    Chia chữ ký thành BANDS dải ROWS hàng; hai tài liệu trùng một bucket là ứng viên trùng lặp.
+    """
+    buckets = []
+    for band in range(BANDS):
+        rows = ','.join(str(v) for v in sig[band * ROWS:(band + 1) * ROWS])
+        buckets.append(f'{band}:{hashlib.blake2b(rows.encode("ascii"), digest_size=8).hexdigest()}')
+    return buckets
+
+
+def similarity(sig1, sig2):
+    if not sig1 or not sig2 or len(sig1) != len(sig2):
+        return 0.0
+    return sum(1 for a, b in zip(sig1, sig2) if a == b) / len(sig1)
@@ -0,0 +1,92 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 4
+MAX_ROUNDS = 16
+DEFAULT_QUEUE_PER_WORKER = 4
+DEFAULT_WAIT_SECONDS = 2.0
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+class PasswordHashBusy(Exception):
+    """
+    Pool băm mật khẩu đã đầy: route trả 503 thay vì để request chiếm thread chờ.
+    """
+    pass
+
+
+def _get_int_env(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def rounds():
+    return min(MAX_ROUNDS, max(MIN_ROUNDS, _get_int_env('BCRYPT_ROUNDS', DEFAULT_ROUNDS)))
+
+
+def _workers():
+    return max(1, _get_int_env('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+
+
+def _get_pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = _workers()
+            queue = max(0, _get_int_env('PASSWORD_HASH_QUEUE', workers * DEFAULT_QUEUE_PER_WORKER))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+            _slots = threading.BoundedSemaphore(workers + queue)
+    return _executor, _slots
+
+
+def _submit(func, *args):
+    """
+    Chạy func trong pool bcrypt (bcrypt nhả GIL nên các worker chạy song song trên nhiều core).
+    Số việc đang chạy + chờ bị giới hạn; hết chỗ quá PASSWORD_HASH_WAIT giây thì báo bận.
+    """
+    executor, slots = _get_pool()
+    try:
+        wait = float(os.getenv('PASSWORD_HASH_WAIT', DEFAULT_WAIT_SECONDS))
+    except ValueError:
+        wait = DEFAULT_WAIT_SECONDS
+    if not slots.acquire(timeout=max(wait, 0)):
+        raise PasswordHashBusy()
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+def hash_password(password, cost=None):
+    salt = bcrypt.gensalt(rounds=cost or rounds())
+    return _submit(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+
+def check_password(stored_password, provided_password):
+    return _submit(bcrypt.checkpw, provided_password.encode('utf-8'), stored_password.encode('utf-8'))
+
+
+def hash_rounds(stored_password):
+    """
+    Cost của hash bcrypt dạng $2b$12$..., hoặc None nếu không đọc được.
+    """
+    parts = (stored_password or '').split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(stored_password):
+    return hash_rounds(stored_password) != rounds()
@@ -0,0 +1,216 @@
+import html
+import os
+import threading
+
+from utils.background import submit_task
+from utils.extraction_sandbox import is_deterministic, run_in_sandbox
+from utils.extractors import ExtractionError, sniff_format_or_raise
+
+DEFAULT_PREVIEW_FOLDER = os.path.join('uploads', 'previews')
+THUMBNAIL_WIDTH = 320
+MAX_HTML_BLOCKS = 300
+MAX_HTML_SHEETS = 3
+MAX_HTML_ROWS = 100
+MAX_HTML_COLUMNS = 30
+
+# Loại bản xem trước -> (phần mở rộng file cache, các định dạng hỗ trợ)
+KINDS = {
+    'thumbnail': ('png', {'.pdf'}),
+    'html': ('html', {'.docx', '.xlsx'}),
+}
+
+_pending = set()
+_lock = threading.Lock()
+
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+<meta charset="utf-8">
+<style>
+body {{ font-family: Arial, sans-serif; font-size: 14px; color: #222; margin: 16px; }}
+table {{ border-collapse: collapse; margin: 12px 0; }}
+td, th {{ border: 1px solid #ccc; padding: 4px 8px; vertical-align: top; }}
+h2 {{ font-size: 16px; margin-top: 24px; }}
+.truncated {{ color: #888; font-style: italic; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def preview_folder():
+    return os.getenv('PREVIEW_FOLDER', DEFAULT_PREVIEW_FOLDER)
+
+
+def artifact_path(content_hash, kind):
+    extension = KINDS[kind][0]
+    return os.path.join(preview_folder(), f'{content_hash}.{extension}')
+
+
+def _failure_path(content_hash, kind):
+    return artifact_path(content_hash, kind) + '.failed'
+
+
+def supports(filepath, kind):
+    return os.path.splitext(filepath or '')[1].lower() in KINDS[kind][1]
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _render_pdf_thumbnail(filepath):
+    import io
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(filepath)
+    try:
+        if len(pdf) == 0:
+            raise ExtractionError('no_pages')
+        page = pdf[0]
+        try:
+            scale = THUMBNAIL_WIDTH / max(page.get_width(), 1)
+            image = page.render(scale=scale).to_pil()
+        finally:
+            page.close()
+    finally:
+        pdf.close()
+
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _cell_html(value):
+    return html.escape('' if value is None else str(value)).replace('\n', '<br>')
+
+
+def _render_docx_html(filepath):
+    from docx import Document as DocxDocument
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = DocxDocument(filepath)
+    parts = []
+    for index, block in enumerate(document.element.body.iterchildren()):
+        if index >= MAX_HTML_BLOCKS:
+            parts.append('<p class="truncated">… (đã rút gọn)</p>')
+            break
+        tag = block.tag.rsplit('}', 1)[-1]
+        if tag == 'p':
+            paragraph = Paragraph(block, document)
+            text = paragraph.text.strip()
+            if not text:
+                continue
+            style = (paragraph.style.name or '').lower() if paragraph.style is not None else ''
+            element = 'h2' if style.startswith('heading') or style == 'title' else 'p'
+            parts.append(f'<{element}>{_cell_html(text)}</{element}>')
+        elif tag == 'tbl':
+            rows = []
+            for row in Table(block, document).rows[:MAX_HTML_ROWS]:
+                cells = ''.join(f'<td>{_cell_html(cell.text)}</td>' for cell in row.cells[:MAX_HTML_COLUMNS])
+                rows.append(f'<tr>{cells}</tr>')
+            parts.append('<table>' + ''.join(rows) + '</table>')
+    return _HTML_TEMPLATE.format(body='\n'.join(parts)).encode('utf-8')
+
+
+def _render_xlsx_html(filepath):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    parts = []
+    try:
+        for sheet in workbook.worksheets[:MAX_HTML_SHEETS]:
+            rows = []
+            for row_index, row in enumerate(sheet.iter_rows(values_only=True)):
+                if row_index >= MAX_HTML_ROWS:
+                    rows.append(f'<tr><td class="truncated" colspan="{MAX_HTML_COLUMNS}">… (đã rút gọn)</td></tr>')
+                    break
+                cells = ''.join(f'<td>{_cell_html(value)}</td>' for value in row[:MAX_HTML_COLUMNS])
+                rows.append(f'<tr>{cells}</tr>')
+            parts.append(f'<h2>{_cell_html(sheet.title)}</h2><table>' + ''.join(rows) + '</table>')
+    finally:
+        workbook.close()
+    return _HTML_TEMPLATE.format(body='\n'.join(parts)).encode('utf-8')
+
+
+_RENDERERS = {
+    ('thumbnail', '.pdf'): _render_pdf_thumbnail,
+    ('html', '.docx'): _render_docx_html,
+    ('html', '.xlsx'): _render_xlsx_html,
+}
+
+
+def render_artifact(filepath, kind):
+    file_format = sniff_format_or_raise(filepath)
+    renderer = _RENDERERS.get((kind, file_format))
+    if not renderer:
+        raise ExtractionError('unsupported_format')
+    try:
+        return renderer(filepath)
+    except ImportError:
+        raise ExtractionError('parser_unavailable')
+
+
+def generate_preview(filepath, content_hash, kind):
+    """
+    Render bản xem trước (ảnh trang đầu hoặc HTML) trong sandbox và lưu theo content hash.
+    """
+    try:
+        if os.getenv('EXTRACTION_SANDBOX', '1') == '0':
+            data = render_artifact(filepath, kind)
+        else:
+            data = run_in_sandbox(render_artifact, filepath, kind)
+        os.makedirs(preview_folder(), exist_ok=True)
+        _write_atomic(artifact_path(content_hash, kind), data)
+    except ExtractionError as e:
+        if is_deterministic(e.reason):
+            os.makedirs(preview_folder(), exist_ok=True)
+            _write_atomic(_failure_path(content_hash, kind), e.reason.encode('utf-8'))
+    finally:
+        with _lock:
+            _pending.discard((content_hash, kind))
+
+
+def preview_status(content_hash, kind):
+    """
+    'ready', 'pending', 'failed' hoặc None (chưa có và chưa được yêu cầu).
+    """
+    if os.path.exists(artifact_path(content_hash, kind)):
+        return 'ready'
+    if os.path.exists(_failure_path(content_hash, kind)):
+        return 'failed'
+    with _lock:
+        if (content_hash, kind) in _pending:
+            return 'pending'
+    return None
+
+
+def remove_previews(content_hash):
+    for kind in KINDS:
+        for path in (artifact_path(content_hash, kind), _failure_path(content_hash, kind)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def schedule_preview(filepath, content_hash, kind):
+    if not content_hash or not supports(filepath, kind):
+        return False
+    with _lock:
+        if (content_hash, kind) in _pending:
+            return True
+        _pending.add((content_hash, kind))
+    submit_task(generate_preview, filepath, content_hash, kind)
+    return True
+
+
+def schedule_previews(filepath, content_hash):
+    for kind in KINDS:
+        if supports(filepath, kind) and preview_status(content_hash, kind) is None:
+            schedule_preview(filepath, content_hash, kind)
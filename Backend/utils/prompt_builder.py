@@ -0,0 +1,214 @@
+import os
+
+DEFAULT_MODEL = 'gpt-4o-mini'
+DEFAULT_TOKEN_BUDGET = 6000
+MIN_CONTENT_TOKENS = 256
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+SYSTEM_PROMPT = (
+    "Chỉ trả về index của các đơn vị liên quan, phân tách bằng dấu phẩy, tối đa 5 index. "
+    "Nếu không có đơn vị nào liên quan, trả về NONE. Không giải thích gì thêm."
+)
+
+CONTENT_INSTRUCTION = (
+    "Chỉ chọn các đơn vị liên quan từ danh sách đơn vị ở trên dựa trên nội dung tài liệu. "
+    "Nếu không có đơn vị nào liên quan, trả về NONE.\n"
+    "Chỉ trả về index, phân tách bằng dấu phẩy, tối đa 5 index, không giải thích gì thêm."
+)
+
+NAME_INSTRUCTION = (
+    "Chỉ chọn các đơn vị liên quan từ danh sách đơn vị ở trên dựa trên tên tài liệu. "
+    "Nếu không có đơn vị nào liên quan, trả về NONE.\n"
+    "Chỉ trả về index, phân tách bằng dấu phẩy, tối đa 5 index, không giải thích gì thêm."
+)
+
+_encoding = None
+_encoding_loaded = False
+_system_cache = {}
+_SYSTEM_CACHE_SIZE = 32
+
+
+def load_encoding():
+    """
+    Nạp bảng mã tiktoken (lần đầu có thể phải tải file qua mạng) - gọi lúc khởi động app/script,
+    không gọi trên thread request. Lỗi thì giữ cách ước lượng theo số ký tự.
+    """
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    try:
+        import tiktoken
+        try:
+            _encoding = tiktoken.encoding_for_model(get_model())
+        except KeyError:
+            _encoding = tiktoken.get_encoding('o200k_base')
+    except Exception:
+        _encoding = None
+    _encoding_loaded = True
+    return _encoding
+
+
+def _get_encoding():
+    # Chưa nạp lúc khởi động thì ước lượng theo ký tự, không tải bảng mã giữa request
+    return _encoding
+
+
+def get_model():
+    return os.getenv('AI_MODEL', DEFAULT_MODEL)
+
+
+def get_token_budget():
+    try:
+        return max(int(os.getenv('AI_PROMPT_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET)), MIN_CONTENT_TOKENS)
+    except ValueError:
+        return DEFAULT_TOKEN_BUDGET
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Không có tiktoken: tiếng Việt trung bình khoảng 3 ký tự / token
+    return (len(text) + 2) // 3
+
+
+def count_message_tokens(messages):
+    total = REPLY_PRIMING_TOKENS
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS + count_tokens(message['content'])
+    return total
+
+
+def _units_key(all_units):
+    return tuple((unit.get('id'), unit.get('name'), unit.get('code')) for unit in all_units)
+
+
+def build_system_message(all_units):
+    """
+    Phần đầu prompt cố định cho cùng một danh sách đơn vị, đặt trước nội dung tài liệu
+    để provider tái sử dụng prefix đã cache giữa các lần gọi.
+    """
+    key = _units_key(all_units)
+    cached = _system_cache.get(key)
+    if cached is not None:
+        return cached
+
+    units_info = "\n".join([
+        f"Index {i}: {unit['name']} (Mã: {unit.get('code', 'N/A')})"
+        for i, unit in enumerate(all_units)
+    ])
+    content = f"{SYSTEM_PROMPT}\n\nDANH SÁCH ĐƠN VỊ:\n{units_info}"
+    message = {'role': 'system', 'content': content}
+    cached = (message, count_tokens(content))
+
+    if len(_system_cache) >= _SYSTEM_CACHE_SIZE:
+        _system_cache.pop(next(iter(_system_cache)))
+    _system_cache[key] = cached
+    return cached
+
+
+def _split_long_text(text, max_tokens):
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    step = max_tokens * 3
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def split_content_by_tokens(content, max_tokens):
+    """
+    Gom các đoạn văn thành từng phần không vượt quá max_tokens token.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for paragraph in content.split('\n'):
+        if not paragraph.strip():
+            continue
+        paragraph_tokens = count_tokens(paragraph) + 1
+
+        if paragraph_tokens > max_tokens:
+            if current:
+                chunks.append('\n'.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_long_text(paragraph, max_tokens))
+            continue
+
+        if current_tokens + paragraph_tokens > max_tokens and current:
+            chunks.append('\n'.join(current))
+            current, current_tokens = [], 0
+
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def build_suggest_prompts(document_name, document_content, all_units, token_budget=None):
+    """
+    Tạo danh sách prompt (mỗi phần nội dung một prompt) kèm số token đã dùng.
+    """
+    token_budget = token_budget or get_token_budget()
+    system_message, system_tokens = build_system_message(all_units)
+
+    if not document_content:
+        user_content = f"{NAME_INSTRUCTION}\n\nTÊN TÀI LIỆU: \"{document_name}\""
+        messages = [system_message, {'role': 'user', 'content': user_content}]
+        return [{
+            'messages': messages,
+            'chunk_index': 0,
+            'total_chunks': 1,
+            'token_usage': {
+                'budget': token_budget,
+                'system_tokens': system_tokens,
+                'content_tokens': 0,
+                'prompt_tokens_estimated': count_message_tokens(messages)
+            }
+        }]
+
+    header_template = f"{CONTENT_INSTRUCTION}\n\nNỘI DUNG TÀI LIỆU (Phần {{part}}/{{total}}):\n"
+    fixed_tokens = (
+        REPLY_PRIMING_TOKENS + 2 * MESSAGE_OVERHEAD_TOKENS + system_tokens
+        + count_tokens(header_template.format(part=99, total=99))
+    )
+    content_budget = max(token_budget - fixed_tokens, MIN_CONTENT_TOKENS)
+    chunks = split_content_by_tokens(document_content, content_budget) or [document_content]
+
+    prompts = []
+    for chunk_idx, chunk in enumerate(chunks):
+        header = header_template.format(part=chunk_idx + 1, total=len(chunks))
+        messages = [system_message, {'role': 'user', 'content': header + chunk}]
+        prompts.append({
+            'messages': messages,
+            'chunk_index': chunk_idx,
+            'total_chunks': len(chunks),
+            'token_usage': {
+                'budget': token_budget,
+                'system_tokens': system_tokens,
+                'content_tokens': count_tokens(chunk),
+                'prompt_tokens_estimated': count_message_tokens(messages)
+            }
+        })
+    return prompts
+
+
+def usage_from_response(response, token_usage):
+    """
+    Bổ sung số token thực tế (kể cả phần prefix được cache) từ phản hồi của API.
+    """
+    usage = dict(token_usage or {})
+    response_usage = getattr(response, 'usage', None)
+    if response_usage is None:
+        return usage
+    usage['prompt_tokens'] = getattr(response_usage, 'prompt_tokens', None)
+    usage['completion_tokens'] = getattr(response_usage, 'completion_tokens', None)
+    details = getattr(response_usage, 'prompt_tokens_details', None)
+    usage['cached_tokens'] = getattr(details, 'cached_tokens', 0) if details is not None else 0
+    return usage
@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+import time
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200000
+WINDOW_SECONDS = 60
+
+_DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(value):
+    """
+    Đổi chuỗi thời gian trong header của OpenAI ("1s", "6m0s", "250ms") sang giây.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    matches = _DURATION_PATTERN.findall(value)
+    if not matches:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in matches)
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Giới hạn RPM/TPM phía client, dùng chung giữa các thread (khóa) và các process
+    (trạng thái lưu trong collection ai_rate_limits). Không bao giờ sleep: nếu hết
+    hạn mức, try_acquire trả về số giây cần chờ để caller tự xử lý.
+    shared=False (AI_RATE_LIMIT_SHARED=0) chỉ đếm trong process, không đọc/ghi Mongo: dùng khi
+    benchmark với mock server để lưu lượng thử và các 429 giả không chặn service thật.
+    """
+
+    def __init__(self, key, rpm=None, tpm=None, shared=None):
+        self.key = key
+        self.shared = shared if shared is not None else os.getenv('AI_RATE_LIMIT_SHARED', '1') != '0'
+        self.rpm = rpm or _int_or_none(os.getenv('AI_RATE_LIMIT_RPM')) or DEFAULT_RPM
+        self.tpm = tpm or _int_or_none(os.getenv('AI_RATE_LIMIT_TPM')) or DEFAULT_TPM
+        self._lock = threading.Lock()
+        self._window = 0
+        self._requests = 0
+        self._tokens = 0
+        self._blocked_until = 0.0
+        self._shared_ready = False
+
+    def _collection(self):
+        from config.database import get_db
+        collection = get_db().ai_rate_limits
+        if not self._shared_ready:
+            collection.update_one(
+                {'_id': self.key},
+                {'$setOnInsert': {'window': 0, 'requests': 0, 'tokens': 0, 'blocked_until': 0.0}},
+                upsert=True
+            )
+            self._shared_ready = True
+        return collection
+
+    def try_acquire(self, tokens=0):
+        now = time.time()
+        with self._lock:
+            if now < self._blocked_until:
+                return False, self._blocked_until - now
+        if not self.shared:
+            return self._acquire_local(now, tokens)
+        try:
+            return self._acquire_shared(now, tokens)
+        except Exception:
+            return self._acquire_local(now, tokens)
+
+    def _acquire_shared(self, now, tokens):
+        from pymongo import ReturnDocument
+        collection = self._collection()
+        window = int(now // WINDOW_SECONDS)
+
+        acquired = collection.find_one_and_update(
+            {
+                '_id': self.key,
+                'window': window,
+                'requests': {'$lt': self.rpm},
+                'tokens': {'$lte': max(self.tpm - tokens, 0)},
+                'blocked_until': {'$lte': now}
+            },
+            {'$inc': {'requests': 1, 'tokens': tokens}},
+            return_document=ReturnDocument.AFTER
+        )
+        if acquired:
+            return True, 0
+
+        reset = collection.update_one(
+            {'_id': self.key, 'window': {'$lt': window}, 'blocked_until': {'$lte': now}},
+            {'$set': {'window': window, 'requests': 1, 'tokens': tokens}}
+        )
+        if reset.modified_count > 0:
+            return True, 0
+
+        state = collection.find_one({'_id': self.key}) or {}
+        blocked_until = float(state.get('blocked_until') or 0)
+        if blocked_until > now:
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, blocked_until)
+            return False, blocked_until - now
+        return False, (window + 1) * WINDOW_SECONDS - now
+
+    def _acquire_local(self, now, tokens):
+        window = int(now // WINDOW_SECONDS)
+        with self._lock:
+            if now < self._blocked_until:
+                return False, self._blocked_until - now
+            if self._window != window:
+                self._window = window
+                self._requests = 0
+                self._tokens = 0
+            if self._requests >= self.rpm or self._tokens + tokens > self.tpm:
+                return False, (window + 1) * WINDOW_SECONDS - now
+            self._requests += 1
+            self._tokens += tokens
+            return True, 0
+
+    def block_for(self, seconds):
+        if not seconds or seconds <= 0:
+            return
+        blocked_until = time.time() + seconds
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, blocked_until)
+        if not self.shared:
+            return
+        try:
+            self._collection().update_one(
+                {'_id': self.key, 'blocked_until': {'$lt': blocked_until}},
+                {'$set': {'blocked_until': blocked_until}}
+            )
+        except Exception:
+            pass
+
+    def retry_after(self):
+        with self._lock:
+            return max(self._blocked_until - time.time(), 0)
+
+    def record_headers(self, headers):
+        """
+        Cập nhật hạn mức từ các header x-ratelimit-* của phản hồi.
+        """
+        if not headers:
+            return
+        limit_requests = _int_or_none(headers.get('x-ratelimit-limit-requests'))
+        limit_tokens = _int_or_none(headers.get('x-ratelimit-limit-tokens'))
+        if limit_requests:
+            self.rpm = limit_requests
+        if limit_tokens:
+            self.tpm = limit_tokens
+
+        wait = 0
+        remaining_requests = _int_or_none(headers.get('x-ratelimit-remaining-requests'))
+        if remaining_requests is not None and remaining_requests <= 0:
+            wait = max(wait, parse_duration(headers.get('x-ratelimit-reset-requests')) or 1)
+        remaining_tokens = _int_or_none(headers.get('x-ratelimit-remaining-tokens'))
+        if remaining_tokens is not None and remaining_tokens <= 0:
+            wait = max(wait, parse_duration(headers.get('x-ratelimit-reset-tokens')) or 1)
+        self.block_for(wait)
+
+    def record_rate_limited(self, headers=None):
+        wait = None
+        if headers:
+            wait = parse_duration(headers.get('retry-after-ms'))
+            wait = wait / 1000 if wait is not None else parse_duration(headers.get('retry-after'))
+            if wait is None:
+                wait = max(
+                    parse_duration(headers.get('x-ratelimit-reset-requests')) or 0,
+                    parse_duration(headers.get('x-ratelimit-reset-tokens')) or 0
+                ) or None
+        self.block_for(wait or 20)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(key):
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(key)
+            _limiters[key] = limiter
+        return limiter
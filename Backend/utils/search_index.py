@@ -0,0 +1,108 @@
+import os
+from datetime import datetime
+
+from models.document import Document
+from utils.background import submit_task
+from utils.extraction_sandbox import extract_text_safely, file_hash
+from utils.minhash import lsh_buckets, signature, similarity
+from utils.vietnamese import normalize_text, tokenize
+
+DEFAULT_MAX_CHARS = 20000
+MAX_QUERY_TERMS = 10
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+MAX_DUPLICATES = 5
+
+
+def _max_chars():
+    try:
+        return int(os.getenv('SEARCH_INDEX_MAX_CHARS', DEFAULT_MAX_CHARS))
+    except ValueError:
+        return DEFAULT_MAX_CHARS
+
+
+def search_fields(name, content=None):
+    """
+    Các trường đã bỏ dấu được đánh text index (default_language 'none', không stemming).
+    """
+    fields = {'search_name': normalize_text(name or '')}
+    if content is not None:
+        fields['search_content'] = normalize_text(content)
+    return fields
+
+
+def _duplicate_threshold():
+    try:
+        return float(os.getenv('DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD))
+    except ValueError:
+        return DEFAULT_DUPLICATE_THRESHOLD
+
+
+def fingerprint_fields(filepath, content):
+    """
+    sha256 của file (trùng tuyệt đối) và chữ ký MinHash + bucket LSH của nội dung (gần trùng).
+    """
+    fields = {'content_hash': None, 'minhash': None, 'lsh_buckets': []}
+    try:
+        fields['content_hash'] = file_hash(filepath)
+    except OSError:
+        pass
+    sig = signature(content) if content else None
+    if sig:
+        fields['minhash'] = sig
+        fields['lsh_buckets'] = lsh_buckets(sig)
+    return fields
+
+
+def index_document(doc_id):
+    """
+    Extract text một lần rồi cập nhật cả trường tìm kiếm lẫn dấu vân tay trùng lặp.
+    """
+    document = Document.get_by_id(doc_id)
+    if not document:
+        return None
+    filepath = document.get('filepath', '')
+    content, reason = extract_text_safely(filepath, max_chars=_max_chars())
+    fields = search_fields(document.get('name', ''), content or '')
+    fields.update(fingerprint_fields(filepath, content))
+    fields['indexed_at'] = datetime.utcnow()
+    Document.update_search_fields(doc_id, fields)
+    return fields
+
+
+def find_duplicates(doc_id, fields, extra_filter=None):
+    """
+    Tài liệu trùng nội dung file hoặc có độ tương đồng Jaccard ước lượng >= ngưỡng.
+    Chỉ so với các ứng viên chung ít nhất một bucket LSH thay vì toàn bộ collection.
+    """
+    if not fields:
+        return []
+    threshold = _duplicate_threshold()
+    candidates = Document.find_duplicate_candidates(
+        doc_id, fields.get('content_hash'), fields.get('lsh_buckets'), extra_filter
+    )
+    duplicates = []
+    for candidate in candidates:
+        if fields.get('content_hash') and candidate.get('content_hash') == fields['content_hash']:
+            score = 1.0
+        else:
+            score = similarity(fields.get('minhash'), candidate.get('minhash'))
+        if score >= threshold:
+            duplicates.append({
+                'id': str(candidate['_id']),
+                'name': candidate.get('name', ''),
+                'created_at': candidate['created_at'].isoformat() if candidate.get('created_at') else None,
+                'similarity': round(score, 3)
+            })
+    duplicates.sort(key=lambda item: -item['similarity'])
+    return duplicates[:MAX_DUPLICATES]
+
+
+def schedule_index(doc_id):
+    submit_task(index_document, doc_id)
+
+
+def build_text_query(q):
+    terms = list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return {'$text': {'$search': ' '.join(terms)}}
@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+from collections import Counter
+
+from utils.vietnamese import tokenize
+
+MAX_TERM_FEATURES = 30
+MIN_TERM_LENGTH = 4
+MIN_SUPPORT = 2
+SMOOTHING = 1.0
+DEFAULT_REFRESH_SECONDS = 300
+DEFAULT_SKIP_CONFIDENCE = 0.8
+DEFAULT_SKIP_SUPPORT = 5
+DEFAULT_BLEND_CONFIDENCE = 0.4
+# Đặc trưng xuất hiện ở quá tỉ lệ này số tài liệu đã gửi ("cong", "van"...) không được tính làm bằng chứng
+DEFAULT_MAX_SUPPORT_FREQUENCY = 0.2
+
+# Trọng số theo loại đặc trưng: tên tài liệu quyết định nhiều hơn nội dung hay loại file
+FEATURE_WEIGHTS = {
+    'name': 1.0,
+    'term': 0.5,
+    'dept': 0.5,
+    'type': 0.2,
+}
+
+_COLLECTION = 'suggestion_model'
+# Mỗi tài liệu đã gửi: các đơn vị đã nhận và tập đặc trưng chụp ở lần gửi đầu tiên
+_DOCUMENTS = 'suggestion_documents'
+
+
+def _get_float_env(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def document_features(document):
+    """
+    Đặc trưng của tài liệu: token tên, loại file, phòng ban và các term nổi bật trong nội dung đã index.
+    """
+    features = {f'name:{token}' for token in tokenize(document.get('name', '') or '') if not token.isdigit()}
+    if document.get('type'):
+        features.add(f"type:{document['type']}")
+    if document.get('department_id'):
+        features.add(f"dept:{document['department_id']}")
+    content = document.get('search_content') or ''
+    if content:
+        terms = Counter(
+            token for token in content.split()
+            if len(token) >= MIN_TERM_LENGTH and not token.isdigit()
+        )
+        features.update(f'term:{term}' for term, _ in terms.most_common(MAX_TERM_FEATURES))
+    return features
+
+
+class SuggestionModel:
+    """
+    Bảng đồng xuất hiện đặc trưng -> đơn vị: với mỗi đặc trưng, số tài liệu mang nó đã được gửi
+    (docs) và số tài liệu đã gửi tới từng đơn vị. Lưu trong Mongo, bản sao trong bộ nhớ để tra cứu.
+    """
+
+    def __init__(self):
+        self.features = {}
+        self.documents = 0
+        self.loaded_at = 0
+        self.loading = False
+        self.lock = threading.Lock()
+
+    def _collection(self):
+        from config.database import get_db
+        return get_db()[_COLLECTION]
+
+    def load(self):
+        try:
+            features = {}
+            for item in self._collection().find():
+                features[item['_id']] = (item.get('docs', 0), dict(item.get('units', {})))
+            documents = self._collection().database[_DOCUMENTS].estimated_document_count()
+            with self.lock:
+                self.features = features
+                self.documents = documents
+        finally:
+            with self.lock:
+                self.loaded_at = time.monotonic()
+                self.loading = False
+
+    def refresh(self):
+        """
+        Nạp lại bản sao trong bộ nhớ ở thread nền nếu đã quá SUGGESTION_MODEL_REFRESH giây;
+        request vẫn dùng bản hiện có (rỗng trước lần nạp đầu tiên) chứ không chờ.
+        """
+        interval = _get_float_env('SUGGESTION_MODEL_REFRESH', DEFAULT_REFRESH_SECONDS)
+        with self.lock:
+            if self.loading or (self.loaded_at and time.monotonic() - self.loaded_at <= interval):
+                return
+            self.loading = True
+        from utils.background import submit_task
+        submit_task(self.load)
+
+    def observe(self, features, unit_id, new_document):
+        """
+        Ghi nhận tài liệu (tập đặc trưng features) được gửi tới unit_id;
+        new_document=True nếu đây là lần gửi đầu tiên của tài liệu.
+        """
+        from pymongo import UpdateOne
+        unit_id = str(unit_id)
+        if not features:
+            return
+        increments = {f'units.{unit_id}': 1}
+        if new_document:
+            increments['docs'] = 1
+        self._collection().bulk_write(
+            [UpdateOne({'_id': feature}, {'$inc': increments}, upsert=True) for feature in features],
+            ordered=False
+        )
+        with self.lock:
+            if new_document:
+                self.documents += 1
+            for feature in features:
+                docs, units = self.features.get(feature, (0, {}))
+                units[unit_id] = units.get(unit_id, 0) + 1
+                self.features[feature] = (docs + (1 if new_document else 0), units)
+
+    def predict(self, document, allowed_unit_ids=None, limit=5):
+        """
+        Trả về ([(unit_id, score)], support). score ~ P(đơn vị | đặc trưng) trung bình có trọng số,
+        support là số tài liệu lịch sử đã gửi tới đơn vị đứng đầu qua một đặc trưng tên/nội dung đặc thù
+        (bỏ các đặc trưng phổ biến quá SUGGESTION_MAX_SUPPORT_FREQUENCY số tài liệu).
+        """
+        self.refresh()
+        allowed = set(allowed_unit_ids) if allowed_unit_ids is not None else None
+        max_frequency = _get_float_env('SUGGESTION_MAX_SUPPORT_FREQUENCY', DEFAULT_MAX_SUPPORT_FREQUENCY)
+        scores = {}
+        total_weight = 0.0
+        evidence = []
+        with self.lock:
+            corpus = max(self.documents, 1)
+            for feature in document_features(document):
+                entry = self.features.get(feature)
+                if not entry or entry[0] < MIN_SUPPORT:
+                    continue
+                docs, units = entry
+                weight = FEATURE_WEIGHTS.get(feature.split(':', 1)[0], 0.2)
+                total_weight += weight
+                if not feature.startswith(('type:', 'dept:')) and docs / corpus <= max_frequency:
+                    evidence.append(units)
+                for unit_id, count in units.items():
+                    if allowed is None or unit_id in allowed:
+                        # Số lần gửi tới một đơn vị không thể vượt số tài liệu; kẹp lại phòng dữ liệu cũ lệch
+                        scores[unit_id] = scores.get(unit_id, 0.0) + weight * min(count / (docs + SMOOTHING), 1.0)
+        if not total_weight:
+            return [], 0
+        ranked = sorted(((unit_id, score / total_weight) for unit_id, score in scores.items()), key=lambda item: -item[1])
+        if not ranked:
+            return [], 0
+        top_unit = ranked[0][0]
+        support = max((units.get(top_unit, 0) for units in evidence), default=0)
+        return ranked[:limit], support
+
+
+_model = SuggestionModel()
+
+
+def get_model():
+    return _model
+
+
+def observe_send(document_id, unit_id):
+    """
+    Gọi ở thread nền sau mỗi lần gửi. Một upsert nguyên tử trên suggestion_documents quyết định đây là
+    lần gửi đầu của tài liệu (tăng docs) hay chỉ là đơn vị mới; gửi lặp lại cho cùng đơn vị thì bỏ qua.
+    Đặc trưng được chụp ở lần gửi đầu và dùng lại cho các đơn vị sau để docs và units khớp nhau.
+    """
+    from config.database import get_db
+    from models.document import Document
+    from pymongo import ReturnDocument
+    document_id = str(document_id)
+    unit_id = str(unit_id)
+    document = Document.get_by_id(document_id)
+    features = sorted(document_features(document)) if document else []
+    collection = get_db()[_DOCUMENTS]
+    before = collection.find_one_and_update(
+        {'_id': document_id},
+        {'$addToSet': {'unit_ids': unit_id}, '$setOnInsert': {'features': features}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        _model.observe(features, unit_id, True)
+        return
+    if unit_id in before.get('unit_ids', []):
+        return
+    if 'features' in before:
+        features = before['features']
+    else:
+        collection.update_one({'_id': document_id, 'features': {'$exists': False}}, {'$set': {'features': features}})
+    _model.observe(features, unit_id, False)
+
+
+def predict_units(document, all_units, limit=5):
+    return _model.predict(document, [unit['id'] for unit in all_units], limit)
+
+
+def confident_units(predictions, support):
+    """
+    Các đơn vị đủ tin cậy để bỏ qua LLM (phân phối lặp lại thường xuyên), hoặc [] nếu chưa đủ.
+    """
+    if support < _get_float_env('SUGGESTION_SKIP_SUPPORT', DEFAULT_SKIP_SUPPORT):
+        return []
+    threshold = _get_float_env('SUGGESTION_SKIP_CONFIDENCE', DEFAULT_SKIP_CONFIDENCE)
+    return [unit_id for unit_id, score in predictions if score >= threshold]
+
+
+def blend_suggestions(suggested_ids, predictions, limit=5):
+    """
+    Giữ thứ tự gợi ý của LLM và bổ sung các đơn vị lịch sử có độ tin cậy cao còn thiếu.
+    """
+    threshold = _get_float_env('SUGGESTION_BLEND_CONFIDENCE', DEFAULT_BLEND_CONFIDENCE)
+    blended = list(dict.fromkeys(suggested_ids))
+    for unit_id, score in predictions:
+        if score >= threshold and unit_id not in blended:
+            blended.append(unit_id)
+    return blended[:limit]
@@ -0,0 +1,141 @@
+import csv
+import os
+import re
+import unicodedata
+
+from utils.vietnamese import normalize_text
+
+DEFAULT_BATCH_SIZE = 500
+MAX_ROWS = 20000
+REQUIRED_FIELDS = ('name', 'code', 'email')
+
+# Tên cột (đã bỏ dấu, chữ thường) -> trường của đơn vị
+HEADER_ALIASES = {
+    'name': 'name', 'ten': 'name', 'ten don vi': 'name',
+    'code': 'code', 'ma': 'code', 'ma don vi': 'code',
+    'email': 'email', 'e-mail': 'email', 'thu dien tu': 'email',
+    'phone': 'phone', 'sdt': 'phone', 'so dien thoai': 'phone', 'dien thoai': 'phone',
+    'address': 'address', 'dia chi': 'address',
+    'department_id': 'department_id', 'ma phong ban': 'department_id',
+}
+
+_EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+def batch_size():
+    try:
+        return max(1, int(os.getenv('UNIT_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+    except ValueError:
+        return DEFAULT_BATCH_SIZE
+
+
+def normalize_code(code):
+    """
+    Mã đơn vị chuẩn hóa: NFKC, bỏ khoảng trắng, chữ hoa (giống POST /api/units).
+    """
+    code = unicodedata.normalize('NFKC', str(code or ''))
+    return re.sub(r'\s+', '', code).upper()
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _map_header(header):
+    mapping = {}
+    for index, title in enumerate(header):
+        field = HEADER_ALIASES.get(normalize_text(_cell(title)))
+        if field and field not in mapping.values():
+            mapping[index] = field
+    missing = [field for field in REQUIRED_FIELDS if field not in mapping.values()]
+    if missing:
+        raise ImportFormatError(f"Thiếu cột bắt buộc: {', '.join(missing)}")
+    return mapping
+
+
+def _iter_csv(filepath):
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _iter_xlsx(filepath):
+    import openpyxl
+    workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_unit_rows(filepath, extension):
+    """
+    Đọc file theo luồng, trả về (số dòng trong file, dict trường đơn vị). Dòng 1 là tiêu đề.
+    """
+    if extension == 'csv':
+        rows = _iter_csv(filepath)
+    elif extension == 'xlsx':
+        rows = _iter_xlsx(filepath)
+    else:
+        raise ImportFormatError('Chỉ hỗ trợ file CSV hoặc XLSX')
+
+    mapping = None
+    for row_number, row in enumerate(rows, start=1):
+        if mapping is None:
+            mapping = _map_header(row or [])
+            continue
+        values = {field: _cell(row[index]) for index, field in mapping.items() if index < len(row)}
+        if not any(values.values()):
+            continue
+        if row_number > MAX_ROWS + 1:
+            raise ImportFormatError(f'File vượt quá {MAX_ROWS} dòng')
+        yield row_number, values
+    if mapping is None:
+        raise ImportFormatError('File trống')
+
+
+def validate_row(values):
+    """
+    Trả về (dữ liệu đơn vị đã chuẩn hóa, lỗi).
+    """
+    missing = [field for field in REQUIRED_FIELDS if not values.get(field)]
+    if missing:
+        return None, f"Thiếu {', '.join(missing)}"
+    email = values['email']
+    if not _EMAIL_PATTERN.match(email):
+        return None, 'Email không hợp lệ'
+    code = normalize_code(values['code'])
+    if not code:
+        return None, 'Mã đơn vị không hợp lệ'
+    return {
+        'name': values['name'],
+        'code': code,
+        'email': email,
+        'phone': values.get('phone') or 'Chưa có',
+        'address': values.get('address') or 'Chưa có',
+        'department_id': values.get('department_id') or None
+    }, None
+
+
+def write_report(filepath, results):
+    """
+    File kết quả theo từng dòng: row, code, status, message (UTF-8 BOM để Excel đọc đúng tiếng Việt).
+    """
+    with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['row', 'code', 'status', 'message'])
+        for row_number, code, status, message in sorted(results):
+            writer.writerow([row_number, code, status, message])
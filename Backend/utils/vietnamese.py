@@ -0,0 +1,25 @@
+import re
+import unicodedata
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+_SPACE_PATTERN = re.compile(r'\s+')
+
+
+def fold_diacritics(text):
+    """
+    Bỏ dấu tiếng Việt và chuyển về chữ thường: "Đào tạo" -> "dao tao".
+    """
+    if not text:
+        return ''
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn')
+    return stripped.lower()
+
+
+def normalize_text(text):
+    return _SPACE_PATTERN.sub(' ', fold_diacritics(text)).strip()
+
+
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(fold_diacritics(text))
@@ -14,6 +14,7 @@ const SendModal = ({ document, onClose, onSendSuccess }) => {
   const [hasSuggestions, setHasSuggestions] = useState(true);
   const [suggestionMessage, setSuggestionMessage] = useState('');
   const [isFallback, setIsFallback] = useState(false);
+  const [isSpeculative, setIsSpeculative] = useState(false);
   const [extractedContent, setExtractedContent] = useState(null);
   const [extractedLength, setExtractedLength] = useState(0);
   const [showContentPreview, setShowContentPreview] = useState(false);
@@ -27,13 +28,27 @@ const SendModal = ({ document, onClose, onSendSuccess }) => {
     loadHistory();
   }, [document]);
 
+  useEffect(() => {
+    if (!showAll) return;
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const units = await unitsAPI.search(searchTerm.trim());
+        if (!cancelled) setAllUnits(units);
+      } catch (err) {
+        if (!cancelled) error('Lỗi tìm kiếm đơn vị: ' + err.message);
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [showAll, searchTerm]);
+
   const loadUnits = async () => {
     try {
       setLoading(true);
       
-      const all = await unitsAPI.getAll();
-      setAllUnits(all);
-      
       aiAPI.suggestUnitsStream(
         document.id,
         document.name,
@@ -42,8 +57,11 @@ const SendModal = ({ document, onClose, onSendSuccess }) => {
           setHasSuggestions(result.hasSuggestions);
           setSuggestionMessage(result.message || '');
           setIsFallback(result.isFallback || false);
-          setExtractedContent(result.extractedContent || null);
-          setExtractedLength(result.extractedLength || 0);
+          setIsSpeculative(result.isSpeculative || false);
+          if (!result.isSpeculative) {
+            setExtractedContent(result.extractedContent || null);
+            setExtractedLength(result.extractedLength || 0);
+          }
           
           if (!result.hasSuggestions && result.isFinal) {
             setShowAll(true);
@@ -59,30 +77,23 @@ const SendModal = ({ document, onClose, onSendSuccess }) => {
           setHasSuggestions(false);
           setSuggestionMessage('Không có đơn vị thích hợp');
           setIsFallback(false);
+          setIsSpeculative(false);
           setShowAll(true);
           setLoading(false);
         }
       );
     } catch (err) {
       error('Lỗi tải danh sách đơn vị: ' + err.message);
-      try {
-        const all = await unitsAPI.getAll();
-        setAllUnits(all);
-        setSuggestedUnits([]);
-        setHasSuggestions(false);
-        setSuggestionMessage('Không có đơn vị thích hợp');
-        setIsFallback(false);
-        setShowAll(true);
-      } catch (e) {
-        error('Lỗi tải danh sách đơn vị: ' + e.message);
-      } finally {
-        setLoading(false);
-      }
+      setSuggestedUnits([]);
+      setHasSuggestions(false);
+      setSuggestionMessage('Không có đơn vị thích hợp');
+      setIsFallback(false);
+      setShowAll(true);
+      setLoading(false);
     }
   };
 
-  const displayUnits = showAll ? allUnits : suggestedUnits;
-  const filteredUnits = displayUnits.filter(unit =>
+  const filteredUnits = showAll ? allUnits : suggestedUnits.filter(unit =>
     unit.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
     unit.code.toLowerCase().includes(searchTerm.toLowerCase())
   );
@@ -252,7 +263,11 @@ const SendModal = ({ document, onClose, onSendSuccess }) => {
               <svg width="20" height="20" viewBox="0 0 20 20" fill="none">
                 <path d="M10 2L12.09 7.26L18 8.27L14 12.14L14.91 18.02L10 15.77L5.09 18.02L6 12.14L2 8.27L7.91 7.26L10 2Z" fill="currentColor"/>
               </svg>
-              <span>{isFallback ? 'Có từ phù hợp' : 'Đơn vị được AI gợi ý'}</span>
+              <span>
+                {isSpeculative
+                  ? 'Gợi ý nhanh — AI đang phân tích nội dung...'
+                  : (isFallback ? 'Có từ phù hợp' : 'Đơn vị được AI gợi ý')}
+              </span>
             </div>
           )}
 
@@ -283,13 +298,13 @@ const SendModal = ({ document, onClose, onSendSuccess }) => {
             </svg>
             <input
               type="text"
-              placeholder="Tìm kiếm đơn vị..."
+              placeholder="Tìm theo tên, mã hoặc email đơn vị..."
               value={searchTerm}
               onChange={(e) => setSearchTerm(e.target.value)}
             />
           </div>
 
-          {loading ? (
+          {loading && suggestedUnits.length === 0 ? (
             <div className="empty-state">
               <p>Đang tải...</p>
             </div>
@@ -324,7 +339,7 @@ const SendModal = ({ document, onClose, onSendSuccess }) => {
                     <p>{unit.code} • {unit.email}</p>
                   </div>
                   {isSuggested && (
-                    <span className="suggested-badge">{isFallback ? 'Có từ phù hợp' : 'AI gợi ý'}</span>
+                    <span className="suggested-badge">{isSpeculative ? 'Gợi ý nhanh' : (isFallback ? 'Có từ phù hợp' : 'AI gợi ý')}</span>
                   )}
                   </div>
                 );
@@ -347,7 +362,7 @@ const SendModal = ({ document, onClose, onSendSuccess }) => {
           <button 
             className="confirm-send-button"
             onClick={handleSend}
-            disabled={selectedUnits.length === 0 || sending || loading}
+            disabled={selectedUnits.length === 0 || sending}
           >
             {sending ? 'Đang gửi...' : `Gửi (${selectedUnits.length})`}
           </button>
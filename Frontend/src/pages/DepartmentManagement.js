@@ -34,7 +34,7 @@ const DepartmentManagement = () => {
       setLoading(true);
       const [deptsData, usersData] = await Promise.all([
         departmentsAPI.getAll(),
-        usersAPI.getAll()
+        usersAPI.getAll({ role: 'department_head' })
       ]);
       setDepartments(deptsData);
       setUsers(usersData);
@@ -144,9 +144,9 @@ const DepartmentManagement = () => {
     });
   };
 
-  const getDepartmentHeadName = (headId) => {
-    if (!headId) return 'Chưa có';
-    const head = users.find(u => u.id === headId);
+  const getDepartmentHeadName = (dept) => {
+    if (!dept.head_id) return 'Chưa có';
+    const head = dept.head || users.find(u => u.id === dept.head_id);
     return head ? head.username : 'Không tìm thấy';
   };
 
@@ -236,7 +236,13 @@ const DepartmentManagement = () => {
                       <path d="M8 9C9.65685 9 11 7.65685 11 6C11 4.34315 9.65685 3 8 3C6.34315 3 5 4.34315 5 6C5 7.65685 6.34315 9 8 9Z" stroke="currentColor" strokeWidth="1.5"/>
                       <path d="M2 13C2 11.3431 4.68629 10 8 10C11.3137 10 14 11.3431 14 13" stroke="currentColor" strokeWidth="1.5" strokeLinecap="round"/>
                     </svg>
-                    <span>Trưởng phòng: {getDepartmentHeadName(dept.head_id)}</span>
+                    <span>Trưởng phòng: {getDepartmentHeadName(dept)}</span>
+                  </div>
+                  <div className="detail-item">
+                    <svg width="16" height="16" viewBox="0 0 16 16" fill="none">
+                      <path d="M2 4H14M2 8H14M2 12H10" stroke="currentColor" strokeWidth="1.5" strokeLinecap="round"/>
+                    </svg>
+                    <span>{dept.member_count || 0} nhân sự · {dept.unit_count || 0} đơn vị · {dept.document_count || 0} tài liệu</span>
                   </div>
                 </div>
               </div>
@@ -107,6 +107,15 @@ const DocumentList = () => {
               {filteredDocuments.map(doc => (
             <div key={doc.id} className="document-card">
               <div className="document-icon">
+                {doc.type === 'PDF' && (
+                  <img
+                    className="document-thumbnail"
+                    src={documentsAPI.thumbnail(doc)}
+                    alt=""
+                    loading="lazy"
+                    onError={(e) => { e.target.style.display = 'none'; }}
+                  />
+                )}
                 {doc.type === 'PDF' && <span className="file-type pdf">PDF</span>}
                 {doc.type === 'DOCX' && <span className="file-type docx">DOC</span>}
                 {doc.type === 'XLSX' && <span className="file-type xlsx">XLS</span>}
@@ -130,7 +139,7 @@ const DocumentList = () => {
                 <button 
                   className="send-button"
                   onClick={() => {
-                    const viewUrl = documentsAPI.view(doc.id);
+                    const viewUrl = documentsAPI.viewUrl(doc);
                     window.open(viewUrl, '_blank');
                   }}
                   style={{ 
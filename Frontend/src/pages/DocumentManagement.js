@@ -5,6 +5,9 @@ import { useNotification } from '../context/NotificationContext';
 import { documentsAPI, historyAPI } from '../services/api';
 import '../styles/DocumentManagement.css';
 
+const DUPLICATE_CHECK_ATTEMPTS = 15;
+const DUPLICATE_CHECK_INTERVAL_MS = 2000;
+
 const DocumentManagement = () => {
   const [documents, setDocuments] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -27,7 +30,7 @@ const DocumentManagement = () => {
   const [filePreview, setFilePreview] = useState(null);
   const [uploading, setUploading] = useState(false);
   const [updating, setUpdating] = useState(false);
-  const { success, error } = useNotification();
+  const { success, error, warning } = useNotification();
 
   const loadDocuments = useCallback(async () => {
     try {
@@ -199,6 +202,27 @@ const DocumentManagement = () => {
     }
   };
 
+  // Trùng lặp được tính nền sau khi tải lên: hỏi lại vài lần tới khi index xong
+  const checkDuplicates = async (docId, attempt = 0) => {
+    try {
+      const data = await documentsAPI.getDuplicates(docId);
+      if (data.status === 'pending') {
+        if (attempt < DUPLICATE_CHECK_ATTEMPTS) {
+          setTimeout(() => checkDuplicates(docId, attempt + 1), DUPLICATE_CHECK_INTERVAL_MS);
+        }
+        return;
+      }
+      if (data.possible_duplicates && data.possible_duplicates.length > 0) {
+        const names = data.possible_duplicates
+          .map((doc) => `${doc.name} (${Math.round(doc.similarity * 100)}%)`)
+          .join(', ');
+        warning(`Tài liệu có thể trùng với: ${names}`, 8000);
+      }
+    } catch (err) {
+      // Không chặn người dùng nếu kiểm tra trùng lặp lỗi
+    }
+  };
+
   const handleAddDocument = async () => {
     if (!selectedFile) {
       error('Vui lòng chọn file trước khi thêm!');
@@ -207,8 +231,11 @@ const DocumentManagement = () => {
 
     try {
       setUploading(true);
-      await documentsAPI.upload(selectedFile);
+      const data = await documentsAPI.upload(selectedFile);
       success('Tải lên tài liệu thành công!');
+      if (data.document && data.document.id) {
+        checkDuplicates(data.document.id);
+      }
       setSelectedFile(null);
       setFilePreview(null);
       setIsUploadModalOpen(false);
@@ -361,7 +388,7 @@ const DocumentManagement = () => {
                       <button 
                         className="action-btn view" 
                         onClick={() => {
-                          const viewUrl = documentsAPI.view(doc.id);
+                          const viewUrl = documentsAPI.viewUrl(doc);
                           window.open(viewUrl, '_blank');
                         }}
                         title="Xem tài liệu"
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import Navigation from '../components/Navigation';
 import { useNotification } from '../context/NotificationContext';
 import { useAuth } from '../context/AuthContext';
-import { unitsAPI } from '../services/api';
+import { unitsAPI, exportsAPI } from '../services/api';
 import '../styles/UnitManagement.css';
 
 const UnitManagement = () => {
@@ -30,7 +30,8 @@ const UnitManagement = () => {
     address: ''
   });
   const [updating, setUpdating] = useState(false);
-  const { success, error } = useNotification();
+  const [importProgress, setImportProgress] = useState(null);
+  const { success, error, warning } = useNotification();
 
   useEffect(() => {
     loadUnits();
@@ -156,6 +157,42 @@ const UnitManagement = () => {
     });
   };
 
+  const handleImportFile = (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file) {
+      return;
+    }
+    
+    setImportProgress({ processed: 0, created: 0, failed: 0, done: false });
+    unitsAPI.importFile(
+      file,
+      (data) => {
+        setImportProgress({
+          processed: data.processed || 0,
+          created: data.created || 0,
+          failed: data.failed || 0,
+          importId: data.import_id || null,
+          done: data.type === 'done'
+        });
+        if (data.type === 'done') {
+          if (data.error) {
+            error(data.error);
+          } else if (data.failed > 0) {
+            warning(`Đã thêm ${data.created} đơn vị, ${data.failed} dòng lỗi`);
+          } else {
+            success(`Đã thêm ${data.created} đơn vị`);
+          }
+          loadUnits();
+        }
+      },
+      (err) => {
+        error('Lỗi nhập đơn vị: ' + err.message);
+        setImportProgress(null);
+      }
+    );
+  };
+
   return (
     <div className="management-page">
       <Navigation />
@@ -163,14 +200,43 @@ const UnitManagement = () => {
         <div className="page-header">
           <h1 className="page-title">Quản lý đơn vị</h1>
           {!isEmployee && (
-            <button className="add-unit-btn" onClick={() => setIsAddModalOpen(true)}>
-              <svg width="20" height="20" viewBox="0 0 20 20" fill="none">
-                <path d="M10 4V16M4 10H16" stroke="currentColor" strokeWidth="2" strokeLinecap="round"/>
-              </svg>
-              Thêm đơn vị
-            </button>
+            <div className="header-actions">
+              <a className="add-unit-btn import-unit-btn" href={exportsAPI.url('units')}>
+                Xuất Excel
+              </a>
+              <label className="add-unit-btn import-unit-btn">
+                <input
+                  type="file"
+                  accept=".csv,.xlsx"
+                  onChange={handleImportFile}
+                  disabled={importProgress && !importProgress.done}
+                  hidden
+                />
+                Nhập từ file
+              </label>
+              <button className="add-unit-btn" onClick={() => setIsAddModalOpen(true)}>
+                <svg width="20" height="20" viewBox="0 0 20 20" fill="none">
+                  <path d="M10 4V16M4 10H16" stroke="currentColor" strokeWidth="2" strokeLinecap="round"/>
+                </svg>
+                Thêm đơn vị
+              </button>
+            </div>
           )}
         </div>
+        {importProgress && (
+          <div className="import-progress">
+            <span>
+              {importProgress.done ? 'Hoàn tất' : 'Đang nhập...'} {importProgress.processed} dòng,
+              {' '}{importProgress.created} đã thêm, {importProgress.failed} lỗi
+            </span>
+            {importProgress.done && importProgress.importId && (
+              <a href={unitsAPI.importReportUrl(importProgress.importId)}>Tải file kết quả</a>
+            )}
+            {importProgress.done && (
+              <button className="import-progress-close" onClick={() => setImportProgress(null)}>×</button>
+            )}
+          </div>
+        )}
         <div className="filters-section">
           <div className="search-box">
             <svg className="search-icon" width="20" height="20" viewBox="0 0 20 20" fill="none">
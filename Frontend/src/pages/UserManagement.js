@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import Navigation from '../components/Navigation';
 import { useNotification } from '../context/NotificationContext';
-import { usersAPI, departmentsAPI } from '../services/api';
+import { usersAPI, departmentsAPI, exportsAPI } from '../services/api';
 import { useAuth } from '../context/AuthContext';
 import '../styles/UserManagement.css';
 
@@ -34,21 +34,29 @@ const UserManagement = () => {
     phone: ''
   });
   const [updating, setUpdating] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { success, error } = useNotification();
 
   useEffect(() => {
-    loadData();
+    departmentsAPI.getAll()
+      .then(setDepartments)
+      .catch((err) => error('Lỗi tải dữ liệu: ' + err.message));
   }, []);
 
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      loadData();
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm, filterRole]);
+
   const loadData = async () => {
     try {
       setLoading(true);
-      const [usersData, deptsData] = await Promise.all([
-        usersAPI.getAll(),
-        departmentsAPI.getAll()
-      ]);
-      setUsers(usersData);
-      setDepartments(deptsData);
+      const page = await usersAPI.list({ q: searchTerm.trim(), role: filterRole });
+      setUsers(page.users);
+      setNextCursor(page.nextCursor);
     } catch (err) {
       error('Lỗi tải dữ liệu: ' + err.message);
     } finally {
@@ -56,15 +64,20 @@ const UserManagement = () => {
     }
   };
 
-  const filteredUsers = users.filter(u => {
-    const searchLower = searchTerm.toLowerCase();
-    const matchesSearch = 
-      u.username.toLowerCase().includes(searchLower) ||
-      (u.name && u.name.toLowerCase().includes(searchLower)) ||
-      (u.phone && u.phone.includes(searchTerm));
-    const matchesRole = filterRole === 'all' || u.role === filterRole;
-    return matchesSearch && matchesRole;
-  });
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await usersAPI.list({ q: searchTerm.trim(), role: filterRole, after: nextCursor });
+      setUsers(prev => [...prev, ...page.users]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      error('Lỗi tải dữ liệu: ' + err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const filteredUsers = users;
 
   const handleDelete = async (id) => {
     if (window.confirm('Bạn có chắc chắn muốn xóa người dùng này?')) {
@@ -208,12 +221,17 @@ const UserManagement = () => {
       <div className="management-container">
         <div className="page-header">
           <h1 className="page-title">Quản lý người dùng</h1>
-          <button className="add-unit-btn" onClick={() => setIsAddModalOpen(true)}>
-            <svg width="20" height="20" viewBox="0 0 20 20" fill="none">
-              <path d="M10 4V16M4 10H16" stroke="currentColor" strokeWidth="2" strokeLinecap="round"/>
-            </svg>
-            Thêm người dùng
-          </button>
+          <div className="header-actions">
+            <a className="add-unit-btn import-unit-btn" href={exportsAPI.url('users')}>
+              Xuất Excel
+            </a>
+            <button className="add-unit-btn" onClick={() => setIsAddModalOpen(true)}>
+              <svg width="20" height="20" viewBox="0 0 20 20" fill="none">
+                <path d="M10 4V16M4 10H16" stroke="currentColor" strokeWidth="2" strokeLinecap="round"/>
+              </svg>
+              Thêm người dùng
+            </button>
+          </div>
         </div>
         <div className="filters-section">
           <div className="search-box">
@@ -360,6 +378,14 @@ const UserManagement = () => {
             <p>Không tìm thấy người dùng nào</p>
           </div>
         )}
+
+        {!loading && nextCursor && (
+          <div className="load-more">
+            <button className="load-more-btn" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'Đang tải...' : 'Tải thêm'}
+            </button>
+          </div>
+        )}
       </div>
 
       {isAddModalOpen && (
@@ -1,18 +1,88 @@
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000/api';
+const REFRESH_MARGIN_MS = 60 * 1000;
+const NO_REFRESH_ENDPOINTS = ['/auth/login', '/auth/register'];
+
+let refreshTimer = null;
+let refreshPromise = null;
 
 const getToken = () => {
   return localStorage.getItem('token');
 };
 
-const setToken = (token) => {
+const getRefreshToken = () => {
+  return localStorage.getItem('refresh_token');
+};
+
+const tokenExpiry = (token) => {
+  try {
+    const payload = JSON.parse(atob(token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/')));
+    return payload.exp ? payload.exp * 1000 : null;
+  } catch (error) {
+    return null;
+  }
+};
+
+// Làm mới access token trước khi hết hạn, để các URL ?token= (tải file, xem trước) vẫn dùng được
+const scheduleRefresh = (token) => {
+  clearTimeout(refreshTimer);
+  const expiresAt = token ? tokenExpiry(token) : null;
+  if (!expiresAt || !getRefreshToken()) {
+    return;
+  }
+  const delay = Math.max(expiresAt - Date.now() - REFRESH_MARGIN_MS, 0);
+  refreshTimer = setTimeout(() => {
+    refreshAccessToken();
+  }, delay);
+};
+
+const setToken = (token, refreshToken) => {
   localStorage.setItem('token', token);
+  if (refreshToken) {
+    localStorage.setItem('refresh_token', refreshToken);
+  }
+  scheduleRefresh(token);
 };
 
 const removeToken = () => {
+  clearTimeout(refreshTimer);
   localStorage.removeItem('token');
+  localStorage.removeItem('refresh_token');
+};
+
+const refreshAccessToken = () => {
+  if (refreshPromise) {
+    return refreshPromise;
+  }
+  const refreshToken = getRefreshToken();
+  if (!refreshToken) {
+    return Promise.resolve(null);
+  }
+  refreshPromise = fetch(`${API_BASE_URL}/auth/refresh`, {
+    method: 'POST',
+    headers: {
+      'Authorization': `Bearer ${refreshToken}`,
+    },
+  })
+    .then(async (response) => {
+      if (!response.ok) {
+        return null;
+      }
+      const data = await response.json();
+      if (data.token) {
+        setToken(data.token);
+      }
+      return data.token || null;
+    })
+    .catch(() => null)
+    .finally(() => {
+      refreshPromise = null;
+    });
+  return refreshPromise;
 };
 
-const apiRequest = async (endpoint, options = {}) => {
+scheduleRefresh(getToken());
+
+const apiRequest = async (endpoint, options = {}, retried = false) => {
   const token = getToken();
   
   const config = {
@@ -31,6 +101,9 @@ const apiRequest = async (endpoint, options = {}) => {
     const response = await fetch(`${API_BASE_URL}${endpoint}`, config);
     
     if (response.status === 401) {
+      if (!retried && !NO_REFRESH_ENDPOINTS.includes(endpoint) && await refreshAccessToken()) {
+        return apiRequest(endpoint, options, true);
+      }
       removeToken();
       window.location.href = '/login';
       throw new Error('Unauthorized');
@@ -58,7 +131,7 @@ export const authAPI = {
       body: JSON.stringify({ username, password }),
     });
     if (data.token) {
-      setToken(data.token);
+      setToken(data.token, data.refresh_token);
     }
     return data;
   },
@@ -69,7 +142,7 @@ export const authAPI = {
       body: JSON.stringify({ username, password }),
     });
     if (data.token) {
-      setToken(data.token);
+      setToken(data.token, data.refresh_token);
     }
     return data;
   },
@@ -85,6 +158,10 @@ export const documentsAPI = {
     return data.documents || [];
   },
   
+  getDuplicates: async (docId) => {
+    return await apiRequest(`/documents/${docId}/duplicates`);
+  },
+  
   upload: async (file) => {
     const token = getToken();
     const formData = new FormData();
@@ -167,6 +244,26 @@ export const documentsAPI = {
   view: (docId) => {
     return documentsAPI.download(docId, false);
   },
+  
+  thumbnail: (doc) => {
+    const token = getToken();
+    const version = doc.content_hash ? `&v=${doc.content_hash}` : '';
+    return `${API_BASE_URL}/documents/${doc.id}/thumbnail?token=${token}${version}`;
+  },
+  
+  preview: (doc) => {
+    const token = getToken();
+    const version = doc.content_hash ? `&v=${doc.content_hash}` : '';
+    return `${API_BASE_URL}/documents/${doc.id}/preview?token=${token}${version}`;
+  },
+  
+  viewUrl: (doc) => {
+    const ext = (doc.filename || '').split('.').pop().toLowerCase();
+    if (ext === 'docx' || ext === 'xlsx') {
+      return documentsAPI.preview(doc);
+    }
+    return documentsAPI.view(doc.id);
+  },
 };
 
 export const unitsAPI = {
@@ -175,6 +272,12 @@ export const unitsAPI = {
     return data.units || [];
   },
   
+  search: async (q, limit = 20) => {
+    const params = new URLSearchParams({ q: q || '', limit: String(limit) });
+    const data = await apiRequest(`/units/search?${params.toString()}`);
+    return data.units || [];
+  },
+  
   create: async (unitData) => {
     return await apiRequest('/units', {
       method: 'POST',
@@ -202,6 +305,76 @@ export const unitsAPI = {
     });
     return data.units || [];
   },
+  
+  importFile: (file, onProgress, onError) => {
+    const token = getToken();
+    const formData = new FormData();
+    formData.append('file', file);
+    
+    fetch(`${API_BASE_URL}/units/import`, {
+      method: 'POST',
+      headers: {
+        'Authorization': token ? `Bearer ${token}` : '',
+      },
+      body: formData,
+    })
+    .then(async (response) => {
+      if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.message || `HTTP error! status: ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      
+      const readStream = () => {
+        reader.read().then(({ done, value }) => {
+          if (done) {
+            return;
+          }
+          
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n');
+          buffer = lines.pop() || '';
+          
+          for (const line of lines) {
+            if (!line.trim()) {
+              continue;
+            }
+            try {
+              onProgress(JSON.parse(line));
+            } catch (e) {
+            }
+          }
+          
+          readStream();
+        }).catch(err => {
+          if (onError) {
+            onError(err);
+          }
+        });
+      };
+      
+      readStream();
+    })
+    .catch(err => {
+      if (onError) {
+        onError(err);
+      }
+    });
+  },
+  
+  importReportUrl: (importId) => {
+    const token = getToken();
+    return `${API_BASE_URL}/units/import/${importId}/report?token=${token}`;
+  },
+};
+
+export const exportsAPI = {
+  url: (entity, format = 'xlsx') => {
+    const token = getToken();
+    return `${API_BASE_URL}/exports/${entity}?format=${format}&token=${token}`;
+  },
 };
 
 export const historyAPI = {
@@ -301,6 +474,7 @@ export const aiAPI = {
                   hasSuggestions: data.has_suggestions !== false,
                   message: data.message || '',
                   isFallback: data.is_fallback || false,
+                  isSpeculative: data.is_speculative || false,
                   extractedContent: data.extracted_content || null,
                   extractedLength: data.extracted_length || 0,
                   chunkIndex: data.chunk_index || 0,
@@ -332,6 +506,71 @@ export const aiAPI = {
       }
     });
   },
+  suggestUnitsBatch: (documentIds, onResult, onError) => {
+    const token = getToken();
+
+    fetch(`${API_BASE_URL}/ai/suggest-units-batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': token ? `Bearer ${token}` : '',
+      },
+      body: JSON.stringify({ document_ids: documentIds }),
+    })
+    .then(response => {
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      const readStream = () => {
+        reader.read().then(({ done, value }) => {
+          if (done) {
+            return;
+          }
+
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n');
+          buffer = lines.pop() || '';
+
+          for (const line of lines) {
+            if (!line.trim()) {
+              continue;
+            }
+            try {
+              const data = JSON.parse(line);
+              onResult({
+                documentId: data.document_id,
+                units: data.suggested_units || [],
+                hasSuggestions: data.has_suggestions !== false,
+                message: data.message || '',
+                isFallback: data.is_fallback || false,
+                isDegraded: data.is_degraded || false,
+                extractionFailure: data.extraction_failure || null,
+                isFinal: data.is_final || false
+              });
+            } catch (e) {
+            }
+          }
+
+          readStream();
+        }).catch(err => {
+          if (onError) {
+            onError(err);
+          }
+        });
+      };
+
+      readStream();
+    })
+    .catch(err => {
+      if (onError) {
+        onError(err);
+      }
+    });
+  },
   previewContent: async (documentId) => {
     const data = await apiRequest('/ai/preview-content', {
       method: 'POST',
@@ -350,9 +589,24 @@ export const aiAPI = {
 };
 
 export const usersAPI = {
-  getAll: async () => {
-    const data = await apiRequest('/users');
-    return data.users || [];
+  list: async ({ q = '', role = 'all', after = null, limit = 50 } = {}) => {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (q) params.append('q', q);
+    if (role && role !== 'all') params.append('role', role);
+    if (after) params.append('after', after);
+    const data = await apiRequest(`/users?${params.toString()}`);
+    return { users: data.users || [], nextCursor: data.next_cursor || null };
+  },
+
+  getAll: async (filters = {}) => {
+    const users = [];
+    let after = null;
+    do {
+      const page = await usersAPI.list({ ...filters, after, limit: 200 });
+      users.push(...page.users);
+      after = page.nextCursor;
+    } while (after);
+    return users;
   },
 
   create: async (userData) => {